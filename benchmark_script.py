@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+"""
+Benchmark Script for NIC Chatbot
+
+Measures the performance-sensitive parts of the chatbot against the data
+produced by data_loading_script.py. Each benchmark is a subcommand:
+
+    python benchmark_script.py vector-store   # Chroma vs memory-mapped index
+    python benchmark_script.py quantization   # float16/int8 index memory and recall@k
+    python benchmark_script.py rerank         # end-to-end RAG latency with/without reranking
+    python benchmark_script.py extractive     # extractive vs generative answers: latency and quality
+    python benchmark_script.py workers --pid <gunicorn master pid>   # shared vs per-worker memory
+    python benchmark_script.py router         # query router accuracy, confusion and latency
+    python benchmark_script.py analytics      # SQLite vs rollup vs columnar snapshot vs Parquet aggregations
+
+Benchmarks that exercise the RAG path import the knowledge base module in-process,
+so they load the same models and honour the same environment variables as the server.
+
+Results are printed as a table and can also be saved as JSON with --output.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BASE_DIR, "nic-chatbot-backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from src.routes.data_versions import component_path, read_current
+
+# Vector stores of the published data version (see data_versions.py), as the server resolves
+# them; the fixed directories are only used when nothing has been published
+DATA_RELEASES_DIR = os.environ.get("DATA_RELEASES_DIR", os.path.join(BASE_DIR, "data", "releases"))
+CURRENT_DATA = read_current(DATA_RELEASES_DIR)
+DEFAULT_CHROMA_DIR = component_path(DATA_RELEASES_DIR, CURRENT_DATA, "chroma_db") or os.path.join(BASE_DIR, "data", "chroma_db")
+DEFAULT_MEMMAP_DIR = component_path(DATA_RELEASES_DIR, CURRENT_DATA, "memmap_index") or os.path.join(BASE_DIR, "data", "memmap_index")
+DEFAULT_QA_PAIRS_PATH = os.path.join(BASE_DIR, "data", "qa_pairs.json")
+DEFAULT_ROUTER_DATA_PATH = os.path.join(BASE_DIR, "data", "router_training.jsonl")
+DEFAULT_SCHEMES_CSV_PATH = os.path.join(BACKEND_DIR, "src", "upload", "List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv")
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+# --- Helpers --- #
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def latency_summary(latencies_ms):
+    return {
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0
+    }
+
+def load_eval_pairs(qa_pairs_path, limit=None):
+    """The extracted Q&A pairs, used as the evaluation set."""
+    with open(qa_pairs_path, 'r', encoding='utf-8') as file:
+        qa_pairs = json.load(file)
+    return qa_pairs[:limit] if limit else qa_pairs
+
+def load_eval_questions(qa_pairs_path, limit=None):
+    """Questions from the extracted Q&A pairs, used as the evaluation query set."""
+    return [pair['question'] for pair in load_eval_pairs(qa_pairs_path, limit)]
+
+def answer_tokens(text):
+    return re.findall(r'\w+', text.lower())
+
+def token_f1(prediction, reference):
+    """SQuAD-style token overlap F1 and precision of a predicted answer against the reference answer."""
+    predicted = answer_tokens(prediction)
+    expected = answer_tokens(reference)
+    remaining = list(expected)
+    common = 0
+    for token in predicted:
+        if token in remaining:
+            remaining.remove(token)
+            common += 1
+    if not predicted or not expected or common == 0:
+        return 0.0, 0.0
+    precision = common / len(predicted)
+    recall = common / len(expected)
+    return 2 * precision * recall / (precision + recall), precision
+
+def load_rag_stack():
+    """Imports the chatbot's NLU processor and an in-process knowledge base, which loads the full RAG stack."""
+    # Benchmarks time the models themselves, never a remote model server
+    os.environ.pop("MODEL_SERVER_ADDRESS", None)
+    from src.routes import chatbot, knowledge_base
+    if not knowledge_base.qa_chain:
+        raise RuntimeError("The knowledge base QA chain is not available; build the knowledge base first")
+    return chatbot.nlu_processor, knowledge_base
+
+def get_embeddings():
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+def print_table(title, rows):
+    """Prints a list of flat dicts as an aligned table."""
+    print(f"\n=== {title} ===")
+    if not rows:
+        print("(no results)")
+        return
+    columns = list(rows[0].keys())
+    widths = {col: max(len(col), *(len(str(row.get(col, ''))) for row in rows)) for col in columns}
+    print("  ".join(col.ljust(widths[col]) for col in columns))
+    for row in rows:
+        print("  ".join(str(row.get(col, '')).ljust(widths[col]) for col in columns))
+
+# --- Vector store benchmark --- #
+
+def _vector_store_worker(backend, store_dir, questions, k, fetch_k, result_queue):
+    """Runs in a fresh process so load time and RSS are not polluted by the other backend."""
+    embeddings = get_embeddings()
+    query_vectors = embeddings.embed_documents(questions)
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        store = Chroma(persist_directory=store_dir, embedding_function=embeddings)
+        store._collection.count()  # Force the client to actually open the collection
+    else:
+        from src.routes.vector_index import MemmapVectorStore
+        store = MemmapVectorStore(store_dir, embeddings)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    similarity_ms = []
+    mmr_ms = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        store.similarity_search_by_vector(vector, k=k)
+        similarity_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        store.max_marginal_relevance_search_by_vector(vector, k=k, fetch_k=fetch_k)
+        mmr_ms.append((time.perf_counter() - start) * 1000)
+
+    result_queue.put({
+        'backend': backend,
+        'load_ms': round(load_ms, 2),
+        'rss_delta_mb': round(current_rss_mb() - rss_before, 1),
+        'similarity_p50_ms': latency_summary(similarity_ms)['p50_ms'],
+        'similarity_p95_ms': latency_summary(similarity_ms)['p95_ms'],
+        'mmr_p50_ms': latency_summary(mmr_ms)['p50_ms'],
+        'mmr_p95_ms': latency_summary(mmr_ms)['p95_ms'],
+        'queries': len(query_vectors)
+    })
+
+def benchmark_vector_store(args):
+    """Compares Chroma and the memory-mapped exact index on load time, RSS and query latency."""
+    questions = load_eval_questions(args.qa_pairs, args.limit)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend, store_dir in (("chroma", args.chroma_dir), ("memmap", args.memmap_dir)):
+        if not os.path.exists(store_dir):
+            print(f"Skipping {backend}: index not found at {store_dir}")
+            continue
+        result_queue = context.Queue()
+        process = context.Process(
+            target=_vector_store_worker,
+            args=(backend, store_dir, questions, args.k, args.fetch_k, result_queue)
+        )
+        process.start()
+        results.append(result_queue.get())
+        process.join()
+    print_table("Vector store: Chroma vs memory-mapped exact index", results)
+    return results
+
+# --- Quantization benchmark --- #
+
+def benchmark_quantization(args):
+    """Memory savings and recall@k of compressed indexes against the uncompressed float32 index."""
+    import numpy as np
+    from src.routes.vector_index import (
+        EMBEDDINGS_FILE, FULL_PRECISION_FILE, METADATA_FILE, MemmapVectorStore
+    )
+
+    with open(os.path.join(args.memmap_dir, METADATA_FILE), 'r', encoding='utf-8') as file:
+        sidecar = json.load(file)
+    full_path = os.path.join(args.memmap_dir, FULL_PRECISION_FILE)
+    if sidecar['dtype'] != "float32" and not os.path.exists(full_path):
+        print(f"ERROR: {args.memmap_dir} has no float32 vectors to use as the baseline")
+        return []
+    vectors = np.load(full_path if sidecar['dtype'] != "float32" else os.path.join(args.memmap_dir, EMBEDDINGS_FILE))
+
+    embeddings = get_embeddings()
+    query_vectors = embeddings.embed_documents(load_eval_questions(args.qa_pairs, args.limit))
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        baseline = MemmapVectorStore.from_vectors(
+            vectors, sidecar['texts'], embeddings, sidecar['metadatas'],
+            persist_directory=os.path.join(work_dir, "float32")
+        )
+        expected = [set(baseline._search(vector, args.k)[0].tolist()) for vector in query_vectors]
+
+        for dtype in ("float32", "float16", "int8"):
+            index_dir = os.path.join(work_dir, dtype)
+            if dtype != "float32":
+                MemmapVectorStore.from_vectors(
+                    vectors, sidecar['texts'], embeddings, sidecar['metadatas'],
+                    persist_directory=index_dir, dtype=dtype
+                )
+            for rescore_factor in ((1,) if dtype == "float32" else (1, args.rescore_factor)):
+                store = MemmapVectorStore(index_dir, embeddings, rescore_factor=rescore_factor)
+                hits = 0
+                latencies_ms = []
+                for vector, exact_rows in zip(query_vectors, expected):
+                    start = time.perf_counter()
+                    rows, _ = store._search(vector, args.k)
+                    latencies_ms.append((time.perf_counter() - start) * 1000)
+                    hits += len(exact_rows & set(rows.tolist()))
+                footprint = store.memory_footprint()
+                results.append({
+                    'dtype': dtype,
+                    'rescore_factor': rescore_factor if footprint['rescoring'] else '-',
+                    'index_mb': round(footprint['index_bytes'] / 1024 / 1024, 3),
+                    'savings': f"{footprint['savings_ratio'] * 100:.1f}%",
+                    f'recall@{args.k}': round(hits / max(1, sum(len(rows) for rows in expected)), 4),
+                    'p50_ms': latency_summary(latencies_ms)['p50_ms'],
+                    'p95_ms': latency_summary(latencies_ms)['p95_ms']
+                })
+    print_table(f"Compressed embeddings: memory and recall@{args.k} vs float32", results)
+    return results
+
+# --- Rerank benchmark --- #
+
+def benchmark_rerank(args):
+    """End-to-end retrieval + generation latency with and without the cross-encoder stage.
+
+    FAQ lookup is bypassed: the evaluation questions are the FAQ questions themselves.
+    """
+    nlu_processor, kb = load_rag_stack()
+    questions = load_eval_questions(args.qa_pairs, args.limit)
+    results = []
+    for enabled in (False, True):
+        kb.configure_reranking(enabled)
+        retrieval_ms = []
+        generation_ms = []
+        total_ms = []
+        context_chars = []
+        for question in questions:
+            parsed_query = nlu_processor.parse_query(question)
+            start = time.perf_counter()
+            docs = kb.retrieve_documents(question, parsed_query)
+            retrieved = time.perf_counter()
+            kb.generate_answer(question, docs)
+            finished = time.perf_counter()
+            retrieval_ms.append((retrieved - start) * 1000)
+            generation_ms.append((finished - retrieved) * 1000)
+            total_ms.append((finished - start) * 1000)
+            context_chars.append(sum(len(doc.page_content) for doc in docs))
+        results.append({
+            'reranking': "on" if enabled else "off",
+            'chunks_to_llm': kb.RERANK_TOP_N if enabled else kb.RETRIEVER_SEARCH_KWARGS['k'],
+            'avg_context_chars': round(sum(context_chars) / len(context_chars)) if context_chars else 0,
+            'retrieval_p50_ms': latency_summary(retrieval_ms)['p50_ms'],
+            'generation_p50_ms': latency_summary(generation_ms)['p50_ms'],
+            'total_p50_ms': latency_summary(total_ms)['p50_ms'],
+            'total_p95_ms': latency_summary(total_ms)['p95_ms'],
+            'questions': len(questions)
+        })
+    if kb.reranker:
+        print(f"Reranker cache: {kb.reranker.stats()}")
+    kb.configure_reranking(kb.RERANK_ENABLED)
+    print_table("RAG latency with and without cross-encoder reranking", results)
+    return results
+
+# --- Extractive QA benchmark --- #
+
+def benchmark_extractive(args):
+    """Latency and answer quality of generative answers vs extractive answers with generative fallback.
+
+    Quality is token F1/precision against the curated answer of each Q&A pair.
+    FAQ lookup is bypassed so every question goes through retrieval.
+    """
+    nlu_processor, kb = load_rag_stack()
+    qa_pairs = load_eval_pairs(args.qa_pairs, args.limit)
+    results = []
+    for mode in ("generative", "extractive"):
+        kb.configure_answer_mode(mode)
+        latencies_ms = []
+        f1_scores = []
+        precisions = []
+        fallbacks = 0
+        for pair in qa_pairs:
+            question = pair['question']
+            docs = kb.retrieve_documents(question, nlu_processor.parse_query(question))
+            start = time.perf_counter()
+            extracted = kb.extract_answer(question, docs)
+            if extracted:
+                answer = extracted['answer']
+            else:
+                fallbacks += mode == "extractive"
+                answer = kb.generate_answer(question, docs)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+            f1, precision = token_f1(answer, pair['answer'])
+            f1_scores.append(f1)
+            precisions.append(precision)
+        results.append({
+            'mode': mode,
+            'answer_p50_ms': latency_summary(latencies_ms)['p50_ms'],
+            'answer_p95_ms': latency_summary(latencies_ms)['p95_ms'],
+            'token_f1': round(sum(f1_scores) / len(f1_scores), 4) if f1_scores else 0.0,
+            'token_precision': round(sum(precisions) / len(precisions), 4) if precisions else 0.0,
+            'generative_fallbacks': fallbacks if mode == "extractive" else '-',
+            'questions': len(qa_pairs)
+        })
+    kb.configure_answer_mode(kb.ANSWER_MODE)
+    print_table("Answer mode: generative vs extractive (with fallback)", results)
+    return results
+
+# --- Pre-fork worker memory benchmark --- #
+
+def process_memory_mb(pid):
+    """RSS, PSS and USS (private pages only) of a process in MB, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+        'uss_mb': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1)
+    }
+
+def child_pids(pid):
+    """Direct children of a process, e.g. the workers of a gunicorn master."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # The fields after the parenthesized command name start with state, ppid
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+def send_chat_requests(url, questions):
+    """Sends questions to a running server so the workers have allocated their activations."""
+    for question in questions:
+        body = json.dumps({'message': question}).encode('utf-8')
+        chat_request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(chat_request, timeout=120) as response:
+                response.read()
+        except urllib.error.URLError as e:
+            print(f"Warm-up request failed: {e}")
+
+def benchmark_workers(args):
+    """Memory of a running pre-fork server (gunicorn.conf.py): master, and each worker's unique memory.
+
+    USS is what one more worker costs; PSS splits shared pages between the
+    processes mapping them, so the PSS total is the real footprint of the server.
+    """
+    if args.url:
+        send_chat_requests(args.url, load_eval_questions(args.qa_pairs, args.requests))
+    results = [{'role': 'master', 'pid': args.pid, **process_memory_mb(args.pid)}]
+    results += [{'role': 'worker', 'pid': pid, **process_memory_mb(pid)} for pid in child_pids(args.pid)]
+    print_table("Pre-fork server memory per process", results)
+
+    worker_rows = [row for row in results if row['role'] == 'worker']
+    if worker_rows:
+        print(f"\nWorkers: {len(worker_rows)}, mean USS per worker: {sum(row['uss_mb'] for row in worker_rows) / len(worker_rows):.1f} MB")
+    print(f"Total PSS: {sum(row['pss_mb'] for row in results):.1f} MB (sum of RSS: {sum(row['rss_mb'] for row in results):.1f} MB)")
+    return results
+
+# --- Query router benchmark --- #
+
+def evaluate_router(route_fn, examples):
+    """Confusion counts and per-query routing latency of a route function over labelled examples."""
+    from src.routes.query_router import ROUTES
+    confusion = {(actual, predicted): 0 for actual in ROUTES for predicted in ROUTES}
+    latencies_ms = []
+    for query, parsed_query, actual in examples:
+        start = time.perf_counter()
+        predicted, _ = route_fn(query, parsed_query)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        confusion[(actual, predicted)] += 1
+    return confusion, latencies_ms
+
+def benchmark_router(args):
+    """Heuristic vs trained query router on a labelled set: accuracy, confusion matrix and routing latency.
+
+    The trained router is scored with k-fold cross-validation so no query is
+    routed by a model that saw it during training. NLU parsing time is excluded.
+    """
+    from src.routes.nlu_processor_updated import NLUProcessor
+    from src.routes.query_router import ROUTES, QueryRouter, heuristic_route, load_labelled_examples
+
+    examples = load_labelled_examples(args.data, NLUProcessor(args.csv))
+    folds = max(2, min(args.folds, len(examples)))
+    routers = {'heuristic': evaluate_router(heuristic_route, examples)}
+
+    confusion = {(actual, predicted): 0 for actual in ROUTES for predicted in ROUTES}
+    latencies_ms = []
+    for fold in range(folds):
+        held_out = examples[fold::folds]
+        router = QueryRouter.train([example for i, example in enumerate(examples) if i % folds != fold])
+        fold_confusion, fold_latencies = evaluate_router(router.route, held_out)
+        for key, count in fold_confusion.items():
+            confusion[key] += count
+        latencies_ms.extend(fold_latencies)
+    routers[f'trained ({folds}-fold)'] = (confusion, latencies_ms)
+
+    results = []
+    for name, (confusion, latencies_ms) in routers.items():
+        row = {'router': name, 'accuracy': round(sum(confusion[(r, r)] for r in ROUTES) / len(examples), 4)}
+        for actual in ROUTES:
+            for predicted in ROUTES:
+                row[f'{actual}->{predicted}'] = confusion[(actual, predicted)]
+        row.update({'route_p50_ms': latency_summary(latencies_ms)['p50_ms'], 'route_p95_ms': latency_summary(latencies_ms)['p95_ms']})
+        results.append(row)
+    print_table(f"Query routing on {len(examples)} labelled queries", results)
+    return results
+
+# --- Analytics backend benchmark --- #
+
+SYNTHETIC_STATES = ['Andaman and Nicobar Islands', 'Andhra Pradesh', 'Haryana', 'Madhya Pradesh']
+SYNTHETIC_TYPES = ['PWS', 'Retrofitting of PWS', 'New PWS', 'Augmentation', 'Solar Based']
+SYNTHETIC_WORK_STATUS = ['Work not awarded', 'Ongoing', 'Financially completed']
+SYNTHETIC_PHYSICAL_STATUS = ['Physically completed', 'Ongoing but physically not completed', 'Work order not issued']
+SYNTHETIC_FUNDING = ['NRDWP', 'State and Others', 'JJM-PWS', 'JJM-Non-PWS']
+
+def build_synthetic_schemes_db(db_path, rows, seed=42, chunk_size=100000):
+    """A schemes table with the real schema and `rows` random schemes (the planner's columns filled in)."""
+    import sqlite3
+    import numpy as np
+    from data_loading_script import create_database_schema
+
+    create_database_schema(db_path)
+    rng = np.random.default_rng(seed)
+    divisions = [f"Division {i}" for i in range(120)]
+    conn = sqlite3.connect(db_path)
+    columns = [
+        'scheme_id', 'state_name', 'division_name', 'sanction_year', 'type_of_scheme', 'scheme_type',
+        'water_scheme_type', 'water_source_type', 'funding_source', 'work_status', 'physical_status',
+        'estimated_cost', 'total_expenditure', 'central_share_cost', 'fhtcs_planned', 'fhtcs_provided',
+        'physical_completion_progress'
+    ]
+    for start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        planned = rng.integers(0, 500, n)
+        progress = np.where(rng.random(n) < 0.2, 0.0, rng.random(n) * 100).round(2)
+        cost = (rng.lognormal(3, 1, n)).round(2)
+        chunk = zip(
+            (f"S{start + i}" for i in range(n)),
+            (SYNTHETIC_STATES[i] for i in rng.integers(0, len(SYNTHETIC_STATES), n)),
+            (divisions[i] for i in rng.integers(0, len(divisions), n)),
+            rng.integers(2009, 2025, n).tolist(),
+            (SYNTHETIC_TYPES[i] for i in rng.integers(0, len(SYNTHETIC_TYPES), n)),
+            (['New scheme', 'Retrofit', 'Augmentation'][i] for i in rng.integers(0, 3, n)),
+            (['SVS', 'MVS', 'Bulk Water Schemes'][i] for i in rng.integers(0, 3, n)),
+            (['Ground water', 'Surface water', 'Bulk Water Based', 'Other'][i] for i in rng.integers(0, 4, n)),
+            (SYNTHETIC_FUNDING[i] for i in rng.integers(0, len(SYNTHETIC_FUNDING), n)),
+            (SYNTHETIC_WORK_STATUS[i] for i in rng.integers(0, len(SYNTHETIC_WORK_STATUS), n)),
+            (SYNTHETIC_PHYSICAL_STATUS[i] for i in rng.integers(0, len(SYNTHETIC_PHYSICAL_STATUS), n)),
+            cost.tolist(), (cost * progress / 100).round(2).tolist(), (cost * 0.5).round(2).tolist(),
+            planned.tolist(), (planned * progress / 100).astype(int).tolist(), progress.tolist()
+        )
+        conn.executemany(f"INSERT INTO schemes ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", chunk)
+        conn.commit()
+    conn.close()
+
+def benchmark_specs():
+    """The visualization aggregates timed by the analytics benchmark, as (name, spec)."""
+    from src.routes.query_planner import LEGACY_QUERY_SPECS, legacy_spec, make_spec
+    specs = []
+    for query_type in LEGACY_QUERY_SPECS:
+        specs.append((query_type, legacy_spec(query_type)))
+        specs.append((f"{query_type} (state)", legacy_spec(query_type, {'state_name': 'haryana'})))
+    specs += [
+        ('top 5 divisions by expenditure', make_spec('division_name', 'total_expenditure', 'sum', top_n=5)),
+        ('fhtcs provided by funding source', make_spec('funding_source', 'fhtcs_provided', 'sum')),
+        ('avg progress by state', make_spec('state_name', 'physical_completion_progress', 'avg', positive_only=True)),
+        ('count by work status (state)', make_spec('work_status', filters={'state_name': 'madhya pradesh'})),
+        ('max cost by year (division)', make_spec('sanction_year', 'estimated_cost', 'max', filters={'division_name': 'division 7'}))
+    ]
+    return specs
+
+def results_match(a, b):
+    """Same keys in the same order and values equal up to floating point summation order."""
+    import math
+    return list(a) == list(b) and all(math.isclose(a[key], b[key], rel_tol=1e-9, abs_tol=1e-9) for key in a)
+
+def benchmark_analytics(args):
+    """Visualization aggregates on synthetic schemes tables: SQLite, SQLite with the rollup table,
+    columnar snapshot and the partitioned Parquet export.
+
+    Every backend answers the same specs; results are checked against plain SQLite.
+    """
+    import sqlite3
+    from src.routes.columnar_snapshot import ColumnarSnapshot
+    from src.routes.parquet_store import ParquetBackend, export_parquet
+    from src.routes.query_planner import QueryPlanner, build_rollup_table
+
+    specs = benchmark_specs()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            db_path = os.path.join(tmp_dir, f"schemes_{rows}.db")
+            start = time.perf_counter()
+            build_synthetic_schemes_db(db_path, rows)
+            print(f"\nBuilt {rows} synthetic schemes in {time.perf_counter() - start:.1f}s")
+            conn = sqlite3.connect(db_path)
+            start = time.perf_counter()
+            build_rollup_table(conn)
+            rollup_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            snapshot = ColumnarSnapshot.load(db_path)
+            snapshot_seconds = time.perf_counter() - start
+            parquet_dir = os.path.join(tmp_dir, f"schemes_{rows}_parquet")
+            start = time.perf_counter()
+            export_parquet(db_path, parquet_dir)
+            parquet_backend = ParquetBackend(parquet_dir)
+            parquet_backend.reload()
+            parquet_seconds = time.perf_counter() - start
+            parquet_bytes = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(parquet_dir) for name in names)
+
+            backends = {
+                'sqlite': (lambda spec, planner=QueryPlanner(use_rollup=False): planner.execute(conn, spec), 0.0, os.path.getsize(db_path)),
+                'sqlite+rollup': (lambda spec, planner=QueryPlanner(): planner.execute(conn, spec), rollup_seconds, os.path.getsize(db_path)),
+                'columnar': (snapshot.execute, snapshot_seconds, snapshot.nbytes()),
+                'parquet': (parquet_backend.execute, parquet_seconds, parquet_bytes)
+            }
+            expected = {name: backends['sqlite'][0](spec) for name, spec in specs}
+            for backend, (execute, load_seconds, size_bytes) in backends.items():
+                latencies_ms = []
+                mismatches = 0
+                for _ in range(args.repeat):
+                    for name, spec in specs:
+                        query_start = time.perf_counter()
+                        data = execute(spec)
+                        latencies_ms.append((time.perf_counter() - query_start) * 1000)
+                        mismatches += not results_match(data, expected[name])
+                results.append({
+                    'rows': rows,
+                    'backend': backend,
+                    'prepare_s': round(load_seconds, 2),
+                    'size_mb': round(size_bytes / 1024 ** 2, 1),
+                    **latency_summary(latencies_ms),
+                    'mismatches': mismatches
+                })
+            conn.close()
+    print_table("Visualization aggregates per backend", results)
+    return results
+
+# --- Entry point --- #
+
+def main():
+    parser = argparse.ArgumentParser(description="NIC Chatbot benchmarks")
+    parser.add_argument("--output", help="Also write results as JSON to this path")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    vector_parser = subparsers.add_parser("vector-store", help="Chroma vs memory-mapped index")
+    vector_parser.add_argument("--chroma-dir", default=DEFAULT_CHROMA_DIR)
+    vector_parser.add_argument("--memmap-dir", default=DEFAULT_MEMMAP_DIR)
+    vector_parser.add_argument("--qa-pairs", default=DEFAULT_QA_PAIRS_PATH)
+    vector_parser.add_argument("--limit", type=int, default=None, help="Use only the first N questions")
+    vector_parser.add_argument("--k", type=int, default=8)
+    vector_parser.add_argument("--fetch-k", type=int, default=20)
+    vector_parser.set_defaults(func=benchmark_vector_store)
+
+    quant_parser = subparsers.add_parser("quantization", help="float16/int8 index memory and recall@k")
+    quant_parser.add_argument("--memmap-dir", default=DEFAULT_MEMMAP_DIR)
+    quant_parser.add_argument("--qa-pairs", default=DEFAULT_QA_PAIRS_PATH)
+    quant_parser.add_argument("--limit", type=int, default=None, help="Use only the first N questions")
+    quant_parser.add_argument("--k", type=int, default=8)
+    quant_parser.add_argument("--rescore-factor", type=int, default=4)
+    quant_parser.set_defaults(func=benchmark_quantization)
+
+    rerank_parser = subparsers.add_parser("rerank", help="RAG latency with/without reranking")
+    rerank_parser.add_argument("--qa-pairs", default=DEFAULT_QA_PAIRS_PATH)
+    rerank_parser.add_argument("--limit", type=int, default=None, help="Use only the first N questions")
+    rerank_parser.set_defaults(func=benchmark_rerank)
+
+    extractive_parser = subparsers.add_parser("extractive", help="Extractive vs generative answer latency and quality")
+    extractive_parser.add_argument("--qa-pairs", default=DEFAULT_QA_PAIRS_PATH)
+    extractive_parser.add_argument("--limit", type=int, default=None, help="Use only the first N questions")
+    extractive_parser.set_defaults(func=benchmark_extractive)
+
+    workers_parser = subparsers.add_parser("workers", help="Shared vs per-worker (USS) memory of a running pre-fork server")
+    workers_parser.add_argument("--pid", type=int, required=True, help="PID of the gunicorn master")
+    workers_parser.add_argument("--url", default=None, help="Send warm-up chat requests first, e.g. http://localhost:5000/api/chat")
+    workers_parser.add_argument("--qa-pairs", default=DEFAULT_QA_PAIRS_PATH)
+    workers_parser.add_argument("--requests", type=int, default=20, help="Number of warm-up requests")
+    workers_parser.set_defaults(func=benchmark_workers)
+
+    router_parser = subparsers.add_parser("router", help="Query router accuracy, confusion matrix and latency")
+    router_parser.add_argument("--data", nargs="+", default=[DEFAULT_ROUTER_DATA_PATH], help="Labelled JSONL files")
+    router_parser.add_argument("--csv", default=DEFAULT_SCHEMES_CSV_PATH, help="Schemes CSV the NLU loads locations from")
+    router_parser.add_argument("--folds", type=int, default=5)
+    router_parser.set_defaults(func=benchmark_router)
+
+    analytics_parser = subparsers.add_parser("analytics", help="SQLite vs rollup vs columnar snapshot vs Parquet aggregation latency")
+    analytics_parser.add_argument("--rows", type=int, nargs="+", default=[100000, 5000000], help="Synthetic table sizes")
+    analytics_parser.add_argument("--repeat", type=int, default=5, help="Times each query is run per backend")
+    analytics_parser.set_defaults(func=benchmark_analytics)
+
+    args = parser.parse_args()
+    print(f"=== NIC Chatbot Benchmark: {args.benchmark} ===")
+    print(f"Started at: {datetime.now()}")
+    results = args.func(args)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'benchmark': args.benchmark, 'run_at': datetime.now().isoformat(), 'results': results}, file, indent=2)
+        print(f"\nResults saved to: {args.output}")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
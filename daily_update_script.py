@@ -18,6 +18,16 @@ import json
 import requests
 from pathlib import Path
 
+# Backend modules shared with the chatbot
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "nic-chatbot-backend"))
+from src.routes.query_planner import build_rollup_table
+from src.routes.fhtc_coverage import build_coverage_table
+from src.routes.parquet_store import export_schemes_parquet
+from src.routes.scheme_dates import create_date_indexes, normalize_stored_dates, parse_date_columns
+from src.routes.scheme_search import create_search_index
+from src.routes.daily_metrics import compute_daily_metrics, save_daily_metrics
+from src.routes.data_versions import component_path, new_version, publish_version, read_current, version_dir
+
 def update_csv_data(new_csv_path, db_path):
     """
     Update the database with new CSV data
@@ -95,9 +105,14 @@ def update_csv_data(new_csv_path, db_path):
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
         
+        # Dates as ISO 'YYYY-MM-DD' (NULL when missing), so they compare and index correctly
+        df = parse_date_columns(df)
+        
         # Connect to database
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
+        # Databases loaded before scheme search get the index here; its triggers then follow the updates below
+        create_search_index(conn)
         
         # Get current record count
         cursor.execute('SELECT COUNT(*) FROM schemes')
@@ -138,6 +153,12 @@ def update_csv_data(new_csv_path, db_path):
                 continue
         
         conn.commit()
+        # Rows loaded before dates were stored as ISO, then the indexes date questions use
+        normalize_stored_dates(conn)
+        create_date_indexes(conn)
+        build_rollup_table(conn)
+        build_coverage_table(conn)
+        export_schemes_parquet(db_path)
         
         # Get new record count
         cursor.execute('SELECT COUNT(*) FROM schemes')
@@ -166,6 +187,42 @@ def update_csv_data(new_csv_path, db_path):
         print(f"Error updating CSV data: {str(e)}")
         return {'error': str(e)}
 
+def publish_csv_update(new_csv_path, releases_dir, db_path):
+    """
+    Apply a CSV update to a copy of the served database and publish it as a new data version
+
+    The running chatbot keeps answering from the current database while the copy is
+    updated, and switches to the new version once it is published.
+
+    Args:
+        new_csv_path (str): Path to the new CSV file
+        releases_dir (str): Directory holding the published data versions
+        db_path (str): Database to start from when no version has been published yet
+
+    Returns:
+        dict: Update results, with the published version
+    """
+    current_db_path = component_path(releases_dir, read_current(releases_dir), "schemes_db") or db_path
+    version = new_version()
+    new_db_path = os.path.join(version_dir(releases_dir, version), "schemes.db")
+
+    # The backup API gives a consistent copy even while the chatbot is reading the database
+    source = sqlite3.connect(current_db_path)
+    target = sqlite3.connect(new_db_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    results = update_csv_data(new_csv_path, new_db_path)
+    if 'error' in results:
+        print(f"ERROR: Data version {version} not published")
+        return results
+    publish_version(releases_dir, version, {"schemes_db": new_db_path})
+    results['version'] = version
+    return results
+
 def update_knowledge_base_from_api():
     """
     Update knowledge base from NIC's RAG API
@@ -201,62 +258,51 @@ def update_knowledge_base_from_api():
         print(f"Error updating knowledge base: {str(e)}")
         return {'error': str(e)}
 
-def generate_daily_report(db_path, output_path):
+def generate_daily_report(db_path, output_path, metrics_db_path=None):
     """
     Generate a daily report of system status and data statistics
     
+    All figures come from a single grouped scan of the schemes table, broken down
+    per state and division. With metrics_db_path they are also appended to the
+    daily_metrics history the chatbot answers trend questions from.
+    
     Args:
         db_path (str): Path to the SQLite database file
         output_path (str): Path to save the report
+        metrics_db_path (str): Path to the SQLite database holding the daily_metrics history
     
     Returns:
         dict: Report data
     """
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Get basic statistics
-        cursor.execute('SELECT COUNT(*) FROM schemes')
-        total_schemes = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT state_name) FROM schemes')
-        unique_states = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM schemes WHERE work_status = "Ongoing"')
-        ongoing_schemes = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM schemes WHERE work_status = "Financially completed"')
-        completed_schemes = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT SUM(estimated_cost) FROM schemes')
-        total_estimated_cost = cursor.fetchone()[0] or 0
         
-        cursor.execute('SELECT SUM(total_expenditure) FROM schemes')
-        total_expenditure = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT AVG(physical_completion_progress) FROM schemes WHERE physical_completion_progress > 0')
-        avg_progress = cursor.fetchone()[0] or 0
-        
-        # Get recent updates (schemes updated in last 30 days)
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%d-%m-%Y')
-        cursor.execute('SELECT COUNT(*) FROM schemes WHERE updated_on >= ?', (thirty_days_ago,))
-        recent_updates = cursor.fetchone()[0]
+        # Recent updates: schemes updated in the last 30 days (updated_on is an ISO date)
+        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        metrics = compute_daily_metrics(conn, thirty_days_ago)
         
         conn.close()
         
+        overall = metrics['all']
         report = {
             'report_date': datetime.now().isoformat(),
             'database_statistics': {
-                'total_schemes': total_schemes,
-                'unique_states': unique_states,
-                'ongoing_schemes': ongoing_schemes,
-                'completed_schemes': completed_schemes,
-                'total_estimated_cost_lakhs': round(total_estimated_cost, 2),
-                'total_expenditure_lakhs': round(total_expenditure, 2),
-                'average_completion_progress': round(avg_progress, 2),
-                'recent_updates_30_days': recent_updates
+                'total_schemes': overall['total_schemes'],
+                'unique_states': len([state for state in metrics['states'] if state]),
+                'ongoing_schemes': overall['ongoing_schemes'],
+                'completed_schemes': overall['completed_schemes'],
+                'total_estimated_cost_lakhs': round(overall['total_estimated_cost'], 2),
+                'total_expenditure_lakhs': round(overall['total_expenditure'], 2),
+                'average_completion_progress': round(overall['average_progress'], 2),
+                'recent_updates_30_days': overall['recent_updates']
             },
+            'state_statistics': {
+                state: report_figures(values) for state, values in sorted(metrics['states'].items())
+            },
+            'division_statistics': [
+                {'state_name': state, 'division_name': division, **report_figures(values)}
+                for (state, division), values in sorted(metrics['divisions'].items())
+            ],
             'system_health': {
                 'database_accessible': True,
                 'data_freshness': 'current',
@@ -268,10 +314,18 @@ def generate_daily_report(db_path, output_path):
         with open(output_path, 'w') as file:
             json.dump(report, file, indent=2)
         
+        if metrics_db_path:
+            metrics_conn = sqlite3.connect(metrics_db_path)
+            try:
+                save_daily_metrics(metrics_conn, datetime.now().strftime('%Y-%m-%d'), metrics)
+            finally:
+                metrics_conn.close()
+            print(f"Daily metrics recorded in: {metrics_db_path}")
+        
         print(f"Daily report generated: {output_path}")
-        print(f"Total schemes: {total_schemes}")
-        print(f"Ongoing schemes: {ongoing_schemes}")
-        print(f"Average progress: {avg_progress:.2f}%")
+        print(f"Total schemes: {overall['total_schemes']}")
+        print(f"Ongoing schemes: {overall['ongoing_schemes']}")
+        print(f"Average progress: {overall['average_progress']:.2f}%")
         
         return report
         
@@ -279,6 +333,18 @@ def generate_daily_report(db_path, output_path):
         print(f"Error generating daily report: {str(e)}")
         return {'error': str(e)}
 
+def report_figures(metrics):
+    """The JSON report's figures for one state or division."""
+    return {
+        'total_schemes': metrics['total_schemes'],
+        'ongoing_schemes': metrics['ongoing_schemes'],
+        'completed_schemes': metrics['completed_schemes'],
+        'total_estimated_cost_lakhs': round(metrics['total_estimated_cost'], 2),
+        'total_expenditure_lakhs': round(metrics['total_expenditure'], 2),
+        'average_completion_progress': round(metrics['average_progress'], 2),
+        'recent_updates_30_days': metrics['recent_updates']
+    }
+
 def main():
     """
     Main function for daily data updates
@@ -289,6 +355,9 @@ def main():
     # Define paths
     base_dir = "/home/ubuntu"
     db_path = os.path.join(base_dir, "nic-chatbot-backend", "src", "database", "schemes.db")
+    releases_dir = os.path.join(base_dir, "data", "releases")
+    new_csv_path = os.path.join(base_dir, "upload", "daily_schemes_update.csv")
+    metrics_db_path = os.path.join(base_dir, "data", "metrics.db")
     report_path = os.path.join(base_dir, "data", f"daily_report_{datetime.now().strftime('%Y%m%d')}.json")
     
     # Create reports directory if it doesn't exist
@@ -302,7 +371,13 @@ def main():
         print("\\n1. Checking for new CSV data...")
         # In production, you would check for new CSV files in a designated directory
         # or call an API to get the latest data
-        print("No new CSV data found (this is normal for demo)")
+        if os.path.exists(new_csv_path):
+            csv_result = publish_csv_update(new_csv_path, releases_dir, db_path)
+            if 'error' in csv_result:
+                print(f"ERROR: CSV update failed: {csv_result['error']}")
+                return False
+        else:
+            print("No new CSV data found (this is normal for demo)")
         
         # Step 2: Update knowledge base
         print("\\n2. Updating knowledge base...")
@@ -311,7 +386,9 @@ def main():
         
         # Step 3: Generate daily report
         print("\\n3. Generating daily report...")
-        report = generate_daily_report(db_path, report_path)
+        # Report on the data version the chatbot now serves
+        served_db_path = component_path(releases_dir, read_current(releases_dir), "schemes_db") or db_path
+        report = generate_daily_report(served_db_path, report_path, metrics_db_path)
         
         if 'error' not in report:
             print("\\n=== Daily Update Completed Successfully ===")
@@ -14,6 +14,7 @@ import pandas as pd
 import sqlite3
 import os
 import json
+import re
 from datetime import datetime
 import sys
 
@@ -23,6 +24,57 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
+# Backend modules shared with the chatbot (vector index format)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "nic-chatbot-backend"))
+from src.routes.vector_index import MemmapVectorStore
+from src.routes.query_planner import build_rollup_table
+from src.routes.fhtc_coverage import build_coverage_table
+from src.routes.parquet_store import export_schemes_parquet
+from src.routes.scheme_dates import create_date_indexes, parse_date_columns
+from src.routes.scheme_search import create_search_index, drop_search_index
+from src.routes.data_versions import new_version, publish_version, version_dir
+
+# Must match the embedding model used by the chatbot backend (src/routes/chatbot.py),
+# otherwise stored vectors and query vectors live in different spaces.
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+FAQ_COLLECTION_NAME = "faq_questions"
+# Knowledge base chunks are tagged with the program they describe and stored in one
+# collection per program (PROGRAM_COLLECTION_PREFIX + program) so that questions about
+# a single scheme only search that scheme's chunks. Chunks matching neither scheme are "ddws".
+PROGRAM_COLLECTION_PREFIX = "kb_"
+PROGRAM_KEYWORDS = {
+    'jjm': ['jal jeevan', 'jjm', 'fhtc', 'tap connection', 'har ghar jal', 'drinking water supply', 'piped water'],
+    'sbm': ['swachh bharat', 'sbm', 'odf', 'open defecation', 'toilet', 'gobardhan', 'solid waste', 'faecal sludge', 'fstp']
+}
+
+# Storage precision of the memory-mapped index: "float32", "float16" or "int8" (per-vector scales).
+# Compressed indexes keep a float32 copy on disk that is only read to rescore the top candidates.
+MEMMAP_INDEX_DTYPE = "float32"
+
+# Q&A documents mix several formats: "Q1: ... A1: ...", "Q1: ... A: ...", "Q: ... A: ..." and
+# numbered "1. ...? Answer: ..." items. Each question marker starts a pair and ends the previous one.
+QA_QUESTION_MARKER = re.compile(
+    r'\bQ\s*\d*\s*[:.)]'
+    r'|(?<![\w.])\d{1,3}\.\s+(?=(?:(?!\d{1,3}\.\s)[^?]){1,300}\?\s*Answer\s*[:.)-])'
+)
+QA_ANSWER_MARKER = re.compile(r'\b(?:A\s*\d+\s*[:.)]|A\s*[:)]|Answer\s*[:.)-])')
+QA_SECTION_RULE = re.compile(r'(?:\s*—-+){2,}.*', re.S)  # Dash rules between sections, and whatever follows them
+# Longer "pairs" are text the markers failed to split, not curated answers
+MAX_QA_QUESTION_CHARS = 300
+MAX_QA_ANSWER_CHARS = 2000
+
+def get_embeddings():
+    """
+    Creates the sentence embedding model shared by all knowledge base indexes.
+    """
+    model_kwargs = {'device': 'cpu'}
+    encode_kwargs = {'normalize_embeddings': True}
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs=model_kwargs,
+        encode_kwargs=encode_kwargs
+    )
+
 def create_database_schema(db_path):
     """
     Creates the SQLite database schema if it doesn't exist.
@@ -70,6 +122,7 @@ def create_database_schema(db_path):
         )
     """)
     conn.commit()
+    create_date_indexes(conn)
     conn.close()
     print(f"Database schema created at: {db_path}")
 
@@ -140,11 +193,15 @@ def load_csv_data(csv_path, db_path):
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
+        # Dates as ISO 'YYYY-MM-DD' (NULL when missing), so they compare and index correctly
+        df = parse_date_columns(df)
+
         # Connect to database and insert data
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
 
-        # Clear existing data
+        # Clear existing data; the search index is rebuilt once all rows are in
+        drop_search_index(conn)
         cursor.execute('DELETE FROM schemes')
 
         # Insert new data (handle duplicates by ignoring them)
@@ -161,7 +218,15 @@ def load_csv_data(csv_path, db_path):
                 continue
 
         conn.commit()
+        # Scheme name/ID search; its triggers keep it up to date through the daily updates
+        create_search_index(conn)
+        # Pre-aggregated table the chatbot's query planner answers most analytics from
+        build_rollup_table(conn)
+        # Tap connection coverage per state, division and sanction year, for coverage questions
+        build_coverage_table(conn)
         conn.close()
+        # Partitioned copy the chatbot reads with ANALYTICS_BACKEND=parquet
+        export_schemes_parquet(db_path)
         print(f"Successfully loaded {len(df)} records into database")
         return True
     except Exception as e:
@@ -169,9 +234,26 @@ def load_csv_data(csv_path, db_path):
         print("ERROR: No records were loaded from CSV")
         return False
 
-def process_knowledge_base(pdf_path, persist_directory):
+def classify_program(text):
+    """
+    Returns the program ('jjm', 'sbm' or 'ddws') a piece of text is mostly about.
+    """
+    text_lower = text.lower()
+    counts = {
+        program: sum(len(re.findall(r'\b' + re.escape(keyword) + r'\b', text_lower)) for keyword in keywords)
+        for program, keywords in PROGRAM_KEYWORDS.items()
+    }
+    best_program = max(counts, key=counts.get)
+    if counts[best_program] == 0 or list(counts.values()).count(counts[best_program]) > 1:
+        return 'ddws'
+    return best_program
+
+def process_knowledge_base(pdf_path, persist_directory, memmap_index_dir=None, memmap_dtype="float32"):
     """
     Processes the PDF knowledge base using Langchain to create a vector store.
+
+    If memmap_index_dir is given, the same chunks are also written as a
+    memory-mapped exact index (VECTOR_STORE_BACKEND=memmap in the chatbot).
     """
     try:
         # Load PDF documents
@@ -184,28 +266,188 @@ def process_knowledge_base(pdf_path, persist_directory):
         texts = text_splitter.split_documents(documents)
         print(f"Split into {len(texts)} text chunks")
 
+        for index, doc in enumerate(texts):
+            doc.metadata['program'] = classify_program(doc.page_content)
+            # Stable id used by the chatbot's reranker score cache
+            doc.metadata['chunk_id'] = f"{os.path.basename(pdf_path)}:{doc.metadata.get('page', 0)}:{index}"
+        program_counts = {}
+        for doc in texts:
+            program_counts[doc.metadata['program']] = program_counts.get(doc.metadata['program'], 0) + 1
+        print(f"Chunks per program: {program_counts}")
+
         # Create embeddings and vector store
         # Using a local model for embeddings to avoid API keys and external calls
         # You might need to download the model if it's not cached locally
-        model_name = "sentence-transformers/all-MiniLM-L6-v2"
-        model_kwargs = {'device': 'cpu'}
-        encode_kwargs = {'normalize_embeddings': False}
-        embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
-        )
+        embeddings = get_embeddings()
 
         # Create Chroma vector store and persist it
         # This will create a directory with the vector store data
         vectordb = Chroma.from_documents(documents=texts, embedding=embeddings, persist_directory=persist_directory)
         vectordb.persist()
         print(f"Processed knowledge base: {len(texts)} chunks saved to {persist_directory}")
+
+        # One collection per program for scheme-routed retrieval
+        for program, count in program_counts.items():
+            collection_name = PROGRAM_COLLECTION_PREFIX + program
+            Chroma(
+                collection_name=collection_name,
+                persist_directory=persist_directory,
+                embedding_function=embeddings
+            ).delete_collection()
+            Chroma.from_documents(
+                documents=[doc for doc in texts if doc.metadata['program'] == program],
+                embedding=embeddings,
+                collection_name=collection_name,
+                persist_directory=persist_directory
+            )
+            print(f"  {collection_name}: {count} chunks")
+
+        if memmap_index_dir:
+            MemmapVectorStore.from_documents(
+                texts, embeddings, persist_directory=memmap_index_dir, dtype=memmap_dtype,
+                partition_key='program'
+            )
+            print(f"Memory-mapped index ({memmap_dtype}): {len(texts)} chunks saved to {memmap_index_dir}")
         return True
     except Exception as e:
         print(f"Error processing knowledge base: {e}")
         return False
 
+def parse_qa_pairs(text):
+    """
+    Splits Q&A text into (offset, question, answer) tuples, in document order.
+
+    An answer ends at the next question marker or section rule. A question
+    without an answer marker is answered by the text after its "?"; when
+    nothing follows (an alternative phrasing directly before the next
+    question), it shares the next question's answer.
+    """
+    markers = list(QA_QUESTION_MARKER.finditer(text))
+    pairs = []
+    unanswered = []
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        block = QA_SECTION_RULE.sub('', text[marker.end():end])
+        answer_marker = QA_ANSWER_MARKER.search(block)
+        if answer_marker:
+            question, answer = block[:answer_marker.start()], block[answer_marker.end():]
+        else:
+            question, _, answer = block.partition('?')
+            question += '?'
+        question, answer = question.strip(), answer.strip()
+        if not question or len(question) > MAX_QA_QUESTION_CHARS:
+            unanswered = []
+            continue
+        if not answer:
+            unanswered.append((marker.start(), question))
+            continue
+        if len(answer) <= MAX_QA_ANSWER_CHARS:
+            pairs.extend((offset, alternative, answer) for offset, alternative in unanswered)
+            pairs.append((marker.start(), question, answer))
+        unanswered = []
+    return pairs
+
+def question_key(question):
+    """Normalized question text, to spot the same question repeated across documents."""
+    return " ".join(re.findall(r'\w+', question.lower()))
+
+def extract_qa_pairs(pdf_path):
+    """
+    Extracts question/answer pairs from a Q&A style PDF document.
+    """
+    loader = PyPDFLoader(pdf_path)
+    pages = loader.load()
+
+    # Join all pages so pairs spanning a page break are kept intact,
+    # remembering where each page starts to recover the page number
+    full_text = ""
+    page_offsets = []
+    for page in pages:
+        page_offsets.append((len(full_text), page.metadata.get('page', 0)))
+        full_text += " ".join(page.page_content.split()) + " "
+
+    qa_pairs = []
+    for start, question, answer in parse_qa_pairs(full_text):
+        page_number = 0
+        for offset, page in page_offsets:
+            if offset > start:
+                break
+            page_number = page
+        qa_pairs.append({
+            'question': question,
+            'answer': answer,
+            'source': pdf_path,
+            'page': page_number,
+            'program': classify_program(question + " " + answer)
+        })
+    return qa_pairs
+
+def process_faq_index(qa_pdf_paths, persist_directory, qa_pairs_path, memmap_index_dir=None):
+    """
+    Builds a dedicated embedding index over the questions of curated Q&A pairs.
+
+    The answer is stored as metadata so the chatbot can return it verbatim
+    when a user question closely matches a known one. The extracted pairs are
+    also written to qa_pairs_path for evaluation.
+    """
+    try:
+        qa_pairs = []
+        seen_questions = set()
+        for pdf_path in qa_pdf_paths:
+            if not os.path.exists(pdf_path):
+                print(f"Warning: Q&A document not found, skipping: {pdf_path}")
+                continue
+            pairs = extract_qa_pairs(pdf_path)
+            # The Q&A documents overlap; the first occurrence of a question wins
+            new_pairs = []
+            for pair in pairs:
+                key = question_key(pair['question'])
+                if key not in seen_questions:
+                    seen_questions.add(key)
+                    new_pairs.append(pair)
+            print(f"Extracted {len(pairs)} Q&A pairs from {os.path.basename(pdf_path)} ({len(new_pairs)} new)")
+            qa_pairs.extend(new_pairs)
+
+        if not qa_pairs:
+            print("No Q&A pairs found, FAQ index not built")
+            return False
+
+        embeddings = get_embeddings()
+
+        # Drop any previous FAQ collection so re-runs don't duplicate entries
+        Chroma(
+            collection_name=FAQ_COLLECTION_NAME,
+            persist_directory=persist_directory,
+            embedding_function=embeddings
+        ).delete_collection()
+
+        # Cosine space so relevance scores are directly comparable to a threshold
+        Chroma.from_texts(
+            texts=[pair['question'] for pair in qa_pairs],
+            embedding=embeddings,
+            metadatas=qa_pairs,
+            collection_name=FAQ_COLLECTION_NAME,
+            persist_directory=persist_directory,
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+
+        if memmap_index_dir:
+            MemmapVectorStore.from_texts(
+                [pair['question'] for pair in qa_pairs],
+                embeddings,
+                metadatas=qa_pairs,
+                persist_directory=os.path.join(memmap_index_dir, "faq")
+            )
+
+        with open(qa_pairs_path, 'w', encoding='utf-8') as file:
+            json.dump(qa_pairs, file, indent=2, ensure_ascii=False)
+
+        print(f"Processed FAQ index: {len(qa_pairs)} questions saved to {persist_directory}")
+        return True
+    except Exception as e:
+        print(f"Error processing FAQ index: {e}")
+        return False
+
 def validate_data(db_path):
     """
     Performs basic validation on the loaded data.
@@ -253,16 +495,26 @@ def main():
     # base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".")) # Current directory
     csv_path = os.path.join(base_dir, "upload", "List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv")
     pdf_path = os.path.join(base_dir, "upload", "KnowledgeBase-DialogFlow.pdf")
-    db_dir = os.path.join(base_dir, "nic-chatbot-backend", "src", "database")
+    qa_pdf_paths = [
+        os.path.join(base_dir, "upload", "DRAFT - SBM JJM - Q n A.pdf"),
+        os.path.join(base_dir, "upload", "DRAFT MODEL QnA 02 24062025.pdf")
+    ]
+    # Everything is built into a new data version next to the one being served, and
+    # published at the end; the running chatbot switches over without a restart
+    releases_dir = os.path.join(base_dir, "data", "releases")
+    version = new_version()
+    db_dir = version_dir(releases_dir, version)
     db_path = os.path.join(db_dir, "schemes.db")
-    knowledge_base_persist_dir = os.path.join(base_dir, "data", "chroma_db")
+    knowledge_base_persist_dir = os.path.join(db_dir, "chroma_db")
+    qa_pairs_path = os.path.join(base_dir, "data", "qa_pairs.json")
+    memmap_index_dir = os.path.join(db_dir, "memmap_index")
 
     # Create necessary directories
-    os.makedirs(db_dir, exist_ok=True)
     os.makedirs(knowledge_base_persist_dir, exist_ok=True)
 
     print(f"CSV Path: {csv_path}")
     print(f"PDF Path: {pdf_path}")
+    print(f"Data Version: {version}")
     print(f"Database Path: {db_path}")
     print(f"Knowledge Base Persist Directory: {knowledge_base_persist_dir}")
 
@@ -276,13 +528,24 @@ def main():
 
     # Step 3: Process knowledge base (PDF)
     print("\n3. Processing knowledge base (PDF) with Langchain...")
-    kb_process_success = process_knowledge_base(pdf_path, knowledge_base_persist_dir)
+    kb_process_success = process_knowledge_base(pdf_path, knowledge_base_persist_dir, memmap_index_dir, MEMMAP_INDEX_DTYPE)
+
+    # Step 4: Build FAQ answer index from the Q&A documents
+    print("\n4. Building FAQ answer index...")
+    faq_process_success = process_faq_index(qa_pdf_paths, knowledge_base_persist_dir, qa_pairs_path, memmap_index_dir)
 
-    # Step 4: Validate data loading
-    print("\n4. Validating data loading...")
+    # Step 5: Validate data loading
+    print("\n5. Validating data loading...")
     data_validation_success = validate_data(db_path)
 
+    if not faq_process_success:
+        print("Warning: FAQ index unavailable, all questions will go through RAG generation")
+
     if csv_load_success and kb_process_success and data_validation_success:
+        components = {"schemes_db": db_path, "chroma_db": knowledge_base_persist_dir}
+        if os.path.exists(memmap_index_dir):
+            components["memmap_index"] = memmap_index_dir
+        publish_version(releases_dir, version, components)
         print("\n=== Data Loading Completed Successfully ===")
         print(f"Completed at: {datetime.now()}")
         return True
@@ -0,0 +1,45 @@
+# Production entry point, run from nic-chatbot-backend/:
+#
+#     gunicorn -c gunicorn.conf.py src.main:app
+#
+# The app (NLU, embeddings, vector store, LLM) is loaded once in the master and the
+# workers are forked from it, so model weights are shared copy-on-write and each
+# worker only pays for its own activations and request state.
+import gc
+import os
+
+TORCH_THREADS_PER_WORKER = int(os.environ.get("TORCH_THREADS_PER_WORKER", "1"))
+# Must be set before the preloaded app imports torch and the tokenizers
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS_PER_WORKER))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_THREADS_PER_WORKER))
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = 120
+preload_app = True
+
+
+def when_ready(server):
+    """Master, app loaded, before the first fork: share the model weights and freeze the heap."""
+    from src.routes import chatbot
+    chatbot.knowledge_base.prepare_for_fork()
+    # Threads do not survive the fork; each worker watches for new data versions itself
+    chatbot.version_watcher.stop()
+    # Keep the workers' garbage collector from touching (and so copying) every object loaded so far
+    gc.collect()
+    gc.freeze()
+    server.log.info("Models loaded and shared; forking %s workers", workers)
+
+
+def post_fork(server, worker):
+    """Worker: reopen handles the master created; SQLite and Chroma connections must not cross a fork."""
+    from src.main import app, db
+    from src.routes import chatbot
+    with app.app_context():
+        db.engine.dispose(close=False)
+    chatbot.knowledge_base.after_fork(TORCH_THREADS_PER_WORKER)
+    chatbot.version_watcher.start()
+    server.log.info("Worker %s ready (torch threads: %s)", worker.pid, TORCH_THREADS_PER_WORKER)
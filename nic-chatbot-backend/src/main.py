@@ -43,4 +43,5 @@ def serve(path):
 
 
 if __name__ == '__main__':
+    # Development server; in production run gunicorn with gunicorn.conf.py
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,105 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot get a slot: the wait queue is full or the wait timed out."""
+
+    def __init__(self, limiter_name: str, reason: str, retry_after: int):
+        super().__init__(f"{limiter_name} is overloaded ({reason})")
+        self.limiter_name = limiter_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Caps concurrent requests on an expensive path, with a bounded wait queue and a max wait time.
+
+    Requests beyond max_concurrent wait for a slot; once max_queue requests are
+    already waiting, or a request has waited max_wait_seconds, it is rejected
+    immediately so the server sheds load instead of piling up threads and memory.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait_seconds: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        self._wait_ms = deque(maxlen=500)
+        self._service_ms = deque(maxlen=500)
+        self.counters = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0
+        }
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of the block; raises AdmissionRejected if none is available."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release((time.monotonic() - start) * 1000)
+
+    def acquire(self):
+        start = time.monotonic()
+        with self._cond:
+            if self.in_flight >= self.max_concurrent or self.waiting > 0:
+                if self.waiting >= self.max_queue:
+                    self.counters["rejected_queue_full"] += 1
+                    raise AdmissionRejected(self.name, "queue_full", self._retry_after())
+
+                self.waiting += 1
+                try:
+                    deadline = start + self.max_wait_seconds
+                    while self.in_flight >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.counters["rejected_timeout"] += 1
+                            # Pass on a wake-up this waiter may have consumed
+                            self._cond.notify()
+                            raise AdmissionRejected(self.name, "wait_timeout", self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            self._wait_ms.append((time.monotonic() - start) * 1000)
+
+    def release(self, service_ms: float = None):
+        with self._cond:
+            self.in_flight -= 1
+            if service_ms is not None:
+                self._service_ms.append(service_ms)
+            self._cond.notify()
+
+    def _retry_after(self) -> int:
+        """Seconds until the current queue should have drained, based on recent service times."""
+        if self._service_ms:
+            avg_service_seconds = sum(self._service_ms) / len(self._service_ms) / 1000
+            return max(1, math.ceil(avg_service_seconds * (self.waiting + 1) / self.max_concurrent))
+        return max(1, math.ceil(self.max_wait_seconds))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            waits = sorted(self._wait_ms)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "wait_p50_ms": round(waits[len(waits) // 2], 1) if waits else 0.0,
+                "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+                "wait_max_ms": round(waits[-1], 1) if waits else 0.0,
+                **self.counters
+            }
@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class ChartJobQueue:
+    """Renders charts on background threads so /api/chat can answer before the image exists.
+
+    Job state is kept as small JSON files in jobs_dir rather than in memory, so any
+    worker process of the server can answer a poll for a job another one started.
+    """
+
+    def __init__(self, render: Callable, jobs_dir: str, workers: int = 2, max_pending: int = 32, ttl_seconds: float = 600):
+        self.render = render
+        self.jobs_dir = jobs_dir
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chart")
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._render_ms = deque(maxlen=500)
+        self.counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0
+        }
+
+    def submit(self, *args) -> Optional[str]:
+        """Queues render(*args) and returns the job id, or None when too many renders are already pending."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.counters["rejected"] += 1
+                return None
+            self.pending += 1
+            self.counters["submitted"] += 1
+
+        job_id = uuid.uuid4().hex
+        self._write(job_id, {"id": job_id, "status": "pending", "created_at": datetime.now().isoformat()})
+        self.executor.submit(self._run, job_id, args)
+        self._expire_old_jobs()
+        return job_id
+
+    def get(self, job_id: str, wait_seconds: float = 0) -> Optional[Dict]:
+        """The job's state, waiting up to wait_seconds for a pending job to finish; None if unknown or expired."""
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            job = self._read(job_id)
+            if job is None or job["status"] != "pending" or time.monotonic() >= deadline:
+                return job
+            time.sleep(0.1)
+
+    def _run(self, job_id, args):
+        start = time.monotonic()
+        job = {"id": job_id, "status": "failed"}
+        try:
+            image = self.render(*args)
+            if image:
+                job = {"id": job_id, "status": "done", "visualization": image}
+            else:
+                job["error"] = "The chart could not be generated."
+        except Exception as e:
+            print(f"ERROR: Chart job {job_id} failed: {e}")
+            job["error"] = "The chart could not be generated."
+        job["finished_at"] = datetime.now().isoformat()
+        self._write(job_id, job)
+
+        with self._lock:
+            self.pending -= 1
+            self.counters["completed" if job["status"] == "done" else "failed"] += 1
+            self._render_ms.append((time.monotonic() - start) * 1000)
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _write(self, job_id, job):
+        tmp_path = self._path(job_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(job, file)
+        os.replace(tmp_path, self._path(job_id))
+
+    def _read(self, job_id):
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _expire_old_jobs(self):
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            for entry in os.scandir(self.jobs_dir):
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+        except OSError as e:
+            print(f"WARNING: Could not expire old chart jobs: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            renders = sorted(self._render_ms)
+            return {
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "render_p50_ms": round(renders[len(renders) // 2], 1) if renders else 0.0,
+                "render_p95_ms": round(renders[min(len(renders) - 1, int(len(renders) * 0.95))], 1) if renders else 0.0,
+                **self.counters
+            }
@@ -1,380 +1,555 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import os
+import json
 import sqlite3
 import matplotlib
 matplotlib.use('Agg') # Use non-interactive backend for server environments
 import matplotlib.pyplot as plt
 import io
 import base64
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
+from itertools import chain
 
 # Import our custom NLU processor
 from src.routes.nlu_processor_updated import NLUProcessor
-
-# Langchain imports
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from langchain_community.llms import HuggingFacePipeline
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM, AutoModelForSeq2SeqLM
-import torch
+from src.routes.admission import AdmissionLimiter, AdmissionRejected
+from src.routes.fallback_responses import get_fallback_response
+from src.routes.query_router import DATA_ONLY_INTENTS, QueryLog, heuristic_route, load_router
+from src.routes.chart_jobs import ChartJobQueue
+from src.routes.data_versions import VersionWatcher, component_path, read_current
+from src.routes.result_cache import QueryResultCache
+from src.routes.daily_metrics import progress_trend
+from src.routes.scheme_dates import count_by_period, last_days_range, year_range
+from src.routes.fhtc_coverage import COVERAGE_DIMENSIONS, coverage_by
+from src.routes.scheme_search import search_schemes
+from src.routes.scheme_listing import (
+    LIST_FILTERS, LIST_FORMATS, MAX_PAGE_LIMIT, encode_pages, fetch_page, iter_pages, scheme_columns
+)
+from src.routes.query_planner import (
+    ANALYTICS_QUERY_TYPE, PlanError, QueryPlanner, describe_spec, filter_clause,
+    legacy_query_type, legacy_spec, spec_from_analytics
+)
 
 # --- Configuration --- #
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DB_PATH = os.path.join(BASE_DIR, "database", "schemes.db")
-KNOWLEDGE_BASE_PERSIST_DIR = os.path.join(BASE_DIR, "..", "..", "data", "chroma_db")
+# Optional separate model server process (see model_server.py), as a unix socket path or host:port.
+# When set, this process loads no models and forwards knowledge base queries to the server.
+MODEL_SERVER_ADDRESS = os.environ.get("MODEL_SERVER_ADDRESS")
+# Shared secret for the model server connection; required whenever MODEL_SERVER_ADDRESS is set
+MODEL_SERVER_AUTHKEY = os.environ.get("MODEL_SERVER_AUTHKEY", "").encode("utf-8")
+MODEL_SERVER_TIMEOUT_SECONDS = 30
+# Admission control: concurrent requests per path, how many may wait for a slot and for how long.
+# Beyond that, /api/chat answers 503 with Retry-After instead of queueing without bound.
+SQL_MAX_CONCURRENT = 8
+SQL_MAX_QUEUE = 32
+SQL_MAX_WAIT_SECONDS = 5
+RAG_MAX_CONCURRENT = 2
+RAG_MAX_QUEUE = 8
+RAG_MAX_WAIT_SECONDS = 10
+# /api/schemes streams hold their slot until the last row is sent
+EXPORT_MAX_CONCURRENT = 2
+EXPORT_MAX_QUEUE = 4
+EXPORT_MAX_WAIT_SECONDS = 5
+# Below this routing confidence /api/chat runs the data and knowledge paths concurrently and
+# merges whatever finishes before the deadline, instead of guessing one of them
+ROUTE_CONFIDENCE_THRESHOLD = 0.7
+PARALLEL_DEADLINE_SECONDS = float(os.environ.get("PARALLEL_DEADLINE_SECONDS", "20"))
+PARALLEL_WORKERS = 8
+# Trained router (python -m src.routes.query_router); heuristic routing is used when it is missing
+QUERY_ROUTER_PATH = os.environ.get("QUERY_ROUTER_PATH", os.path.join(BASE_DIR, "..", "..", "data", "query_router.json"))
+# Async charts: /api/chat answers with the numbers and a chart job id, the image is rendered in the
+# background and fetched from /api/charts/jobs/<id>. Clients opt in per request with "async_chart".
+CHART_ASYNC = os.environ.get("CHART_ASYNC", "0") == "1"
+CHART_JOBS_DIR = os.environ.get("CHART_JOBS_DIR", os.path.join(tempfile.gettempdir(), "nic-chatbot-chart-jobs"))
+CHART_WORKERS = 2
+CHART_MAX_PENDING = 32  # Beyond this, charts are rendered inline again
+CHART_JOB_TTL_SECONDS = 600
+CHART_JOB_MAX_WAIT_SECONDS = 30  # Longest long-poll on /api/charts/jobs/<id>?wait=N
+# /api/chat/batch: most messages per request, and knowledge base questions answered per embedding batch
+BATCH_MAX_MESSAGES = 1000
+BATCH_KB_CHUNK_SIZE = 16
+# Where data questions are answered: "sqlite" (query planner over the database), "columnar"
+# (in-memory NumPy snapshot of the schemes table, reloaded when the database file changes)
+# or "parquet" (pyarrow over the partitioned Parquet export written next to the database by the data loaders)
+ANALYTICS_BACKEND = os.environ.get("ANALYTICS_BACKEND", "sqlite")
+PARQUET_DIR = os.environ.get("PARQUET_DIR")  # Overrides the export next to the database
+# Versioned databases and vector stores published by the data jobs (see data_versions.py);
+# DB_PATH is served until a version is published
+DATA_RELEASES_DIR = os.environ.get("DATA_RELEASES_DIR", os.path.join(BASE_DIR, "..", "..", "data", "releases"))
+# History written by the daily report (daily_update_script.py), for "how did progress change" questions
+METRICS_DB_PATH = os.environ.get("METRICS_DB_PATH", os.path.join(BASE_DIR, "..", "..", "data", "metrics.db"))
+PROGRESS_TREND_DEFAULT_DAYS = 30  # When the question names no period
+RECENT_UPDATE_DEFAULT_DAYS = 30
+# Coverage questions ranking divisions ("lowest coverage divisions") show this many when they name no N
+COVERAGE_BOTTOM_N = 10
+# Cached SQL results for data questions, dropped whenever the served data changes; 0 disables the cache
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "512"))
+# Optional JSONL log of routed queries, to be labelled for retraining the router
+QUERY_LOG_PATH = os.environ.get("QUERY_LOG_PATH")
 
 # Initialize NLU Processor
 csv_path = os.path.join(BASE_DIR, "upload", "List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv")
 nlu_processor = NLUProcessor(csv_path)
 
-# Enhanced Langchain RAG Setup
-
-# 1. Load Better Embeddings
-model_name = "sentence-transformers/all-mpnet-base-v2"  # Better embedding model
-model_kwargs = {"device": "cpu"}
-encode_kwargs = {"normalize_embeddings": True}  # Normalize for better similarity
-embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs=model_kwargs,
-    encode_kwargs=encode_kwargs
-)
-print(f"DEBUG: Enhanced embeddings initialized: {embeddings is not None}")
-
-# 2. Load Vector Store with better retrieval settings
-if not os.path.exists(KNOWLEDGE_BASE_PERSIST_DIR):
-    print(f"ERROR: Knowledge base directory not found at {KNOWLEDGE_BASE_PERSIST_DIR}.")
-    vectordb = None
+# Knowledge base (embeddings, vector store, LLM): in this process, or behind the model server
+if MODEL_SERVER_ADDRESS:
+    from src.routes.model_server import RemoteKnowledgeBase
+    knowledge_base = RemoteKnowledgeBase(MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY, MODEL_SERVER_TIMEOUT_SECONDS)
+    print(f"DEBUG: Forwarding knowledge base queries to model server at {MODEL_SERVER_ADDRESS}")
 else:
-    vectordb = Chroma(persist_directory=KNOWLEDGE_BASE_PERSIST_DIR, embedding_function=embeddings)
-print(f"DEBUG: Vectordb loaded: {vectordb is not None}")
+    from src.routes import knowledge_base
+
+query_router = load_router(QUERY_ROUTER_PATH)
+query_log = QueryLog(QUERY_LOG_PATH) if QUERY_LOG_PATH else None
+
+sql_limiter = AdmissionLimiter("sql", SQL_MAX_CONCURRENT, SQL_MAX_QUEUE, SQL_MAX_WAIT_SECONDS)
+rag_limiter = AdmissionLimiter("rag", RAG_MAX_CONCURRENT, RAG_MAX_QUEUE, RAG_MAX_WAIT_SECONDS)
+export_limiter = AdmissionLimiter("export", EXPORT_MAX_CONCURRENT, EXPORT_MAX_QUEUE, EXPORT_MAX_WAIT_SECONDS)
+planner = QueryPlanner(result_cache=QueryResultCache(RESULT_CACHE_SIZE) if RESULT_CACHE_SIZE > 0 else None)
+
+def open_analytics_backend(database_path):
+    """The configured analytics backend over a database, or None for plain SQLite."""
+    backend = None
+    if ANALYTICS_BACKEND == "columnar":
+        from src.routes.columnar_snapshot import ColumnarBackend
+        backend = ColumnarBackend(database_path)
+        if not backend.reload():
+            print("WARNING: Columnar snapshot not loaded, answering data questions from SQLite")
+    elif ANALYTICS_BACKEND == "parquet":
+        from src.routes.parquet_store import PARQUET_DIR_NAME, ParquetBackend
+        backend = ParquetBackend(PARQUET_DIR or os.path.join(os.path.dirname(database_path), PARQUET_DIR_NAME))
+        if not backend.reload():
+            print("WARNING: Parquet export not found, answering data questions from SQLite")
+    return backend
+
+published_version = read_current(DATA_RELEASES_DIR)
+db_path = component_path(DATA_RELEASES_DIR, published_version, "schemes_db") or DB_PATH
+analytics_backend = open_analytics_backend(db_path)
+plot_lock = threading.Lock()  # pyplot keeps global state and is not thread-safe
+branch_executor = ThreadPoolExecutor(max_workers=PARALLEL_WORKERS, thread_name_prefix="chat-branch")
 
-# 3. Setup Better LLM
-def setup_llm():
-    """Setup the best available LLM for text generation."""
-    try:
-        # Try Microsoft DialoGPT for better conversational responses
-        model_name = "microsoft/DialoGPT-medium"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForCausalLM.from_pretrained(model_name)
-        
-        # Add padding token if not present
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
-        
-        pipe = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            max_new_tokens=200,
-            temperature=0.7,
-            do_sample=True,
-            top_k=50,
-            top_p=0.95,
-            pad_token_id=tokenizer.eos_token_id
-        )
-        llm = HuggingFacePipeline(pipeline=pipe)
-        print(f"DEBUG: DialoGPT LLM initialized successfully.")
-        return llm
-        
-    except Exception as e:
-        print(f"DialoGPT failed: {e}")
-        try:
-            # Fallback to FLAN-T5 Large for better reasoning
-            model_name = "google/flan-t5-large"
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-            
-            pipe = pipeline(
-                "text2text-generation",
-                model=model,
-                tokenizer=tokenizer,
-                max_new_tokens=300,
-                temperature=0.3,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95
-            )
-            llm = HuggingFacePipeline(pipeline=pipe)
-            print(f"DEBUG: FLAN-T5 Large LLM initialized successfully.")
-            return llm
-            
-        except Exception as e2:
-            print(f"FLAN-T5 Large failed: {e2}")
-            # Final fallback to smaller model
-            try:
-                model_name = "google/flan-t5-base"
-                tokenizer = AutoTokenizer.from_pretrained(model_name)
-                model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-                
-                pipe = pipeline(
-                    "text2text-generation",
-                    model=model,
-                    tokenizer=tokenizer,
-                    max_new_tokens=250,
-                    temperature=0.4,
-                    do_sample=True
-                )
-                llm = HuggingFacePipeline(pipeline=pipe)
-                print(f"DEBUG: FLAN-T5 Base LLM initialized successfully.")
-                return llm
-                
-            except Exception as e3:
-                print(f"All LLM models failed: {e3}")
-                # Mock LLM as final fallback
-                class EnhancedMockLLM:
-                    def __call__(self, prompt):
-                        # Extract question from prompt
-                        if "Question:" in prompt:
-                            question = prompt.split("Question:")[-1].strip()
-                            if "jjm" in question.lower() or "jal jeevan mission" in question.lower():
-                                if "website" in question.lower():
-                                    return "The official website of Jal Jeevan Mission (JJM) is jaljeevanmission.gov.in. This website provides comprehensive information about the mission, its progress, guidelines, and implementation details."
-                                else:
-                                    return "Jal Jeevan Mission (JJM) is a flagship program launched by the Government of India in 2019 to provide safe and adequate drinking water through individual household tap connections to all households in rural India by 2024."
-                        return "I apologize, but I'm having trouble accessing the knowledge base. Please try rephrasing your question."
-                    
-                    def invoke(self, prompt):
-                        return self.__call__(prompt)
-                
-                return EnhancedMockLLM()
-
-llm = setup_llm()
-
-# 4. Enhanced RetrievalQA Chain with much better prompt
-if vectordb:
-    # Better retriever with more relevant chunks
-    retriever = vectordb.as_retriever(
-        search_type="mmr",  # Maximum Marginal Relevance for diverse results
-        search_kwargs={"k": 8, "fetch_k": 20}  # Retrieve more, then filter
-    )
-    
-    # Much improved prompt template
-    prompt_template = """You are an expert assistant specializing in Indian water and sanitation programs, particularly the Jal Jeevan Mission (JJM), Swachh Bharat Mission (SBM), and DDWS initiatives.
+chatbot_bp = Blueprint("chatbot_bp", __name__)
 
-Your task is to provide accurate, helpful, and specific answers based on the provided context. Follow these guidelines:
+DATA_QUERY_HELP = "I can generate visualizations for queries like 'cost by year', 'scheme count by type', 'average progress', 'total schemes', or 'top 5 divisions by expenditure'. You can also specify a state or division name."
 
-1. ANSWER DIRECTLY: Start with a clear, direct answer to the question
-2. USE CONTEXT: Base your response primarily on the provided context
-3. BE SPECIFIC: Include specific details like websites, dates, numbers when available
-4. BE CONCISE: Provide focused answers without unnecessary elaboration
-5. ACKNOWLEDGE LIMITS: If the context doesn't contain the answer, say so clearly
+# --- Helper Functions --- #
 
-Context Information:
-{context}
+def get_db_connection():
+    """Establishes a connection to the SQLite database of the data version being served."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
 
-Question: {question}
+def current_data_version():
+    """Identifies the contents of the served database: its path (one per published version) and modification time.
 
-Instructions: Provide a clear, accurate answer based on the context above. If asking about websites, provide the exact URL if mentioned in the context.
+    The modification time also catches loaders that update the database in place.
+    """
+    try:
+        return db_path, os.path.getmtime(db_path)
+    except OSError:
+        return None
 
-Answer:"""
+def apply_data_version(marker):
+    """Starts serving a newly published data version without a restart (VersionWatcher callback).
 
-    QA_CHAIN_PROMPT = PromptTemplate.from_template(prompt_template)
+    The new vector stores and database are opened and checked before anything is
+    swapped; requests already running finish on the handles they started with.
+    """
+    global db_path, analytics_backend
+    chroma_dir = component_path(DATA_RELEASES_DIR, marker, "chroma_db")
+    memmap_dir = component_path(DATA_RELEASES_DIR, marker, "memmap_index")
+    if (chroma_dir or memmap_dir) and not knowledge_base.reload_vector_stores(chroma_dir, memmap_dir):
+        return False
 
-    qa_chain = RetrievalQA.from_chain_type(
-        llm,
-        retriever=retriever,
-        chain_type_kwargs={"prompt": QA_CHAIN_PROMPT},
-        return_source_documents=True
-    )
-else:
-    qa_chain = None
-    print("WARNING: qa_chain could not be initialized because vectordb is None.")
+    new_db_path = component_path(DATA_RELEASES_DIR, marker, "schemes_db")
+    if new_db_path and new_db_path != db_path:
+        try:
+            conn = sqlite3.connect(f"file:{new_db_path}?mode=ro", uri=True)
+            try:
+                conn.execute("SELECT 1 FROM schemes LIMIT 1")
+                planner.refresh(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"ERROR: Data version {marker['version']} has no usable schemes database: {e}")
+            return False
+        new_backend = open_analytics_backend(new_db_path)
+        db_path, analytics_backend = new_db_path, new_backend
+    print(f"DEBUG: Serving data version {marker['version']} (database: {db_path})")
+    return True
+
+version_watcher = VersionWatcher(DATA_RELEASES_DIR, apply_data_version)
+version_watcher.serve(published_version)
+version_watcher.start()  # Stopped in a pre-fork master and started again in each worker (gunicorn.conf.py)
+
+def route_query(query_text, parsed_query):
+    """Picks the data or knowledge path as (route, confidence), with the trained router when there is one."""
+    if parsed_query['intent'] in DATA_ONLY_INTENTS:
+        route, confidence = "data", 1.0
+    elif query_router:
+        route, confidence = query_router.route(query_text, parsed_query)
+    else:
+        route, confidence = heuristic_route(query_text, parsed_query)
+    if query_log:
+        query_log.append(query_text, parsed_query, route, confidence)
+    return route, confidence
 
-print(f"DEBUG: Enhanced QA Chain initialized: {qa_chain is not None}")
+def classify_data_query(query_text, parsed_query, location_filters):
+    """The visualization query type a data question asks for, or None if it is not one we support."""
+    query_lower = query_text.lower()
+    if parsed_query['intent'] == 'cost_analysis' or ("cost" in query_lower and "year" in query_lower):
+        return "cost_by_year"
+    if parsed_query['intent'] == 'scheme_types' or ("scheme" in query_lower and "count" in query_lower and "type" in query_lower):
+        return "scheme_count_by_type"
+    if parsed_query['intent'] == 'progress_analysis' or "progress" in query_lower:
+        return "average_progress"
+    if parsed_query['intent'] == 'count_schemes' or ("how many" in query_lower or "total" in query_lower or "count" in query_lower):
+        return "total_schemes"
+    if location_filters:
+        return "total_schemes"
+    return None
+
+def plan_data_query(query_text, parsed_query, location_filters):
+    """(query_type, spec) for a data question, or (None, None) if it is not one we support.
+
+    Group-by analytics found by the NLU ("expenditure by division") get a planner
+    spec of their own; the rest map to one of the original query types.
+    """
+    analytics = parsed_query.get('analytics')
+    if analytics:
+        try:
+            spec = spec_from_analytics(analytics, location_filters)
+        except PlanError as e:
+            print(f"WARNING: Unsupported analytics query {analytics}: {e}")
+        else:
+            query_type = legacy_query_type(spec)
+            if query_type:
+                return query_type, legacy_spec(query_type, location_filters)
+            return ANALYTICS_QUERY_TYPE, spec
+    query_type = classify_data_query(query_text, parsed_query, location_filters)
+    if query_type is None:
+        return None, None
+    return query_type, legacy_spec(query_type, location_filters)
+
+def describe_location_filter(parsed_query, location_filters):
+    """Suffix naming the location filter in answers and chart titles."""
+    if not location_filters:
+        return ""
+    return f" (filtered by: {', '.join(parsed_query['entities']['states'] + parsed_query['entities']['divisions'])})"
+
+def analytics_backend_ready():
+    return analytics_backend is not None and analytics_backend.is_ready()
+
+def execute_spec(spec, conn=None):
+    """Runs a planner spec on the configured analytics backend, or SQLite when it is not loaded."""
+    if analytics_backend_ready():
+        try:
+            return analytics_backend.execute(spec)
+        except OSError as e:
+            # e.g. Parquet files replaced by a new export while being read
+            print(f"WARNING: Analytics backend failed, answering from SQLite: {e}")
+    data_version = current_data_version()
+    if conn is not None:
+        return planner.execute(conn, spec, data_version)
+    conn = get_db_connection()
+    try:
+        return planner.execute(conn, spec, data_version)
+    finally:
+        conn.close()
 
-chatbot_bp = Blueprint("chatbot_bp", __name__)
+def run_planned_query(query_type, spec, location_info, conn=None):
+    """Executes a planned query and wraps it as a visualization result."""
+    try:
+        data = execute_spec(spec, conn)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {"error": f"Database error: {e}", "status": "error"}
+    if not data:
+        return {"error": "Could not understand the data query for visualization.", "status": "error"}
+    result = {"data": data, "query_type": query_type, "status": "success", "location_info": location_info}
+    if query_type == ANALYTICS_QUERY_TYPE:
+        result["title"] = describe_spec(spec)
+    return result
+
+def query_progress_trend(parsed_query, location_filters, location_info):
+    """Change in average progress over the asked period, from the daily_metrics history."""
+    days = parsed_query.get('period_days') or PROGRESS_TREND_DEFAULT_DAYS
+    try:
+        # Read-only: a missing history database must not be created empty here
+        conn = sqlite3.connect(f"file:{METRICS_DB_PATH}?mode=ro", uri=True)
+        try:
+            series = progress_trend(conn, days, location_filters)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"WARNING: Daily metrics history unavailable: {e}")
+        series = []
+    if not series:
+        return {"error": "I don't have any progress history yet; it is recorded by the daily data update.", "status": "error"}
+
+    (start_date, start_value), (end_date, end_value) = series[0], series[-1]
+    if len(series) == 1:
+        summary = f"Average progress was {end_value:.2f}% on {end_date}; there is no earlier day recorded to compare with."
+    else:
+        change = end_value - start_value
+        direction = "rose" if change > 0 else "fell" if change < 0 else "stayed"
+        summary = f"Average progress {direction} from {start_value:.2f}% on {start_date} to {end_value:.2f}% on {end_date} ({change:+.2f} points)."
+    return {
+        "data": {metric_date: round(value, 2) for metric_date, value in series},
+        "query_type": "progress_trend",
+        "status": "success",
+        "location_info": location_info,
+        "title": f"Average Completion Progress since {start_date}",
+        "summary": summary
+    }
 
-# --- Helper Functions --- #
+def query_date_range(parsed_query, location_filters, location_info):
+    """Schemes completed in a year, or updated in the last N days, per month (or day) from the indexed ISO date columns."""
+    if parsed_query['intent'] == 'completed_in_year':
+        year = parsed_query.get('year')
+        if not year:
+            return {"error": "Which year do you mean? For example: 'schemes completed in 2024'.", "status": "error"}
+        column, (start, end), by_month = "physical_completion_date", year_range(year), True
+        title = f"Schemes Completed in {year}"
+    else:
+        days = parsed_query.get('period_days') or RECENT_UPDATE_DEFAULT_DAYS
+        column, (start, end), by_month = "updated_on", last_days_range(days), days > 62
+        title = f"Schemes Updated in the Last {days} Days"
+    conn = get_db_connection()
+    try:
+        counts = count_by_period(conn, column, start, end, location_filters, by_month)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {"error": f"Database error: {e}", "status": "error"}
+    finally:
+        conn.close()
+    total = sum(count for _, count in counts)
+    if not total:
+        return {"error": f"No schemes found: {title.lower()}{location_info}.", "status": "error"}
+    return {
+        "data": dict(counts),
+        "query_type": ANALYTICS_QUERY_TYPE,
+        "status": "success",
+        "location_info": location_info,
+        "title": f"{title} by {'Month' if by_month else 'Day'}",
+        "summary": f"{title}: {total}."
+    }
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def query_fhtc_coverage(parsed_query, location_filters, location_info):
+    """Tap connection coverage (provided / planned) overall, per state, division or year, or the
+    lowest-ranked divisions, from the fhtc_coverage table built by the data loaders."""
+    query_lower = parsed_query['original_query'].lower()
+    analytics = parsed_query.get('analytics') or {}
+    dimension = analytics.get('dimension') if analytics.get('dimension') in COVERAGE_DIMENSIONS else None
+    top_n, order = (analytics.get('top_n'), analytics.get('order')) if dimension else (None, None)
+    if dimension is None and any(word in query_lower for word in ('lowest', 'worst', 'bottom', 'least', 'poorest')):
+        dimension = "division_name"
+    if dimension == "division_name" and (not top_n or (top_n == 1 and "divisions" in query_lower)):
+        # Hundreds of divisions: rank the ones furthest behind ("which divisions" asks for more than one)
+        top_n, order = COVERAGE_BOTTOM_N, "asc"
+    filters = dict(location_filters)
+    if parsed_query.get('year'):
+        filters["sanction_year"] = str(parsed_query['year'])
 
-def query_knowledge_base(query_text):
-    """Enhanced knowledge base querying with better error handling and fallbacks."""
-    if not qa_chain:
-        print("DEBUG: qa_chain is None in query_knowledge_base.")
-        return get_fallback_response(query_text)
-    
+    conn = get_db_connection()
     try:
-        # Clean and prepare the query
-        cleaned_query = query_text.strip()
-        
-        result = qa_chain.invoke({"query": cleaned_query})
-        print(f"DEBUG: RAG query: {cleaned_query}")
-        print(f"DEBUG: RAG result type: {type(result)}")
-        
-        if isinstance(result, dict) and "result" in result:
-            answer = result["result"].strip()
-            source_docs = result.get("source_documents", [])
-            
-            # Post-process the answer to ensure quality
-            if len(answer) < 10 or answer.lower().startswith("i don't know") or "context" in answer.lower():
-                return get_fallback_response(query_text)
-            
-            print(f"DEBUG: RAG answer: {answer[:200]}...")
-            return {
-                "answer": answer,
-                "source_documents": [doc.metadata for doc in source_docs]
-            }
-        else:
-            print(f"DEBUG: Unexpected result format: {result}")
-            return get_fallback_response(query_text)
-            
-    except Exception as e:
-        print(f"ERROR: Exception during qa_chain.invoke: {e}")
-        import traceback
-        traceback.print_exc()
-        return get_fallback_response(query_text)
-
-def get_fallback_response(query_text):
-    """Provide intelligent fallback responses for common queries."""
-    query_lower = query_text.lower()
-    
-    if "website" in query_lower and ("jjm" in query_lower or "jal jeevan mission" in query_lower):
-        return {
-            "answer": "The official website of Jal Jeevan Mission (JJM) is jaljeevanmission.gov.in. This website provides comprehensive information about the mission's objectives, progress, implementation guidelines, and state-wise data.",
-            "source_documents": []
-        }
-    elif "jjm" in query_lower or "jal jeevan mission" in query_lower:
-        return {
-            "answer": "Jal Jeevan Mission (JJM) is a flagship program launched by the Government of India in August 2019 under the Ministry of Jal Shakti. The mission aims to provide safe and adequate drinking water through individual household tap connections (FHTC) to all households in rural India by 2024. The program has a total outlay of ₹3.60 lakh crores and focuses on ensuring 55 litres per capita per day of water supply.",
-            "source_documents": []
-        }
-    elif "swachh bharat" in query_lower:
-        return {
-            "answer": "Swachh Bharat Mission is a nationwide cleanliness campaign launched by the Government of India in 2014. It aims to eliminate open defecation and improve solid waste management across India.",
-            "source_documents": []
-        }
+        rows = coverage_by(conn, dimension, filters, top_n, order)
+    except sqlite3.OperationalError as e:
+        print(f"WARNING: FHTC coverage table unavailable: {e}")
+        return {"error": "Tap connection coverage has not been computed for this data yet; it is built by the data loaders.", "status": "error"}
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {"error": f"Database error: {e}", "status": "error"}
+    finally:
+        conn.close()
+    if not rows:
+        return {"error": f"No tap connections are planned for the schemes asked about{location_info}.", "status": "error"}
+
+    title = "FHTC Coverage (% of Planned Tap Connections Provided)"
+    if dimension:
+        title += f" by {COVERAGE_DIMENSIONS[dimension]}"
+        if top_n:
+            title += f" ({'bottom' if order == 'asc' else 'top'} {top_n})"
+        data = {str(label): round(coverage, 2) for label, _, _, coverage in rows}
+        provided, planned = sum(row[1] for row in rows), sum(row[2] for row in rows)
+        summary = f"Together they provide {provided:,.0f} of {planned:,.0f} planned tap connections."
     else:
-        return {
-            "answer": "I apologize, but I couldn't find specific information about your query in the available documents. Please try rephrasing your question or ask about Jal Jeevan Mission, Swachh Bharat Mission, or water and sanitation schemes.",
-            "source_documents": []
-        }
+        _, provided, planned, coverage = rows[0]
+        data = {title: round(coverage, 2)}
+        summary = f"{provided:,.0f} of {planned:,.0f} planned tap connections provided ({coverage:.2f}%)."
+    return {
+        "data": data,
+        "query_type": "fhtc_coverage",
+        "status": "success",
+        "location_info": location_info,
+        "title": title,
+        "summary": summary
+    }
 
-def should_generate_visualization(query_text, parsed_query):
-    """Enhanced logic to determine if a query should generate a visualization."""
-    query_lower = query_text.lower()
-    
-    # Data-related keywords that suggest visualization
-    viz_keywords = [
-        'visualize', 'show', 'chart', 'graph', 'plot', 'display',
-        'how many', 'count', 'total', 'number of', 'statistics',
-        'cost', 'expenditure', 'budget', 'spending', 'progress',
-        'completion', 'status', 'analysis', 'breakdown', 'distribution',
-        'comparison', 'trend', 'data', 'schemes', 'projects'
-    ]
-    
-    # Check for visualization keywords
-    has_viz_keywords = any(keyword in query_lower for keyword in viz_keywords)
-    
-    # Check if intent suggests data analysis
-    data_intents = ['count_schemes', 'cost_analysis', 'scheme_types', 'progress_analysis']
-    has_data_intent = parsed_query['intent'] in data_intents
-    
-    # Check if location entities are present (suggests data filtering)
-    has_location = bool(parsed_query['entities']['states'] or parsed_query['entities']['divisions'])
-    
-    # Generate visualization if any condition is met
-    return has_viz_keywords or has_data_intent or has_location
+def describe_scheme(scheme):
+    """One line of key fields for a scheme found by search."""
+    location = ", ".join(value for value in (scheme["division_name"], scheme["state_name"]) if value)
+    progress = scheme["physical_completion_progress"]
+    status = scheme["work_status"] or scheme["physical_status"] or "status not reported"
+    line = f"{scheme['scheme_name'] or 'Unnamed scheme'} (ID {scheme['scheme_id']}, {location}): {status}"
+    if isinstance(progress, (int, float)):
+        line += f", {round(progress, 1):g}% physically complete"
+    if isinstance(scheme["fhtcs_planned"], (int, float)) and scheme["fhtcs_planned"] > 0:
+        line += f", {scheme['fhtcs_provided'] or 0:g} of {scheme['fhtcs_planned']:g} tap connections provided"
+    return line
+
+def query_scheme_lookup(parsed_query, location_info):
+    """Schemes matching the name or ID in the question, from the full-text index."""
+    conn = get_db_connection()
+    try:
+        matches = search_schemes(conn, parsed_query['original_query'])
+    except sqlite3.OperationalError as e:
+        print(f"WARNING: Scheme search index unavailable: {e}")
+        return {"error": "Scheme search is not available for this data yet; the index is built by the data loaders.", "status": "error"}
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {"error": f"Database error: {e}", "status": "error"}
+    finally:
+        conn.close()
+    if not matches:
+        return {"error": "I couldn't find a scheme by that name or ID. Try part of the scheme name, its division or its scheme ID.", "status": "error"}
+    return {
+        "data": matches,
+        "query_type": "scheme_lookup",
+        "status": "success",
+        "location_info": location_info,
+        "summary": "; ".join(describe_scheme(scheme) for scheme in matches)
+    }
+
+def query_by_intent(parsed_query, location_filters, location_info):
+    """Result for the data intents answered outside the query planner, or None for the others."""
+    if parsed_query['intent'] == 'progress_trend':
+        return query_progress_trend(parsed_query, location_filters, location_info)
+    if parsed_query['intent'] in ('completed_in_year', 'recently_updated'):
+        return query_date_range(parsed_query, location_filters, location_info)
+    if parsed_query['intent'] == 'fhtc_coverage':
+        return query_fhtc_coverage(parsed_query, location_filters, location_info)
+    if parsed_query['intent'] == 'scheme_lookup':
+        return query_scheme_lookup(parsed_query, location_info)
+    return None
 
 def query_database_for_visualization(query_text, parsed_query=None):
     """Processes database queries and generates data for visualization."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    data = None
-    query_type = "unknown"
-    error_message = None
-
-    query_lower = query_text.lower()
-    
     if parsed_query is None:
         parsed_query = nlu_processor.parse_query(query_text)
     
     # Extract location filter
-    where_clause, params = nlu_processor.build_location_filter(parsed_query['entities'])
-    location_info = ""
-    
-    if where_clause:
-        location_info = f" (filtered by: {', '.join(parsed_query['entities']['states'] + parsed_query['entities']['divisions'])})"
+    location_filters = nlu_processor.location_filters(parsed_query['entities'])
+    location_info = describe_location_filter(parsed_query, location_filters)
+    intent_result = query_by_intent(parsed_query, location_filters, location_info)
+    if intent_result:
+        return intent_result
+    query_type, spec = plan_data_query(query_text, parsed_query, location_filters)
+
+    print(f"DEBUG: Location filters: {location_filters}")
+    print(f"DEBUG: Query type: {query_type}")
+
+    if spec is None:
+        return {"error": DATA_QUERY_HELP, "status": "error"}
+    return run_planned_query(query_type, spec, location_info)
+
+def aggregate_scheme_rows(rows):
+    """Every supported query type's data from rows grouped by (sanction_year, type_of_scheme)."""
+    cost_by_year = {}
+    count_by_type = {}
+    progress_sum = 0.0
+    progress_count = 0
+    total_schemes = 0
+    for row in rows:
+        total_schemes += row["scheme_count"]
+        progress_sum += row["progress_sum"] or 0
+        progress_count += row["progress_count"] or 0
+        if row["sanction_year"] and row["total_cost"]:
+            cost_by_year[row["sanction_year"]] = cost_by_year.get(row["sanction_year"], 0) + row["total_cost"]
+        if row["type_of_scheme"]:
+            count_by_type[str(row["type_of_scheme"])] = count_by_type.get(str(row["type_of_scheme"]), 0) + row["scheme_count"]
+    return {
+        "cost_by_year": {str(year): cost_by_year[year] for year in sorted(cost_by_year) if cost_by_year[year]},
+        "scheme_count_by_type": dict(sorted(count_by_type.items())),
+        "average_progress": {"average_progress": progress_sum / progress_count if progress_count else 0},
+        "total_schemes": {"total_schemes": int(total_schemes)}
+    }
 
-    print(f"DEBUG: WHERE clause: {where_clause}")
-    print(f"DEBUG: Parameters: {params}")
+def query_database_batch(items):
+    """query_database_for_visualization for many (query_text, parsed_query) pairs, in order.
+
+    Questions of the original query types that share a location filter share one
+    grouped scan, which yields every one of those types at once; analytics
+    questions (and all of them with a columnar or Parquet backend) run one by one.
+    """
+    results = [None] * len(items)
+    groups = {}
+    analytics = []
+    use_backend = analytics_backend_ready()
+    for i, (query_text, parsed_query) in enumerate(items):
+        location_filters = nlu_processor.location_filters(parsed_query['entities'])
+        location_info = describe_location_filter(parsed_query, location_filters)
+        intent_result = query_by_intent(parsed_query, location_filters, location_info)
+        if intent_result:
+            results[i] = intent_result
+            continue
+        query_type, spec = plan_data_query(query_text, parsed_query, location_filters)
+        if spec is None:
+            results[i] = {"error": DATA_QUERY_HELP, "status": "error"}
+            continue
+        if query_type == ANALYTICS_QUERY_TYPE or use_backend:
+            analytics.append((i, query_type, spec, location_info))
+        else:
+            groups.setdefault(tuple(sorted(location_filters.items())), []).append((i, query_type, location_info))
 
+    conn = get_db_connection()
     try:
-        # Enhanced queries with location filtering
-        if parsed_query['intent'] == 'cost_analysis' or ("cost" in query_lower and "year" in query_lower):
-            base_query = "SELECT sanction_year, SUM(estimated_cost) as total_cost FROM schemes"
-            if where_clause:
-                base_query += f" WHERE {where_clause}"
-            base_query += " GROUP BY sanction_year ORDER BY sanction_year"
-            
-            cursor.execute(base_query, params)
-            rows = cursor.fetchall()
-            data = {str(row["sanction_year"]): row["total_cost"] for row in rows if row["sanction_year"] and row["total_cost"]}
-            query_type = "cost_by_year"
-            
-        elif parsed_query['intent'] == 'scheme_types' or ("scheme" in query_lower and "count" in query_lower and "type" in query_lower):
-            base_query = "SELECT type_of_scheme, COUNT(*) as count FROM schemes"
-            if where_clause:
-                base_query += f" WHERE {where_clause}"
-            base_query += " GROUP BY type_of_scheme"
-            
-            cursor.execute(base_query, params)
-            rows = cursor.fetchall()
-            data = {str(row["type_of_scheme"]): row["count"] for row in rows if row["type_of_scheme"]}
-            query_type = "scheme_count_by_type"
-            
-        elif parsed_query['intent'] == 'progress_analysis' or "progress" in query_lower:
-            base_query = "SELECT AVG(physical_completion_progress) as avg_progress FROM schemes WHERE physical_completion_progress > 0"
-            if where_clause:
-                base_query += f" AND {where_clause}"
-            
-            cursor.execute(base_query, params)
-            avg_progress = cursor.fetchone()["avg_progress"]
-            data = {"average_progress": float(avg_progress) if avg_progress else 0}
-            query_type = "average_progress"
-            
-        elif parsed_query['intent'] == 'count_schemes' or ("how many" in query_lower or "total" in query_lower or "count" in query_lower):
-            base_query = "SELECT COUNT(*) as total_schemes FROM schemes"
+        for location_filters, members in groups.items():
+            where_clause, params = filter_clause(dict(location_filters))
+            base_query = (
+                "SELECT sanction_year, type_of_scheme, COUNT(*) as scheme_count, SUM(estimated_cost) as total_cost, "
+                "SUM(CASE WHEN physical_completion_progress > 0 THEN physical_completion_progress END) as progress_sum, "
+                "SUM(CASE WHEN physical_completion_progress > 0 THEN 1 ELSE 0 END) as progress_count FROM schemes"
+            )
             if where_clause:
                 base_query += f" WHERE {where_clause}"
-            
-            cursor.execute(base_query, params)
-            total_schemes = cursor.fetchone()["total_schemes"]
-            data = {"total_schemes": int(total_schemes)}
-            query_type = "total_schemes"
-            
-        else:
-            if where_clause:
-                base_query = "SELECT COUNT(*) as total_schemes FROM schemes WHERE " + where_clause
-                cursor.execute(base_query, params)
-                total_schemes = cursor.fetchone()["total_schemes"]
-                data = {"total_schemes": int(total_schemes)}
-                query_type = "total_schemes"
-            else:
-                error_message = "I can generate visualizations for queries like 'cost by year', 'scheme count by type', 'average progress', or 'total schemes'. You can also specify a state or division name."
-
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        error_message = f"Database error: {e}"
+            base_query += " GROUP BY sanction_year, type_of_scheme"
+            try:
+                aggregates = aggregate_scheme_rows(conn.execute(base_query, params).fetchall())
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                for i, _, _ in members:
+                    results[i] = {"error": f"Database error: {e}", "status": "error"}
+                continue
+            print(f"DEBUG: Batch scan for filter {where_clause or 'none'} served {len(members)} queries")
+            for i, query_type, location_info in members:
+                if aggregates[query_type]:
+                    results[i] = {"data": aggregates[query_type], "query_type": query_type, "status": "success", "location_info": location_info}
+                else:
+                    results[i] = {"error": "Could not understand the data query for visualization.", "status": "error"}
+        for i, query_type, spec, location_info in analytics:
+            results[i] = run_planned_query(query_type, spec, location_info, conn)
     finally:
         conn.close()
+    return results
+
+def generate_visualization_image(data, query_type, location_info="", title=None):
+    """Generates a visualization image based on the data, one render at a time."""
+    with plot_lock:
+        return render_visualization_image(data, query_type, location_info, title)
 
-    if error_message:
-        return {"error": error_message, "status": "error"}
-    if data:
-        return {"data": data, "query_type": query_type, "status": "success", "location_info": location_info}
-    return {"error": "Could not understand the data query for visualization.", "status": "error"}
+def render_visualization_image(data, query_type, location_info="", title=None):
+    """Draws the chart for a query type and returns it as a PNG data URL.
 
-def generate_visualization_image(data, query_type, location_info=""):
-    """Generates a visualization image based on the data."""
+    Analytics results are drawn as a horizontal bar per group (or a single figure
+    when there is no grouping), titled with the planner's description.
+    """
     if not data:
         return None
 
@@ -406,6 +581,34 @@ def generate_visualization_image(data, query_type, location_info=""):
                     horizontalalignment='center', verticalalignment='center', 
                     fontsize=20, transform=ax.transAxes)
              ax.axis('off')
+        elif query_type == "progress_trend":
+            ax.plot(list(data.keys()), list(data.values()), marker='o', color='seagreen')
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Average Progress (%)")
+            ax.set_title(f"{title or 'Average Completion Progress'}{location_info}")
+            plt.xticks(rotation=45, ha="right")
+        elif query_type == "fhtc_coverage" and list(data) == [title]:
+            ax.barh(["Provided"], [data[title]], color='teal')
+            ax.set_xlim(0, max(100, data[title]))
+            ax.set_xlabel("Coverage (%)")
+            ax.set_title(f"{title}{location_info}")
+        elif query_type == "fhtc_coverage":
+            ax.barh(list(data.keys()), list(data.values()), color='teal')
+            ax.invert_yaxis()  # Ranked order, first on top
+            ax.set_xlim(0, max(100, max(data.values())))
+            ax.set_xlabel("Coverage (%)")
+            ax.set_title(f"{title}{location_info}")
+        elif query_type == ANALYTICS_QUERY_TYPE and list(data) == [title]:
+            # Ungrouped aggregate: the single figure, keyed by its description
+            value = data[title]
+            ax.text(0.5, 0.5, f"{title}: {value:,.2f}{location_info}" if isinstance(value, float) else f"{title}: {value}{location_info}",
+                    horizontalalignment='center', verticalalignment='center',
+                    fontsize=18, transform=ax.transAxes, wrap=True)
+            ax.axis('off')
+        elif query_type == ANALYTICS_QUERY_TYPE:
+            ax.barh(list(data.keys()), list(data.values()), color='steelblue')
+            ax.invert_yaxis()  # First group on top
+            ax.set_title(f"{title or 'Scheme Analytics'}{location_info}")
         else:
             return None
 
@@ -421,6 +624,180 @@ def generate_visualization_image(data, query_type, location_info=""):
         plt.close(fig)
         return None
 
+chart_jobs = ChartJobQueue(
+    generate_visualization_image, CHART_JOBS_DIR,
+    workers=CHART_WORKERS, max_pending=CHART_MAX_PENDING, ttl_seconds=CHART_JOB_TTL_SECONDS
+)
+
+def summarize_data(data, limit=10):
+    """Short text version of the aggregated numbers, sent before the chart is ready."""
+    items = [f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value}" for key, value in list(data.items())[:limit]]
+    if len(data) > limit:
+        items.append(f"and {len(data) - limit} more")
+    return ", ".join(items)
+
+def answer_data_query(user_message, parsed_query, async_chart=False):
+    """Database/visualization path; holds an SQL admission slot while it runs.
+
+    With async_chart the chart is queued and the response carries the numbers and
+    a chart job id, so the request only waits for SQL.
+    """
+    with sql_limiter.slot():
+        db_query_result = query_database_for_visualization(user_message, parsed_query)
+    return data_response(user_message, db_query_result, async_chart)
+
+def data_response(user_message, db_query_result, async_chart=False, render_chart=True):
+    """The chat response for a database result: chart (inline or as a job) or just the numbers."""
+    response_data = {}
+    response_type = "text"
+    if db_query_result["status"] == "success" and db_query_result["query_type"] == "scheme_lookup":
+        # Individual schemes: the matches themselves, nothing to chart
+        count = len(db_query_result["data"])
+        response_data["answer"] = f"Found {count} matching scheme{'s' if count != 1 else ''}: {db_query_result['summary']}"
+        response_data["data"] = db_query_result["data"]
+        response_type = "data"
+    elif db_query_result["status"] == "success":
+        location_info = db_query_result.get("location_info", "")
+        title = db_query_result.get("title")
+        job_id = chart_jobs.submit(db_query_result["data"], db_query_result["query_type"], location_info, title) if async_chart and render_chart else None
+        if not render_chart:
+            response_data["answer"] = f"Here's the data for your query: {user_message}{location_info}. {summarize_data(db_query_result['data'])}"
+            response_data["data"] = db_query_result["data"]
+            response_type = "data"
+        elif job_id:
+            response_data["answer"] = f"Here's the data for your query: {user_message}{location_info}. {summarize_data(db_query_result['data'])}"
+            response_data["data"] = db_query_result["data"]
+            response_data["chart_job"] = {"id": job_id, "status": "pending", "url": f"/api/charts/jobs/{job_id}"}
+            response_type = "visualization_pending"
+        else:
+            visualization_img = generate_visualization_image(
+                db_query_result["data"], 
+                db_query_result["query_type"],
+                location_info,
+                title
+            )
+            if visualization_img:
+                response_data["answer"] = f"Here's the visualization for your query: {user_message}{location_info}"
+                response_data["visualization"] = visualization_img
+                response_type = "visualization"
+            else:
+                response_data["answer"] = "I understood your data query, but I had trouble generating the visualization."
+        if db_query_result.get("summary"):
+            response_data["answer"] += f" {db_query_result['summary']}"
+    else:
+        response_data["answer"] = db_query_result.get("error", "Sorry, I couldn't process that data query.")
+    return response_data, response_type
+
+def answer_knowledge_query(user_message, parsed_query):
+    """Knowledge base (RAG) path; a curated FAQ answer needs no admission slot, retrieval and generation hold a RAG slot."""
+    kb_result = knowledge_base.lookup_faq_answer(user_message)
+    if not kb_result:
+        with rag_limiter.slot():
+            kb_result = knowledge_base.query_knowledge_base(user_message, parsed_query, check_faq=False)
+    return knowledge_response(kb_result)
+
+def knowledge_response(kb_result):
+    return {
+        "answer": kb_result["answer"],
+        "sources": kb_result.get("source_documents", [])
+    }, "text"
+
+def answer_both_paths(user_message, parsed_query, async_chart=False):
+    """Runs the data and knowledge paths concurrently; a path that misses the deadline is dropped."""
+    deadline = time.monotonic() + PARALLEL_DEADLINE_SECONDS
+    futures = {
+        "data": branch_executor.submit(answer_data_query, user_message, parsed_query, async_chart),
+        "knowledge": branch_executor.submit(answer_knowledge_query, user_message, parsed_query)
+    }
+    results = {}
+    rejected = None
+    for path, future in futures.items():
+        try:
+            results[path] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # The branch finishes in the background and its result is discarded
+            print(f"WARNING: {path} path missed the {PARALLEL_DEADLINE_SECONDS}s deadline, dropping it")
+        except AdmissionRejected as e:
+            print(f"WARNING: {path} path rejected by admission control: {e}")
+            rejected = rejected or e
+
+    # A data answer without a chart is only an error message, the narrative answer is better
+    if results.get("data", (None, "text"))[1] == "text":
+        results.pop("data", None)
+    if not results:
+        if rejected:
+            raise rejected
+        fallback = get_fallback_response(user_message)
+        return {"answer": fallback["answer"], "sources": fallback["source_documents"], "paths": []}, "text"
+    if "data" not in results:
+        response_data, response_type = results["knowledge"]
+    elif "knowledge" not in results:
+        response_data, response_type = results["data"]
+    else:
+        knowledge_data, _ = results["knowledge"]
+        response_data, response_type = results["data"]
+        response_data["answer"] = f"{knowledge_data['answer']}\n\n{response_data['answer']}"
+        response_data["sources"] = knowledge_data["sources"]
+    response_data["paths"] = sorted(results)
+    return response_data, response_type
+
+def answer_batch(messages, render_charts=False):
+    """Yields (index, parsed_query, routing, response_data, response_type) for each message, in input order.
+
+    NLU runs once over all messages with nlp.pipe; data questions run first as
+    grouped SQL (one scan per location filter); knowledge questions go to the
+    knowledge base in chunks that are embedded in one batch each.
+    """
+    parsed_queries = nlu_processor.parse_queries(messages)
+    # Ambiguous questions are not split across both paths here: batches favour throughput
+    routes = [route_query(message, parsed_query) for message, parsed_query in zip(messages, parsed_queries)]
+    data_indexes = [i for i, (route, _) in enumerate(routes) if route == "data"]
+    knowledge_indexes = [i for i, (route, _) in enumerate(routes) if route != "data"]
+
+    db_results = {}
+    if data_indexes:
+        try:
+            with sql_limiter.slot():
+                batch_results = query_database_batch([(messages[i], parsed_queries[i]) for i in data_indexes])
+            db_results = dict(zip(data_indexes, batch_results))
+        except AdmissionRejected as e:
+            db_results = {i: {"error": f"The server is busy, please retry shortly ({e.reason}).", "status": "error"} for i in data_indexes}
+
+    knowledge_chunks = iter([knowledge_indexes[start:start + BATCH_KB_CHUNK_SIZE] for start in range(0, len(knowledge_indexes), BATCH_KB_CHUNK_SIZE)])
+    knowledge_results = {}
+    for i, message in enumerate(messages):
+        routing = {"route": routes[i][0], "confidence": routes[i][1]}
+        if i in db_results:
+            response_data, response_type = data_response(message, db_results[i], render_chart=render_charts)
+            yield i, parsed_queries[i], routing, response_data, response_type
+            continue
+
+        if i not in knowledge_results:
+            chunk = next(knowledge_chunks)
+            try:
+                with rag_limiter.slot():
+                    chunk_results = knowledge_base.query_knowledge_base_batch(
+                        [messages[j] for j in chunk], [parsed_queries[j] for j in chunk]
+                    )
+                knowledge_results.update({j: knowledge_response(result) for j, result in zip(chunk, chunk_results)})
+            except AdmissionRejected as e:
+                knowledge_results.update({j: ({"error": f"The server is busy, please retry shortly ({e.reason})."}, "error") for j in chunk})
+        response_data, response_type = knowledge_results.pop(i)
+        yield i, parsed_queries[i], routing, response_data, response_type
+
+def admission_rejected_response(error):
+    """Fast 503 telling the client when to retry instead of queueing it indefinitely."""
+    print(f"WARNING: Request rejected by admission control: {error}")
+    response = jsonify({
+        "error": "The server is busy, please retry shortly.",
+        "reason": error.reason,
+        "path": error.limiter_name,
+        "timestamp": datetime.now().isoformat()
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
 # --- API Endpoints --- #
 
 @chatbot_bp.route("/chat", methods=["POST"])
@@ -430,42 +807,167 @@ def chat():
         return jsonify({"error": "No message provided"}), 400
 
     print(f"Received message: {user_message}")
-    response_data = {}
-    response_type = "text"
 
     # Parse query using NLU
     parsed_query = nlu_processor.parse_query(user_message)
     print(f"DEBUG: Parsed query: {parsed_query}")
 
-    # Enhanced logic to determine if visualization should be generated
-    if should_generate_visualization(user_message, parsed_query):
-        print("Intent: Data Visualization Query")
-        db_query_result = query_database_for_visualization(user_message, parsed_query)
-        if db_query_result["status"] == "success":
-            visualization_img = generate_visualization_image(
-                db_query_result["data"], 
-                db_query_result["query_type"],
-                db_query_result.get("location_info", "")
-            )
-            if visualization_img:
-                response_data["answer"] = f"Here's the visualization for your query: {user_message}{db_query_result.get('location_info', '')}"
-                response_data["visualization"] = visualization_img
-                response_type = "visualization"
-            else:
-                response_data["answer"] = "I understood your data query, but I had trouble generating the visualization."
+    async_chart = bool(request.json.get("async_chart", CHART_ASYNC))
+    route, confidence = route_query(user_message, parsed_query)
+    try:
+        if confidence < ROUTE_CONFIDENCE_THRESHOLD:
+            print(f"Intent: Ambiguous (leaning {route}, confidence {confidence}), running both paths")
+            response_data, response_type = answer_both_paths(user_message, parsed_query, async_chart)
+        elif route == "data":
+            print("Intent: Data Visualization Query")
+            response_data, response_type = answer_data_query(user_message, parsed_query, async_chart)
         else:
-            response_data["answer"] = db_query_result.get("error", "Sorry, I couldn't process that data query.")
-    else:
-        print("Intent: Knowledge Base Query")
-        kb_result = query_knowledge_base(user_message)
-        response_data["answer"] = kb_result["answer"]
+            print("Intent: Knowledge Base Query")
+            response_data, response_type = answer_knowledge_query(user_message, parsed_query)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
 
     response_data["type"] = response_type
     response_data["timestamp"] = datetime.now().isoformat()
     response_data["parsed_query"] = parsed_query
+    response_data["routing"] = {"route": route, "confidence": confidence}
     print(f"Sending response: {response_data.get('answer', 'No answer')[:100]}...")
     return jsonify(response_data)
 
+@chatbot_bp.route("/chat/batch", methods=["POST"])
+def chat_batch():
+    """Answers a list of messages, streamed back as NDJSON lines in input order.
+
+    Charts are not rendered unless "charts" is true; each data line carries the numbers.
+    """
+    messages = request.json.get("messages")
+    if not isinstance(messages, list) or not messages or not all(isinstance(message, str) and message.strip() for message in messages):
+        return jsonify({"error": "Provide \"messages\" as a non-empty list of non-empty strings"}), 400
+    if len(messages) > BATCH_MAX_MESSAGES:
+        return jsonify({"error": f"At most {BATCH_MAX_MESSAGES} messages per batch"}), 400
+    render_charts = bool(request.json.get("charts", False))
+    print(f"Received batch of {len(messages)} messages")
+
+    def generate():
+        for index, parsed_query, routing, response_data, response_type in answer_batch(messages, render_charts):
+            response_data.update({
+                "index": index,
+                "message": messages[index],
+                "type": response_type,
+                "parsed_query": parsed_query,
+                "routing": routing
+            })
+            yield json.dumps(response_data, default=str) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@chatbot_bp.route("/schemes", methods=["GET"])
+def list_schemes():
+    """The scheme rows behind the charts, streamed as NDJSON (default) or CSV (?format=csv).
+
+    Filters: state, division or location (matched like chat questions) and any of
+    LIST_FILTERS by column name, all case-insensitive. Without ?limit= every
+    matching scheme is streamed; with it, one page of up to `limit` rows, and the
+    X-Next-After header holds the ?after= cursor of the next page.
+    """
+    args = request.args
+    unknown = set(args) - {"state", "division", "location", "format", "after", "limit"} - set(LIST_FILTERS)
+    if unknown:
+        return jsonify({"error": f"Unknown parameters: {', '.join(sorted(unknown))}"}), 400
+    list_format = args.get("format", "ndjson")
+    if list_format not in LIST_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(LIST_FORMATS)}"}), 400
+    limit = args.get("limit", type=int)
+    if "limit" in args and (limit is None or not 1 <= limit <= MAX_PAGE_LIMIT):
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_LIMIT}"}), 400
+
+    filters = nlu_processor.location_filters({
+        "states": [args["state"]] if args.get("state") else [],
+        "divisions": [args["division"]] if args.get("division") else [],
+        "locations": [args["location"]] if args.get("location") else [],
+        "schemes": []
+    })
+    if args.get("location") and not filters:
+        return jsonify({"error": f"Unknown location: {args['location']}"}), 400
+    filters.update({column: args[column].lower() for column in LIST_FILTERS if args.get(column)})
+
+    try:
+        export_limiter.acquire()
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    conn = get_db_connection()
+    conn.row_factory = None  # Plain tuples, encoded straight to the response
+    try:
+        columns = scheme_columns(conn)
+        if limit:
+            rows, next_after = fetch_page(conn, columns, filters, args.get("after"), limit)
+            pages = iter([rows])
+        else:
+            next_after = None
+            pages = iter_pages(conn, columns, filters, args.get("after"))
+            # The first page runs now, so a database error is a 500 rather than a truncated stream
+            first_page = next(pages, None)
+            pages = chain([first_page], pages) if first_page else iter([])
+    except sqlite3.Error as e:
+        conn.close()
+        export_limiter.release()
+        print(f"Database error: {e}")
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+    def close():
+        conn.close()
+        export_limiter.release()
+
+    # call_on_close also runs when the client goes away before the stream starts
+    response = Response(encode_pages(columns, pages, list_format), mimetype=LIST_FORMATS[list_format])
+    response.call_on_close(close)
+    if next_after is not None:
+        response.headers["X-Next-After"] = next_after
+    if list_format == "csv":
+        response.headers["Content-Disposition"] = "attachment; filename=schemes.csv"
+    print(f"DEBUG: Listing schemes with filters {filters} as {list_format}" + (f", page of {limit}" if limit else ""))
+    return response
+
+@chatbot_bp.route("/charts/jobs/<job_id>", methods=["GET"])
+def chart_job(job_id):
+    """State of a background chart render; ?wait=N long-polls up to N seconds for it to finish."""
+    wait_seconds = min(max(request.args.get("wait", 0, type=float), 0), CHART_JOB_MAX_WAIT_SECONDS)
+    job = chart_jobs.get(job_id, wait_seconds)
+    if job is None:
+        return jsonify({"error": "Unknown or expired chart job"}), 404
+    return jsonify(job)
+
+@chatbot_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Runtime counters for capacity planning and alerting."""
+    return jsonify({
+        "timestamp": datetime.now().isoformat(),
+        "admission": {
+            "sql": sql_limiter.stats(),
+            "rag": rag_limiter.stats(),
+            "export": export_limiter.stats()
+        },
+        "charts": chart_jobs.stats(),
+        "query_planner": planner.stats(),
+        "analytics_backend": analytics_backend.stats() if analytics_backend else {"backend": "sqlite"},
+        "router": query_router.stats() if query_router else {"mode": "heuristic"},
+        "knowledge_base": knowledge_base.stats(),
+        "data_version": version_watcher.stats()
+    })
+
+@chatbot_bp.route("/admin/version", methods=["GET"])
+def data_version():
+    """The data version this worker serves, and the one currently published."""
+    published = read_current(DATA_RELEASES_DIR)
+    return jsonify({
+        **version_watcher.stats(),
+        "published_version": (published or {}).get("version"),
+        "db_path": db_path,
+        "vector_dirs": knowledge_base.stats().get("vector_dirs"),
+        "analytics_backend": analytics_backend.stats() if analytics_backend else {"backend": "sqlite"},
+        "pid": os.getpid()
+    })
+
 @chatbot_bp.route("/api/health", methods=["GET"])
 def health_check():
     db_ok = False
@@ -480,8 +982,10 @@ def health_check():
     except Exception as e:
         print(f"Health check DB error: {e}")
     
-    if qa_chain and vectordb:
-        kb_ok = True
+    try:
+        kb_ok = knowledge_base.is_ready()
+    except Exception as e:
+        print(f"Health check knowledge base error: {e}")
     
     try:
         test_result = nlu_processor.parse_query("test query")
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyCircuitBreaker:
+    """Switches the RAG path to snippet-only answers while generation latency is too high.
+
+    Closed: every request may generate; latencies are recorded in a sliding window.
+    Open: the window's p95 went above target, so requests skip generation until
+    cooldown_seconds have passed.
+    Half-open: a single probe request is allowed to generate. If it finishes within
+    target the breaker closes again, otherwise it re-opens for another cooldown.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, target_p95_ms: float, window_size: int = 50, min_samples: int = 10, cooldown_seconds: float = 30.0):
+        self.target_p95_ms = target_p95_ms
+        self.min_samples = min_samples
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self._samples = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {
+            "generated": 0,
+            "budget_fallbacks": 0,
+            "breaker_fallbacks": 0,
+            "trips": 0
+        }
+
+    def allow_generation(self) -> bool:
+        """Whether this request may call the generator; counts a breaker fallback when it may not."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.counters["breaker_fallbacks"] += 1
+            return False
+
+    def record(self, latency_ms: float, within_budget: bool = True):
+        """Record one generation attempt; latency_ms is the time waited, capped at the budget on timeouts."""
+        with self._lock:
+            self._samples.append(latency_ms)
+            if within_budget:
+                self.counters["generated"] += 1
+            else:
+                self.counters["budget_fallbacks"] += 1
+
+            if self.state == self.HALF_OPEN and self._probe_in_flight:
+                self._probe_in_flight = False
+                if within_budget and latency_ms <= self.target_p95_ms:
+                    self.state = self.CLOSED
+                    self._samples.clear()
+                else:
+                    self._open()
+            elif self.state == self.CLOSED and len(self._samples) >= self.min_samples:
+                if self._percentile(95) > self.target_p95_ms:
+                    self._open()
+
+    def cancel_probe(self):
+        """Release a half-open probe whose generation failed for reasons other than latency."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_skipped(self):
+        """Count a request that fell back because its remaining budget was too small to generate."""
+        with self._lock:
+            self.counters["budget_fallbacks"] += 1
+
+    def expected_latency_ms(self) -> Optional[float]:
+        """Median of recent generation latencies, or None before enough samples were seen."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            return self._percentile(50)
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.counters["trips"] += 1
+
+    def _percentile(self, pct: float) -> float:
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "target_p95_ms": self.target_p95_ms,
+                "observed_p95_ms": round(self._percentile(95), 1) if self._samples else None,
+                "samples": len(self._samples),
+                **self.counters
+            }
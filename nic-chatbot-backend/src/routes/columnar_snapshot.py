@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.routes.query_planner import DIMENSIONS, MEASURES, order_rows, shape_result
+
+SNAPSHOT_CHECK_SECONDS = 30  # How often queries look for a newer database file
+
+
+class ColumnarSnapshot:
+    """Immutable in-memory copy of the planner's columns of the schemes table.
+
+    Dimensions are dictionary encoded (small integer codes plus the list of
+    distinct values, code 0 being NULL), measures are float64 arrays. Specs are
+    answered with boolean masks and np.bincount group-bys.
+    """
+
+    def __init__(self, rows: int, dimensions: Dict, measures: Dict, source_mtime: float = 0.0):
+        self.rows = rows
+        self.dimensions = dimensions  # column -> (codes, categories)
+        self.measures = measures  # column -> (values with 0 for NULL, present mask, integer column)
+        self.source_mtime = source_mtime
+        self.loaded_at = time.time()
+        # Lowercased value -> codes, for the planner's case-insensitive filters
+        self._lookup = {}
+        for column, (_, categories) in dimensions.items():
+            lookup = {}
+            for code, value in enumerate(categories):
+                if value is not None:
+                    lookup.setdefault(str(value).lower(), []).append(code)
+            self._lookup[column] = lookup
+
+    @classmethod
+    def load(cls, db_path: str) -> "ColumnarSnapshot":
+        """Reads the planner's columns from SQLite, one column at a time to bound peak memory."""
+        source_mtime = os.path.getmtime(db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            # One read transaction, so every column comes from the same version of the table
+            conn.execute("BEGIN")
+            rows = conn.execute("SELECT COUNT(*) FROM schemes").fetchone()[0]
+            dimensions = {}
+            for column in DIMENSIONS:
+                values = cls._read_column(conn, column)
+                codes, uniques = pd.factorize(values)
+                codes = codes + 1  # NULL (-1) becomes code 0
+                dtype = np.uint8 if len(uniques) < 255 else np.uint16 if len(uniques) < 65535 else np.uint32
+                dimensions[column] = (codes.astype(dtype), [None] + list(uniques))
+            measures = {}
+            for column in MEASURES:
+                values = cls._read_column(conn, column)
+                present = values.notna().to_numpy()
+                integer = pd.api.types.infer_dtype(values, skipna=True) == "integer"
+                # SQLite reads text as 0 in arithmetic
+                numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+                measures[column] = (np.where(present, np.nan_to_num(numbers), 0.0), present, integer)
+        finally:
+            conn.close()
+        return cls(rows, dimensions, measures, source_mtime)
+
+    @staticmethod
+    def _read_column(conn, column) -> pd.Series:
+        # Python objects as SQLite returns them: pandas would turn integers with NULLs into floats
+        return pd.Series([row[0] for row in conn.execute(f"SELECT {column} FROM schemes ORDER BY rowid")], dtype=object)
+
+    def nbytes(self) -> int:
+        total = sum(codes.nbytes for codes, _ in self.dimensions.values())
+        return total + sum(values.nbytes + present.nbytes for values, present, _ in self.measures.values())
+
+    def execute(self, spec: Dict) -> Dict:
+        """Same result as QueryPlanner.execute on the table this snapshot was loaded from."""
+        mask = None
+        for column, value in spec["filters"].items():
+            codes, _ = self.dimensions[column]
+            matches = self._lookup[column].get(value, [])
+            column_mask = np.isin(codes, matches) if len(matches) != 1 else codes == matches[0]
+            mask = column_mask if mask is None else mask & column_mask
+
+        measure = spec["measure"]
+        values = present = None
+        integer = False
+        if measure:
+            values, present, integer = self.measures[measure]
+            if spec["positive_only"]:
+                mask = values > 0 if mask is None else mask & (values > 0)
+
+        if spec["dimension"] is None:
+            return shape_result(spec, [(None, self._aggregate_all(spec, mask, values, present))])
+
+        codes, categories = self.dimensions[spec["dimension"]]
+        if mask is not None:
+            codes = codes[mask]
+            if measure:
+                values, present = values[mask], present[mask]
+        groups = self._aggregate_groups(spec, codes, len(categories), values, present)
+
+        rows = []
+        for code in np.flatnonzero(groups[0]):
+            key = categories[code]
+            if key is None or key == "":
+                continue
+            value = groups[1][code]
+            if value is not None and integer and spec["aggregation"] in ("sum", "min", "max"):
+                value = int(value)
+            rows.append((key, value))
+        return shape_result(spec, order_rows(spec, rows))
+
+    def _aggregate_all(self, spec, mask, values, present):
+        aggregation = spec["aggregation"]
+        if aggregation == "count":
+            return int(mask.sum()) if mask is not None else self.rows
+        if mask is not None:
+            values, present = values[mask], present[mask]
+        if not present.any():
+            return None
+        if aggregation == "sum":
+            return float(values.sum())
+        if aggregation == "avg":
+            return float(values.sum() / present.sum())
+        return float(values[present].min() if aggregation == "min" else values[present].max())
+
+    @staticmethod
+    def _aggregate_groups(spec, codes, size, values, present):
+        """(rows per group, value per group or None), indexed by code."""
+        counts = np.bincount(codes, minlength=size)
+        aggregation = spec["aggregation"]
+        if aggregation == "count":
+            return counts, counts.tolist()
+        present_counts = np.bincount(codes, weights=present, minlength=size)
+        if aggregation in ("sum", "avg"):
+            result = np.bincount(codes, weights=values, minlength=size)
+            if aggregation == "avg":
+                result = np.divide(result, present_counts, out=np.zeros(size), where=present_counts > 0)
+        else:
+            extreme = np.minimum if aggregation == "min" else np.maximum
+            result = np.full(size, np.inf if aggregation == "min" else -np.inf)
+            extreme.at(result, codes[present], values[present])
+        return counts, [float(v) if n else None for v, n in zip(result.tolist(), present_counts.tolist())]
+
+
+class ColumnarBackend:
+    """Answers planner specs from a ColumnarSnapshot of the database, reloaded when the file changes.
+
+    A reload builds the new snapshot completely and then replaces the reference
+    in one assignment; a query holds on to the snapshot it started with, so it
+    never sees a half-loaded one.
+    """
+
+    def __init__(self, db_path: str, check_seconds: float = SNAPSHOT_CHECK_SECONDS):
+        self.db_path = db_path
+        self.check_seconds = check_seconds
+        self.snapshot: Optional[ColumnarSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self.counters = {"queries": 0, "reloads": 0, "reload_failures": 0}
+        self.last_load_seconds = 0.0
+
+    def reload(self) -> bool:
+        """Loads a fresh snapshot and swaps it in; the old one keeps serving if loading fails."""
+        start = time.monotonic()
+        try:
+            snapshot = ColumnarSnapshot.load(self.db_path)
+        except (OSError, sqlite3.Error, ValueError) as e:
+            print(f"WARNING: Could not load columnar snapshot from {self.db_path}: {e}")
+            self.counters["reload_failures"] += 1
+            return False
+        self.snapshot = snapshot
+        self.last_load_seconds = time.monotonic() - start
+        self.counters["reloads"] += 1
+        print(f"DEBUG: Columnar snapshot loaded: {snapshot.rows} schemes, {snapshot.nbytes() / 1024 ** 2:.1f} MB in {self.last_load_seconds:.2f}s")
+        return True
+
+    def is_ready(self) -> bool:
+        return self.snapshot is not None
+
+    def execute(self, spec: Dict) -> Dict:
+        snapshot = self.snapshot
+        self.counters["queries"] += 1
+        self._reload_if_changed(snapshot)
+        return snapshot.execute(spec)
+
+    def _reload_if_changed(self, snapshot):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            changed = os.path.getmtime(self.db_path) != snapshot.source_mtime
+        except OSError:
+            return
+        # Reload in the background; queries keep using the current snapshot meanwhile
+        if changed and self._reload_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        finally:
+            self._reload_lock.release()
+
+    def stats(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            "backend": "columnar",
+            "rows": snapshot.rows if snapshot else 0,
+            "memory_mb": round(snapshot.nbytes() / 1024 ** 2, 1) if snapshot else 0.0,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(snapshot.loaded_at)) if snapshot else None,
+            "last_load_seconds": round(self.last_load_seconds, 3),
+            **self.counters
+        }
@@ -0,0 +1,133 @@
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# History of the daily report, one row per (date, scope, state, division). It lives in its own
+# database so it outlasts the published data versions, and stays small enough for trend
+# questions to be answered from it instead of from the schemes table.
+METRICS_TABLE = "daily_metrics"
+METRIC_COLUMNS = (
+    "total_schemes", "ongoing_schemes", "completed_schemes", "total_estimated_cost",
+    "total_expenditure", "progress_sum", "progress_count", "recent_updates"
+)
+
+# One pass over schemes: every report figure per (state, division), by conditional aggregation
+DAILY_METRICS_SQL = """
+    SELECT state_name, division_name,
+           COUNT(*) AS total_schemes,
+           SUM(CASE WHEN work_status = 'Ongoing' THEN 1 ELSE 0 END) AS ongoing_schemes,
+           SUM(CASE WHEN work_status = 'Financially completed' THEN 1 ELSE 0 END) AS completed_schemes,
+           TOTAL(estimated_cost) AS total_estimated_cost,
+           TOTAL(total_expenditure) AS total_expenditure,
+           TOTAL(CASE WHEN physical_completion_progress > 0 THEN physical_completion_progress END) AS progress_sum,
+           SUM(CASE WHEN physical_completion_progress > 0 THEN 1 ELSE 0 END) AS progress_count,
+           SUM(CASE WHEN updated_on >= ? THEN 1 ELSE 0 END) AS recent_updates
+    FROM schemes
+    GROUP BY state_name, division_name
+"""
+
+
+def create_metrics_table(conn: sqlite3.Connection):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+            metric_date TEXT NOT NULL,
+            scope TEXT NOT NULL,  -- 'all', 'state' or 'division'
+            state_name TEXT NOT NULL DEFAULT '',
+            division_name TEXT NOT NULL DEFAULT '',
+            total_schemes INTEGER,
+            ongoing_schemes INTEGER,
+            completed_schemes INTEGER,
+            total_estimated_cost REAL,
+            total_expenditure REAL,
+            progress_sum REAL,
+            progress_count INTEGER,
+            average_progress REAL,
+            recent_updates INTEGER,
+            recorded_at TEXT,
+            PRIMARY KEY (metric_date, scope, state_name, division_name)
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{METRICS_TABLE}_scope_date ON {METRICS_TABLE} (scope, metric_date)")
+
+
+def _add_metrics(total: Dict, row) -> Dict:
+    for column in METRIC_COLUMNS:
+        total[column] = total.get(column, 0) + (row[column] or 0)
+    return total
+
+
+def _with_average(metrics: Dict) -> Dict:
+    count = metrics.get("progress_count", 0)
+    metrics["average_progress"] = metrics.get("progress_sum", 0) / count if count else 0.0
+    return metrics
+
+
+def compute_daily_metrics(conn: sqlite3.Connection, recent_since: str) -> Dict:
+    """The report's figures for the whole table, per state and per division, from one scan.
+
+    Returns {"all": metrics, "states": {state: metrics}, "divisions": {(state, division): metrics}}.
+    recent_since is an ISO date, compared with updated_on.
+    """
+    overall, states, divisions = {}, {}, {}
+    cursor = conn.execute(DAILY_METRICS_SQL, (recent_since,))
+    names = [column[0] for column in cursor.description]
+    for values in cursor:
+        row = dict(zip(names, values))
+        state, division = row["state_name"] or "", row["division_name"] or ""
+        _add_metrics(overall, row)
+        _add_metrics(states.setdefault(state, {}), row)
+        _add_metrics(divisions.setdefault((state, division), {}), row)
+    return {
+        "all": _with_average(overall or {column: 0 for column in METRIC_COLUMNS}),
+        "states": {state: _with_average(metrics) for state, metrics in states.items()},
+        "divisions": {key: _with_average(metrics) for key, metrics in divisions.items()}
+    }
+
+
+def save_daily_metrics(conn: sqlite3.Connection, metric_date: str, metrics: Dict):
+    """Appends a day's metrics to the history; running the report again the same day replaces that day."""
+    create_metrics_table(conn)
+    recorded_at = datetime.now().isoformat(timespec="seconds")
+    rows = [("all", "", "", metrics["all"])]
+    rows += [("state", state, "", values) for state, values in metrics["states"].items()]
+    rows += [("division", state, division, values) for (state, division), values in metrics["divisions"].items()]
+    columns = METRIC_COLUMNS + ("average_progress",)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {METRICS_TABLE} (metric_date, scope, state_name, division_name, {', '.join(columns)}, recorded_at) "
+        f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in columns)}, ?)",
+        [(metric_date, scope, state, division, *(values[column] for column in columns), recorded_at)
+         for scope, state, division, values in rows]
+    )
+    conn.commit()
+
+
+def progress_trend(conn: sqlite3.Connection, days: int, filters: Optional[Dict[str, str]] = None) -> List[Tuple[str, float]]:
+    """[(date, average progress)] from the last day recorded at least `days` before the latest one
+    (or the first day recorded) up to the latest, for the whole table or a state/division filter.
+
+    filters are the query planner's {column: lowercase value}.
+    """
+    filters = {column: value for column, value in (filters or {}).items() if column in ("state_name", "division_name")}
+    if "division_name" in filters:
+        scope = "division"
+    elif "state_name" in filters:
+        scope = "state"
+    else:
+        scope = "all"
+    conditions = ["scope = ?"] + [f"LOWER({column}) = ?" for column in sorted(filters)]
+    params = [scope] + [filters[column] for column in sorted(filters)]
+    # Divisions with the same name in several states are added up, like the planner's filters do
+    rows = conn.execute(
+        f"SELECT metric_date, SUM(progress_sum), SUM(progress_count) FROM {METRICS_TABLE} "
+        f"WHERE {' AND '.join(conditions)} GROUP BY metric_date ORDER BY metric_date",
+        params
+    ).fetchall()
+    series = [(metric_date, total / count if count else 0.0) for metric_date, total, count in rows]
+    if not series:
+        return []
+    latest = datetime.strptime(series[-1][0], "%Y-%m-%d").date()
+    start = 0
+    for i, (metric_date, _) in enumerate(series):
+        if (latest - datetime.strptime(metric_date, "%Y-%m-%d").date()).days >= days:
+            start = i
+    return series[start:]
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Versioned data lives side by side under the releases directory:
+#
+#     releases/20250701-020000/schemes.db, schemes_parquet/, chroma_db/, memmap_index/
+#     releases/CURRENT.json   -> which version of each component is served
+#
+# A job writes a new version directory and then publishes it by replacing CURRENT.json,
+# so a running server never sees a half-written database or vector store.
+MARKER_FILE = "CURRENT.json"
+COMPONENTS = ("schemes_db", "chroma_db", "memmap_index")
+KEEP_VERSIONS = 3  # Older versions are deleted on publish; in-flight requests may still read the previous one
+VERSION_CHECK_SECONDS = 15  # How often a serving process looks for a newly published version
+
+
+def new_version() -> str:
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def version_dir(releases_dir: str, version: str) -> str:
+    """Directory of a version, created if needed."""
+    path = os.path.join(releases_dir, version)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def read_current(releases_dir: str) -> Optional[Dict]:
+    """The published marker, or None when nothing has been published."""
+    try:
+        with open(os.path.join(releases_dir, MARKER_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read data version marker in {releases_dir}: {e}")
+        return None
+
+
+def component_path(releases_dir: str, marker: Optional[Dict], component: str) -> Optional[str]:
+    """Absolute path of a component in a marker, or None if that version has none."""
+    relative_path = (marker or {}).get("components", {}).get(component)
+    return os.path.join(releases_dir, relative_path) if relative_path else None
+
+
+def publish_version(releases_dir: str, version: str, components: Dict[str, str]) -> Dict:
+    """Makes a version current for the components it built; the others stay on their published version.
+
+    components maps component names to paths inside the version directory.
+    """
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        raise ValueError(f"Unknown data components: {sorted(unknown)}")
+    current = read_current(releases_dir) or {}
+    marker = {
+        "version": version,
+        "published_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "components": {
+            **current.get("components", {}),
+            **{name: os.path.relpath(path, releases_dir) for name, path in components.items()}
+        }
+    }
+    marker_path = os.path.join(releases_dir, MARKER_FILE)
+    temp_path = f"{marker_path}.tmp-{os.getpid()}"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(marker, file, indent=2)
+    os.replace(temp_path, marker_path)
+    print(f"Published data version {version}: {', '.join(sorted(components))}")
+    prune_versions(releases_dir, marker)
+    return marker
+
+
+def prune_versions(releases_dir: str, marker: Dict, keep: int = KEEP_VERSIONS):
+    """Deletes all but the newest `keep` versions, never one the marker still points into."""
+    in_use = {path.split(os.sep)[0] for path in marker["components"].values()}
+    versions = sorted(name for name in os.listdir(releases_dir) if os.path.isdir(os.path.join(releases_dir, name)))
+    for name in versions[:-keep]:
+        if name not in in_use:
+            shutil.rmtree(os.path.join(releases_dir, name), ignore_errors=True)
+            print(f"Deleted data version {name}")
+
+
+class VersionWatcher:
+    """Polls the marker in a background thread and hands each newly published version to on_change.
+
+    on_change(marker) returns True once it serves the new version; on False the
+    version is retried at the next check. Threads do not survive a fork, so a
+    pre-fork master stops its watcher and every worker starts its own.
+    """
+
+    def __init__(self, releases_dir: str, on_change: Callable[[Dict], bool], check_seconds: float = VERSION_CHECK_SECONDS):
+        self.releases_dir = releases_dir
+        self.on_change = on_change
+        self.check_seconds = check_seconds
+        self.serving: Optional[Dict] = None
+        self.served_since = None
+        self.counters = {"checks": 0, "swaps": 0, "swap_failures": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def serve(self, marker: Optional[Dict]):
+        """Records the version loaded at startup."""
+        self.serving = marker
+        self.served_since = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def check(self) -> bool:
+        """Swaps to the published version if it is newer than the one served; True if a swap happened."""
+        with self._lock:
+            self.counters["checks"] += 1
+            marker = read_current(self.releases_dir)
+            if marker is None or marker == self.serving:
+                return False
+            print(f"DEBUG: Data version {marker['version']} published, swapping from {(self.serving or {}).get('version')}")
+            try:
+                swapped = self.on_change(marker)
+            except Exception as e:
+                print(f"ERROR: Swapping to data version {marker['version']} failed: {e}")
+                swapped = False
+            if not swapped:
+                self.counters["swap_failures"] += 1
+                return False
+            self.serve(marker)
+            self.counters["swaps"] += 1
+            return True
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Fresh primitives: ones inherited across a fork may have been held by a thread that no longer exists
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="data-version-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.check_seconds):
+            self.check()
+
+    def stats(self) -> Dict:
+        serving = self.serving or {}
+        return {
+            "version": serving.get("version", "unversioned"),
+            "published_at": serving.get("published_at"),
+            "components": serving.get("components", {}),
+            "served_since": self.served_since,
+            "releases_dir": self.releases_dir,
+            **self.counters
+        }
@@ -0,0 +1,46 @@
+from typing import Dict, List, Optional
+
+from transformers import pipeline
+
+
+class ExtractiveAnswerer:
+    """Finds the answer span to a question inside the retrieved chunks with a compact extractive QA model.
+
+    Much cheaper than generating an answer token by token when the answer sits
+    verbatim in the context (websites, dates, names, figures).
+    """
+
+    def __init__(self, model_name: str = "deepset/minilm-uncased-squad2", batch_size: int = 8, max_answer_len: int = 64):
+        """Load the question-answering pipeline on CPU."""
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_answer_len = max_answer_len
+        self.pipe = pipeline("question-answering", model=model_name, tokenizer=model_name, device=-1)
+
+    def answer(self, question: str, docs: List) -> Optional[Dict]:
+        """Best answer span across all documents, scored in one batched pass.
+
+        Returns a dict with the span, its confidence (model probability) and the
+        document it came from, or None when there is nothing to search.
+        """
+        docs = [doc for doc in docs if doc.page_content.strip()]
+        if not docs:
+            return None
+
+        outputs = self.pipe(
+            [{"question": question, "context": doc.page_content} for doc in docs],
+            batch_size=self.batch_size,
+            max_answer_len=self.max_answer_len
+        )
+        if isinstance(outputs, dict):
+            outputs = [outputs]
+
+        best = max(range(len(outputs)), key=lambda i: outputs[i]["score"])
+        span = outputs[best]["answer"].strip()
+        if not span:
+            return None
+        return {
+            "answer": span,
+            "score": float(outputs[best]["score"]),
+            "document": docs[best]
+        }
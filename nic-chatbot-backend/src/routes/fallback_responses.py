@@ -0,0 +1,24 @@
+def get_fallback_response(query_text):
+    """Provide intelligent fallback responses for common queries."""
+    query_lower = query_text.lower()
+    
+    if "website" in query_lower and ("jjm" in query_lower or "jal jeevan mission" in query_lower):
+        return {
+            "answer": "The official website of Jal Jeevan Mission (JJM) is jaljeevanmission.gov.in. This website provides comprehensive information about the mission's objectives, progress, implementation guidelines, and state-wise data.",
+            "source_documents": []
+        }
+    elif "jjm" in query_lower or "jal jeevan mission" in query_lower:
+        return {
+            "answer": "Jal Jeevan Mission (JJM) is a flagship program launched by the Government of India in August 2019 under the Ministry of Jal Shakti. The mission aims to provide safe and adequate drinking water through individual household tap connections (FHTC) to all households in rural India by 2024. The program has a total outlay of ₹3.60 lakh crores and focuses on ensuring 55 litres per capita per day of water supply.",
+            "source_documents": []
+        }
+    elif "swachh bharat" in query_lower:
+        return {
+            "answer": "Swachh Bharat Mission is a nationwide cleanliness campaign launched by the Government of India in 2014. It aims to eliminate open defecation and improve solid waste management across India.",
+            "source_documents": []
+        }
+    else:
+        return {
+            "answer": "I apologize, but I couldn't find specific information about your query in the available documents. Please try rephrasing your question or ask about Jal Jeevan Mission, Swachh Bharat Mission, or water and sanitation schemes.",
+            "source_documents": []
+        }
@@ -0,0 +1,69 @@
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from src.routes.query_planner import filter_clause
+
+# Tap connection (FHTC) coverage, fhtcs_provided against fhtcs_planned, summed per
+# (state, division, sanction year) when the data is loaded. Coverage questions are answered
+# from this table alone, which is a few hundred rows however large schemes grows.
+COVERAGE_TABLE = "fhtc_coverage"
+COVERAGE_DIMENSIONS = {"state_name": "State", "division_name": "Division", "sanction_year": "Sanction Year"}
+
+
+def build_coverage_table(conn: sqlite3.Connection):
+    """(Re)builds the coverage table from schemes; run after every change to the schemes table."""
+    conn.commit()  # The table must see the caller's changes to schemes
+    # One transaction, so the chatbot never sees the table missing or half built
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {COVERAGE_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {COVERAGE_TABLE} AS
+            SELECT state_name, division_name, sanction_year,
+                   COUNT(*) AS scheme_count,
+                   TOTAL(fhtcs_planned) AS fhtcs_planned,
+                   TOTAL(fhtcs_provided) AS fhtcs_provided,
+                   CASE WHEN TOTAL(fhtcs_planned) > 0
+                        THEN TOTAL(fhtcs_provided) * 100.0 / TOTAL(fhtcs_planned) END AS coverage_percent
+            FROM schemes
+            GROUP BY state_name, division_name, sanction_year
+        """)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    coverage_rows = conn.execute(f"SELECT COUNT(*) FROM {COVERAGE_TABLE}").fetchone()[0]
+    print(f"Built {COVERAGE_TABLE} with {coverage_rows} rows")
+
+
+def coverage_by(conn: sqlite3.Connection, dimension: Optional[str] = None, filters: Optional[Dict[str, str]] = None,
+                top_n: Optional[int] = None, order: Optional[str] = None) -> List[Tuple]:
+    """[(group, provided, planned, coverage percent)] from the coverage table.
+
+    Without a dimension there is one row for everything the filters select.
+    Groups with nothing planned have no coverage and are left out. order is
+    "asc"/"desc" by coverage (top_n keeps the first groups), default by group.
+    """
+    if dimension is not None and dimension not in COVERAGE_DIMENSIONS:
+        raise ValueError(f"Cannot group coverage by {dimension!r}")
+    where_clause, params = filter_clause(filters or {})
+    conditions = [where_clause] if where_clause else []
+    if dimension:
+        conditions.insert(0, f"{dimension} IS NOT NULL AND {dimension} != ''")
+    sql = (
+        f"SELECT {dimension or 'NULL'} AS label, SUM(fhtcs_provided) AS provided, SUM(fhtcs_planned) AS planned, "
+        f"SUM(fhtcs_provided) * 100.0 / SUM(fhtcs_planned) AS coverage FROM {COVERAGE_TABLE}"
+    )
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if dimension:
+        sql += f" GROUP BY {dimension} HAVING SUM(fhtcs_planned) > 0"
+        if order in ("asc", "desc"):
+            sql += f" ORDER BY coverage {order.upper()}, label"
+        else:
+            sql += " ORDER BY label"
+        if top_n:
+            sql += " LIMIT ?"
+            params.append(int(top_n))
+    rows = conn.execute(sql, params).fetchall()
+    return [tuple(row) for row in rows if row[2]]
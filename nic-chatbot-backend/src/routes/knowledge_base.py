@@ -0,0 +1,601 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from src.routes.vector_index import MemmapVectorStore
+from src.routes.reranker import CrossEncoderReranker
+from src.routes.extractive_qa import ExtractiveAnswerer
+from src.routes.circuit_breaker import LatencyCircuitBreaker
+from src.routes.fallback_responses import get_fallback_response
+from src.routes.data_versions import component_path, read_current
+
+# Langchain imports
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain_community.llms import HuggingFacePipeline
+from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM, AutoModelForSeq2SeqLM
+import torch
+
+# --- Configuration --- #
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+KNOWLEDGE_BASE_PERSIST_DIR = os.path.join(BASE_DIR, "..", "..", "data", "chroma_db")
+MEMMAP_INDEX_DIR = os.path.join(BASE_DIR, "..", "..", "data", "memmap_index")
+# Published data versions (see data_versions.py); the fixed directories above are used until one is published
+DATA_RELEASES_DIR = os.environ.get("DATA_RELEASES_DIR", os.path.join(BASE_DIR, "..", "..", "data", "releases"))
+# "chroma" (default) or "memmap" for the exact memory-mapped index built by data_loading_script.py
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "chroma")
+MEMMAP_RESCORE_FACTOR = 4  # Compressed memmap indexes rescore k * factor candidates in full precision
+FAQ_COLLECTION_NAME = "faq_questions"  # Built by data_loading_script.process_faq_index
+FAQ_SIMILARITY_THRESHOLD = 0.85  # Minimum cosine similarity to answer straight from the FAQ index
+PROGRAM_COLLECTION_PREFIX = "kb_"  # Per-program collections built by data_loading_script.process_knowledge_base
+# NLU scheme entities mapped to the knowledge base partition they should search
+SCHEME_PROGRAMS = {
+    "jal jeevan mission": "jjm",
+    "swachh bharat mission": "sbm",
+    "department of drinking water and sanitation": "ddws"
+}
+RETRIEVER_SEARCH_KWARGS = {"k": 8, "fetch_k": 20}
+# Optional cross-encoder stage: retrieve RERANK_CANDIDATES chunks by similarity, send only the best RERANK_TOP_N to the LLM
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 20
+RERANK_TOP_N = 3
+# "generative" (default) or "extractive": answer with a span from the retrieved chunks and
+# only fall back to generation when the extractive model's confidence is below the threshold
+ANSWER_MODE = os.environ.get("ANSWER_MODE", "generative")
+EXTRACTIVE_QA_MODEL_NAME = "deepset/minilm-uncased-squad2"
+EXTRACTIVE_QA_MIN_SCORE = 0.3
+# Latency budget for a knowledge base request. If generation would not finish within what is
+# left after retrieval, the top retrieved snippet is returned instead. The circuit breaker
+# switches to snippet-only answers while generation p95 stays above GENERATION_TARGET_P95_MS.
+RAG_LATENCY_BUDGET_SECONDS = float(os.environ.get("RAG_LATENCY_BUDGET_SECONDS", "15"))
+GENERATION_TARGET_P95_MS = 8000
+GENERATION_WORKERS = 2  # Bounds how many generations (including abandoned ones) run at once
+GENERATION_MAX_PENDING = 4  # Generations submitted but not finished (running or queued) before new ones fall back
+BREAKER_COOLDOWN_SECONDS = 30
+SNIPPET_MAX_CHARS = 600
+
+# Enhanced Langchain RAG Setup
+
+# 1. Load Better Embeddings
+model_name = "sentence-transformers/all-mpnet-base-v2"  # Better embedding model
+model_kwargs = {"device": "cpu"}
+encode_kwargs = {"normalize_embeddings": True}  # Normalize for better similarity
+embeddings = HuggingFaceEmbeddings(
+    model_name=model_name,
+    model_kwargs=model_kwargs,
+    encode_kwargs=encode_kwargs
+)
+print(f"DEBUG: Enhanced embeddings initialized: {embeddings is not None}")
+
+# 2. Load Vector Store with better retrieval settings
+def load_vector_stores(persist_directory, memmap_index_dir):
+    """Opens the main knowledge base, the FAQ index and the per-program partitions."""
+    if VECTOR_STORE_BACKEND == "memmap":
+        if not os.path.exists(memmap_index_dir):
+            print(f"ERROR: Memory-mapped index not found at {memmap_index_dir}.")
+            vectordb = None
+        else:
+            vectordb = MemmapVectorStore(memmap_index_dir, embeddings, rescore_factor=MEMMAP_RESCORE_FACTOR)
+            print(f"DEBUG: Memmap index footprint: {vectordb.memory_footprint()}")
+    elif not os.path.exists(persist_directory):
+        print(f"ERROR: Knowledge base directory not found at {persist_directory}.")
+        vectordb = None
+    else:
+        vectordb = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+    print(f"DEBUG: Vectordb loaded ({VECTOR_STORE_BACKEND}): {vectordb is not None}")
+
+    # Curated Q&A pairs indexed by question, answered verbatim without the LLM
+    faq_db = None
+    if vectordb is not None and VECTOR_STORE_BACKEND == "memmap":
+        if os.path.exists(os.path.join(memmap_index_dir, "faq")):
+            faq_db = MemmapVectorStore(os.path.join(memmap_index_dir, "faq"), embeddings)
+        else:
+            print("WARNING: FAQ index not found, run data_loading_script.py to build it.")
+    elif vectordb is not None:
+        faq_db = Chroma(
+            collection_name=FAQ_COLLECTION_NAME,
+            persist_directory=persist_directory,
+            embedding_function=embeddings,
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+        if faq_db._collection.count() == 0:
+            print("WARNING: FAQ index is empty, run data_loading_script.py to build it.")
+            faq_db = None
+    print(f"DEBUG: FAQ index loaded: {faq_db is not None}")
+
+    # Per-program partitions of the knowledge base for scheme-routed retrieval
+    program_vectordbs = {}
+    if vectordb is not None and VECTOR_STORE_BACKEND == "memmap":
+        for program in vectordb.partition_names():
+            program_vectordbs[program] = vectordb.partition(program)
+    elif vectordb is not None:
+        for program in set(SCHEME_PROGRAMS.values()):
+            program_db = Chroma(
+                collection_name=PROGRAM_COLLECTION_PREFIX + program,
+                persist_directory=persist_directory,
+                embedding_function=embeddings
+            )
+            if program_db._collection.count() > 0:
+                program_vectordbs[program] = program_db
+    print(f"DEBUG: Program partitions loaded: {sorted(program_vectordbs)}")
+    return vectordb, faq_db, program_vectordbs
+
+def published_vector_dirs():
+    """(Chroma directory, memmap index directory) of the published data version, or the fixed ones."""
+    marker = read_current(DATA_RELEASES_DIR)
+    return (
+        component_path(DATA_RELEASES_DIR, marker, "chroma_db") or KNOWLEDGE_BASE_PERSIST_DIR,
+        component_path(DATA_RELEASES_DIR, marker, "memmap_index") or MEMMAP_INDEX_DIR
+    )
+
+loaded_vector_dirs = published_vector_dirs()
+vector_store_lock = threading.Lock()  # One reload at a time; concurrent requests for the same version become no-ops
+vectordb, faq_db, program_vectordbs = load_vector_stores(*loaded_vector_dirs)
+
+# 3. Setup Better LLM
+def setup_llm():
+    """Setup the best available LLM for text generation."""
+    try:
+        # Try Microsoft DialoGPT for better conversational responses
+        model_name = "microsoft/DialoGPT-medium"
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(model_name)
+        
+        # Add padding token if not present
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        
+        pipe = pipeline(
+            "text-generation",
+            model=model,
+            tokenizer=tokenizer,
+            max_new_tokens=200,
+            temperature=0.7,
+            do_sample=True,
+            top_k=50,
+            top_p=0.95,
+            pad_token_id=tokenizer.eos_token_id
+        )
+        llm = HuggingFacePipeline(pipeline=pipe)
+        print(f"DEBUG: DialoGPT LLM initialized successfully.")
+        return llm
+        
+    except Exception as e:
+        print(f"DialoGPT failed: {e}")
+        try:
+            # Fallback to FLAN-T5 Large for better reasoning
+            model_name = "google/flan-t5-large"
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            
+            pipe = pipeline(
+                "text2text-generation",
+                model=model,
+                tokenizer=tokenizer,
+                max_new_tokens=300,
+                temperature=0.3,
+                do_sample=True,
+                top_k=50,
+                top_p=0.95
+            )
+            llm = HuggingFacePipeline(pipeline=pipe)
+            print(f"DEBUG: FLAN-T5 Large LLM initialized successfully.")
+            return llm
+            
+        except Exception as e2:
+            print(f"FLAN-T5 Large failed: {e2}")
+            # Final fallback to smaller model
+            try:
+                model_name = "google/flan-t5-base"
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+                
+                pipe = pipeline(
+                    "text2text-generation",
+                    model=model,
+                    tokenizer=tokenizer,
+                    max_new_tokens=250,
+                    temperature=0.4,
+                    do_sample=True
+                )
+                llm = HuggingFacePipeline(pipeline=pipe)
+                print(f"DEBUG: FLAN-T5 Base LLM initialized successfully.")
+                return llm
+                
+            except Exception as e3:
+                print(f"All LLM models failed: {e3}")
+                # Mock LLM as final fallback
+                class EnhancedMockLLM:
+                    def __call__(self, prompt):
+                        # Extract question from prompt
+                        if "Question:" in prompt:
+                            question = prompt.split("Question:")[-1].strip()
+                            if "jjm" in question.lower() or "jal jeevan mission" in question.lower():
+                                if "website" in question.lower():
+                                    return "The official website of Jal Jeevan Mission (JJM) is jaljeevanmission.gov.in. This website provides comprehensive information about the mission, its progress, guidelines, and implementation details."
+                                else:
+                                    return "Jal Jeevan Mission (JJM) is a flagship program launched by the Government of India in 2019 to provide safe and adequate drinking water through individual household tap connections to all households in rural India by 2024."
+                        return "I apologize, but I'm having trouble accessing the knowledge base. Please try rephrasing your question."
+                    
+                    def invoke(self, prompt):
+                        return self.__call__(prompt)
+                
+                return EnhancedMockLLM()
+
+llm = setup_llm()
+
+# 4. Enhanced RetrievalQA Chain with much better prompt
+reranker = None
+rerank_active = False
+retriever = None
+program_retrievers = {}
+
+def configure_reranking(enabled):
+    """(Re)builds the retrievers for the chosen mode and loads the reranker on first use."""
+    global reranker, rerank_active, retriever, program_retrievers
+    if enabled and reranker is None:
+        reranker = CrossEncoderReranker(RERANK_MODEL_NAME)
+        print(f"DEBUG: Cross-encoder reranker initialized: {RERANK_MODEL_NAME}")
+
+    if enabled:
+        # Plain similarity for a wide candidate pool; the cross-encoder does the selection
+        search_type, search_kwargs = "similarity", {"k": RERANK_CANDIDATES}
+    else:
+        # Maximum Marginal Relevance for diverse results; retrieve more, then filter
+        search_type, search_kwargs = "mmr", RETRIEVER_SEARCH_KWARGS
+
+    retriever = vectordb.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+    program_retrievers = {
+        program: program_db.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+        for program, program_db in program_vectordbs.items()
+    }
+    rerank_active = enabled
+
+# Much improved prompt template
+prompt_template = """You are an expert assistant specializing in Indian water and sanitation programs, particularly the Jal Jeevan Mission (JJM), Swachh Bharat Mission (SBM), and DDWS initiatives.
+
+Your task is to provide accurate, helpful, and specific answers based on the provided context. Follow these guidelines:
+
+1. ANSWER DIRECTLY: Start with a clear, direct answer to the question
+2. USE CONTEXT: Base your response primarily on the provided context
+3. BE SPECIFIC: Include specific details like websites, dates, numbers when available
+4. BE CONCISE: Provide focused answers without unnecessary elaboration
+5. ACKNOWLEDGE LIMITS: If the context doesn't contain the answer, say so clearly
+
+Context Information:
+{context}
+
+Question: {question}
+
+Instructions: Provide a clear, accurate answer based on the context above. If asking about websites, provide the exact URL if mentioned in the context.
+
+Answer:"""
+
+QA_CHAIN_PROMPT = PromptTemplate.from_template(prompt_template)
+
+def build_qa_chain():
+    """The RetrievalQA chain over the current retriever."""
+    return RetrievalQA.from_chain_type(
+        llm,
+        retriever=retriever,
+        chain_type_kwargs={"prompt": QA_CHAIN_PROMPT},
+        return_source_documents=True
+    )
+
+if vectordb:
+    # Better retriever with more relevant chunks
+    configure_reranking(RERANK_ENABLED)
+    qa_chain = build_qa_chain()
+else:
+    qa_chain = None
+    print("WARNING: qa_chain could not be initialized because vectordb is None.")
+
+print(f"DEBUG: Enhanced QA Chain initialized: {qa_chain is not None}")
+
+extractive_answerer = None
+answer_mode = "generative"
+
+def configure_answer_mode(mode):
+    """Switches between generative and extractive answering, loading the extractive model on first use."""
+    global extractive_answerer, answer_mode
+    if mode == "extractive" and extractive_answerer is None:
+        extractive_answerer = ExtractiveAnswerer(EXTRACTIVE_QA_MODEL_NAME)
+        print(f"DEBUG: Extractive QA model initialized: {EXTRACTIVE_QA_MODEL_NAME}")
+    answer_mode = mode
+
+if qa_chain:
+    configure_answer_mode(ANSWER_MODE)
+
+generation_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generation")
+generation_pending = threading.BoundedSemaphore(GENERATION_MAX_PENDING)
+generation_breaker = LatencyCircuitBreaker(GENERATION_TARGET_P95_MS, cooldown_seconds=BREAKER_COOLDOWN_SECONDS)
+
+def reload_vector_stores(persist_directory=None, memmap_index_dir=None):
+    """Opens the vector stores in the given directories and rebuilds the retrievers on them; models are kept.
+
+    Without directories the current ones are reopened (e.g. after a fork). Asking
+    for the directories already loaded is a no-op, so every web worker can pass on
+    a new data version to a shared model server. Returns False, keeping the
+    current stores, when the new ones cannot be opened.
+    """
+    global vectordb, faq_db, program_vectordbs, loaded_vector_dirs, qa_chain
+    with vector_store_lock:
+        new_dirs = (persist_directory or loaded_vector_dirs[0], memmap_index_dir or loaded_vector_dirs[1])
+        if (persist_directory or memmap_index_dir) and new_dirs == loaded_vector_dirs:
+            return True
+        new_vectordb, new_faq_db, new_program_vectordbs = load_vector_stores(*new_dirs)
+        if new_vectordb is None:
+            print("WARNING: Keeping the current vector stores, the new ones could not be opened.")
+            return False
+        # Queries already running keep the stores they started with
+        vectordb, faq_db, program_vectordbs = new_vectordb, new_faq_db, new_program_vectordbs
+        loaded_vector_dirs = new_dirs
+        # Chunk ids (file:page:index) repeat across versions, so cached scores would outlive their text
+        if reranker is not None:
+            reranker.clear_cache()
+        if qa_chain:
+            configure_reranking(rerank_active)
+            qa_chain.retriever = retriever
+        else:
+            # The server started without a usable knowledge base; this is its first one
+            configure_reranking(RERANK_ENABLED)
+            qa_chain = build_qa_chain()
+            configure_answer_mode(ANSWER_MODE)
+            print("DEBUG: QA chain initialized on the reloaded vector stores.")
+    return True
+
+# --- Pre-fork serving (see gunicorn.conf.py) --- #
+
+def _torch_models():
+    """The torch modules behind every loaded model."""
+    models = [
+        getattr(embeddings, "client", None),
+        getattr(getattr(llm, "pipeline", None), "model", None),
+        reranker.model.model if reranker else None,
+        extractive_answerer.pipe.model if extractive_answerer else None
+    ]
+    return [model for model in models if isinstance(model, torch.nn.Module)]
+
+def prepare_for_fork():
+    """Runs once in the pre-fork master: moves model weights to shared memory so workers never copy them."""
+    models = _torch_models()
+    for model in models:
+        model.eval()
+        model.requires_grad_(False)
+        model.share_memory()
+    print(f"DEBUG: {len(models)} models moved to shared memory for forked workers")
+
+def after_fork(torch_threads=1):
+    """Runs in each forked worker: limits torch threads, restarts the generation pool, reopens vector store handles."""
+    global generation_executor, generation_pending
+    torch.set_num_threads(torch_threads)
+    generation_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generation")
+    generation_pending = threading.BoundedSemaphore(GENERATION_MAX_PENDING)
+    if VECTOR_STORE_BACKEND != "memmap":
+        # Chroma caches one client (and its SQLite connections) per path; the master's must not be reused
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+    reload_vector_stores()
+
+def nearest_faq_question(query_text, query_vector=None):
+    """[(doc, cosine similarity)] of the closest FAQ question, embedding the query unless a vector is given."""
+    if query_vector is None:
+        return faq_db.similarity_search_with_relevance_scores(query_text.strip(), k=1)
+    if isinstance(faq_db, MemmapVectorStore):
+        return faq_db.similarity_search_with_score_by_vector(query_vector, k=1)
+    # Chroma returns the cosine distance here
+    return [(doc, 1.0 - distance) for doc, distance in faq_db.similarity_search_by_vector_with_relevance_scores(query_vector, k=1)]
+
+def lookup_faq_answer(query_text, query_vector=None):
+    """Returns the curated answer of the closest known question, or None if nothing is close enough."""
+    if not faq_db:
+        return None
+
+    try:
+        results = nearest_faq_question(query_text, query_vector)
+    except Exception as e:
+        print(f"ERROR: FAQ lookup failed: {e}")
+        return None
+
+    if not results:
+        return None
+
+    # Cosine similarity for both backends (the Chroma collection uses cosine space)
+    doc, similarity = results[0]
+    print(f"DEBUG: FAQ nearest question: {doc.page_content[:100]} (similarity {similarity:.3f})")
+    if similarity < FAQ_SIMILARITY_THRESHOLD:
+        return None
+
+    return {
+        "answer": doc.metadata["answer"],
+        "source_documents": [{
+            "source": doc.metadata.get("source"),
+            "page": doc.metadata.get("page"),
+            "question": doc.page_content
+        }],
+        "answer_source": "faq",
+        "similarity": round(similarity, 4)
+    }
+
+def select_retriever(parsed_query):
+    """Picks the partition retriever for a single recognized scheme, else the full knowledge base."""
+    if parsed_query:
+        programs = {SCHEME_PROGRAMS[scheme] for scheme in parsed_query['entities'].get('schemes', []) if scheme in SCHEME_PROGRAMS}
+        if len(programs) == 1:
+            program = programs.pop()
+            if program in program_retrievers:
+                return program, program_retrievers[program]
+    return None, retriever
+
+def retrieve_documents(query_text, parsed_query=None, query_vector=None):
+    """Retrieves context chunks, searching only the matching scheme partition when the NLU found one.
+
+    query_vector is the query's precomputed embedding (batch requests); the
+    retriever's search settings are applied to it directly.
+    """
+    program, active_retriever = select_retriever(parsed_query)
+    if query_vector is None:
+        docs = active_retriever.invoke(query_text)
+    elif active_retriever.search_type == "mmr":
+        docs = active_retriever.vectorstore.max_marginal_relevance_search_by_vector(query_vector, **active_retriever.search_kwargs)
+    else:
+        docs = active_retriever.vectorstore.similarity_search_by_vector(query_vector, **active_retriever.search_kwargs)
+    print(f"DEBUG: Retrieved {len(docs)} chunks from partition: {program or 'all'}")
+    if rerank_active:
+        docs = reranker.rerank(query_text, docs, RERANK_TOP_N)
+        print(f"DEBUG: Reranked down to {len(docs)} chunks")
+    return docs
+
+def generate_answer(query_text, docs):
+    """Runs the LLM over the retrieved chunks with the QA prompt."""
+    result = qa_chain.combine_documents_chain.invoke({"input_documents": docs, "question": query_text})
+    return result["output_text"].strip()
+
+def extract_answer(query_text, docs):
+    """Answer span from the retrieved chunks if the extractive model is confident enough, else None."""
+    if answer_mode != "extractive":
+        return None
+    try:
+        extracted = extractive_answerer.answer(query_text, docs)
+    except Exception as e:
+        print(f"ERROR: Extractive QA failed: {e}")
+        return None
+    if not extracted:
+        return None
+    print(f"DEBUG: Extractive answer: {extracted['answer'][:100]} (score {extracted['score']:.3f})")
+    if extracted["score"] < EXTRACTIVE_QA_MIN_SCORE:
+        return None
+    return {
+        "answer": extracted["answer"],
+        "source_documents": [extracted["document"].metadata],
+        "answer_source": "extractive",
+        "confidence": round(extracted["score"], 4)
+    }
+
+def snippet_response(query_text, docs, reason):
+    """Answers with the top retrieved chunk, trimmed at a sentence boundary, when generation is skipped."""
+    if not docs:
+        return get_fallback_response(query_text)
+    snippet = " ".join(docs[0].page_content.split())
+    if len(snippet) > SNIPPET_MAX_CHARS:
+        cut = snippet.rfind(". ", 0, SNIPPET_MAX_CHARS)
+        snippet = snippet[:cut + 1] if cut > 0 else snippet[:SNIPPET_MAX_CHARS] + "..."
+    print(f"DEBUG: Answering with retrieved snippet ({reason})")
+    return {
+        "answer": snippet,
+        "source_documents": [docs[0].metadata],
+        "answer_source": "snippet",
+        "fallback_reason": reason
+    }
+
+def generate_answer_within_budget(query_text, docs, deadline):
+    """Generates an answer if the budget and circuit breaker allow it; returns None to signal a snippet fallback."""
+    remaining_ms = (deadline - time.monotonic()) * 1000
+    if remaining_ms <= 0:
+        generation_breaker.record_skipped()
+        return None, "latency_budget"
+    if not generation_breaker.allow_generation():
+        return None, "circuit_open"
+    # A half-open probe must run to let the breaker recover, so only skip on the estimate when closed
+    expected_ms = generation_breaker.expected_latency_ms()
+    if generation_breaker.state == LatencyCircuitBreaker.CLOSED and expected_ms is not None and expected_ms > remaining_ms:
+        generation_breaker.record_skipped()
+        return None, "latency_budget"
+
+    # Abandoned generations keep running, so cap what may pile up behind the executor
+    pending = generation_pending
+    if not pending.acquire(blocking=False):
+        generation_breaker.cancel_probe()
+        generation_breaker.record_skipped()
+        return None, "generation_busy"
+    start = time.monotonic()
+    future = generation_executor.submit(generate_answer, query_text, docs)
+    future.add_done_callback(lambda _: pending.release())
+    try:
+        answer = future.result(timeout=remaining_ms / 1000)
+    except FutureTimeoutError:
+        # Drops the work if it is still queued; one already running cannot be stopped and holds its
+        # worker (and pending slot) until it finishes
+        future.cancel()
+        generation_breaker.record((time.monotonic() - start) * 1000, within_budget=False)
+        return None, "latency_budget"
+    except Exception:
+        generation_breaker.cancel_probe()
+        raise
+    generation_breaker.record((time.monotonic() - start) * 1000)
+    return answer, None
+
+def query_knowledge_base(query_text, parsed_query=None, query_vector=None, check_faq=True):
+    """Enhanced knowledge base querying with better error handling and fallbacks.
+
+    check_faq=False skips the FAQ lookup for callers that already made it.
+    """
+    deadline = time.monotonic() + RAG_LATENCY_BUDGET_SECONDS
+    faq_result = lookup_faq_answer(query_text, query_vector) if check_faq else None
+    if faq_result:
+        return faq_result
+
+    if not qa_chain:
+        print("DEBUG: qa_chain is None in query_knowledge_base.")
+        return get_fallback_response(query_text)
+    
+    try:
+        # Clean and prepare the query
+        cleaned_query = query_text.strip()
+        
+        source_docs = retrieve_documents(cleaned_query, parsed_query, query_vector)
+        extracted = extract_answer(cleaned_query, source_docs)
+        if extracted:
+            return extracted
+
+        answer, fallback_reason = generate_answer_within_budget(cleaned_query, source_docs, deadline)
+        if fallback_reason:
+            return snippet_response(cleaned_query, source_docs, fallback_reason)
+        print(f"DEBUG: RAG query: {cleaned_query}")
+        
+        # Post-process the answer to ensure quality
+        if len(answer) < 10 or answer.lower().startswith("i don't know") or "context" in answer.lower():
+            return get_fallback_response(query_text)
+        
+        print(f"DEBUG: RAG answer: {answer[:200]}...")
+        return {
+            "answer": answer,
+            "source_documents": [doc.metadata for doc in source_docs],
+            "answer_source": "rag"
+        }
+            
+    except Exception as e:
+        print(f"ERROR: Exception during qa_chain.invoke: {e}")
+        import traceback
+        traceback.print_exc()
+        return get_fallback_response(query_text)
+
+def query_knowledge_base_batch(queries, parsed_queries):
+    """Answers several questions in order, embedding all of them in one batched model pass first."""
+    query_vectors = [None] * len(queries)
+    if queries and vectordb:
+        try:
+            query_vectors = embeddings.embed_documents([query.strip() for query in queries])
+        except Exception as e:
+            print(f"ERROR: Batch embedding failed, embedding queries one by one: {e}")
+    return [
+        query_knowledge_base(query, parsed_query, query_vector)
+        for query, parsed_query, query_vector in zip(queries, parsed_queries, query_vectors)
+    ]
+
+def stats():
+    """Knowledge base runtime counters for /api/metrics."""
+    return {
+        "circuit_breaker": generation_breaker.stats(),
+        "latency_budget_seconds": RAG_LATENCY_BUDGET_SECONDS,
+        "reranker": reranker.stats() if reranker else None,
+        "vector_dirs": list(loaded_vector_dirs)
+    }
+
+def is_ready():
+    """Whether the vector store and QA chain loaded, for the health check."""
+    return bool(qa_chain and vectordb)
@@ -0,0 +1,206 @@
+import argparse
+import os
+import sys
+import threading
+from multiprocessing.connection import Client, Listener, AuthenticationError
+from typing import Dict
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.routes.fallback_responses import get_fallback_response
+
+DEFAULT_ADDRESS = "/tmp/nic-chatbot-model-server.sock"
+VECTOR_RELOAD_TIMEOUT_SECONDS = 300  # Opening a new data version's vector stores
+# The only knowledge_base functions a client may call
+SERVED_METHODS = (
+    "query_knowledge_base", "query_knowledge_base_batch", "lookup_faq_answer", "reload_vector_stores", "stats", "is_ready"
+)
+# Every message on the connection is unpickled, so the shared secret is what stands between a
+# peer and running code in the server. There is deliberately no default: both sides read it from
+# MODEL_SERVER_AUTHKEY and refuse to start without it.
+AUTHKEY_ENV = "MODEL_SERVER_AUTHKEY"
+
+
+class ModelServerError(Exception):
+    """Raised when the model server is unreachable, too slow, or failed the call."""
+
+
+def read_authkey() -> bytes:
+    """The shared secret from the environment, or b"" when it is not set."""
+    return os.environ.get(AUTHKEY_ENV, "").encode("utf-8")
+
+
+def parse_address(address: str):
+    """'host:port' is a TCP address, anything else a unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def handle_connection(conn, knowledge_base):
+    """Answers (method, args) requests on one client connection until the client disconnects."""
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            if method not in SERVED_METHODS:
+                conn.send(("error", f"Unknown method: {method}"))
+                continue
+            try:
+                result = getattr(knowledge_base, method)(*args)
+            except Exception as e:
+                print(f"ERROR: Model server call {method} failed: {e}")
+                conn.send(("error", repr(e)))
+            else:
+                conn.send(("ok", result))
+
+
+def serve(address: str, authkey: bytes):
+    """Loads the knowledge base once and serves it to every web worker on this machine."""
+    if not authkey:
+        raise ValueError(f"{AUTHKEY_ENV} must be set to start the model server")
+    # Importing the module loads the embeddings, vector store and LLM
+    from src.routes import knowledge_base
+
+    listen_address = parse_address(address)
+    if isinstance(listen_address, str) and os.path.exists(listen_address):
+        os.remove(listen_address)  # Stale socket left by a previous run
+    listener = Listener(listen_address, authkey=authkey)
+    print(f"DEBUG: Model server listening on {address} (knowledge base ready: {knowledge_base.is_ready()})")
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as e:
+                print(f"WARNING: Model server rejected a connection: {e}")
+                continue
+            # One thread per connection; generation itself is bounded by the knowledge base's executor
+            threading.Thread(target=handle_connection, args=(conn, knowledge_base), daemon=True).start()
+    finally:
+        listener.close()
+
+
+class RemoteKnowledgeBase:
+    """Client for the model server with the same query_knowledge_base/stats/is_ready interface as knowledge_base.py.
+
+    Each thread keeps its own connection so concurrent requests never interleave
+    on a socket. A request that could not be sent (e.g. the server restarted) is
+    sent once more on a new connection; one that was sent is never repeated.
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout_seconds: float = 30):
+        if not authkey:
+            raise ModelServerError(f"{AUTHKEY_ENV} must be set to use the model server at {address}")
+        self.address = address
+        self.authkey = authkey
+        self.timeout_seconds = timeout_seconds
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(parse_address(self.address), authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, method: str, *args, timeout_seconds: float = None):
+        timeout_seconds = timeout_seconds or self.timeout_seconds
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((method, args))
+            except OSError as e:
+                # Not delivered, so it is safe to send again on a new connection
+                self._drop_connection()
+                if attempt:
+                    raise ModelServerError(f"Model server at {self.address} is unreachable: {e}") from e
+                continue
+            break
+        try:
+            if not conn.poll(timeout_seconds):
+                # A late reply would be read as the answer to the next call, so drop the connection
+                self._drop_connection()
+                raise ModelServerError(f"Model server did not answer {method} within {timeout_seconds}s")
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            # The server may already be running the request; sending it again could run it twice
+            self._drop_connection()
+            raise ModelServerError(f"Model server at {self.address} dropped the connection during {method}: {e}") from e
+        if status != "ok":
+            raise ModelServerError(result)
+        return result
+
+    def prepare_for_fork(self):
+        """Nothing to share: the models live in the model server."""
+
+    def after_fork(self, torch_threads=1):
+        """Drops connections inherited from the pre-fork master; each worker opens its own."""
+        self._local = threading.local()
+
+    def query_knowledge_base(self, query_text, parsed_query=None, check_faq=True):
+        try:
+            return self.call("query_knowledge_base", query_text, parsed_query, None, check_faq)
+        except ModelServerError as e:
+            print(f"ERROR: Remote knowledge base query failed: {e}")
+            return get_fallback_response(query_text)
+
+    def lookup_faq_answer(self, query_text):
+        try:
+            return self.call("lookup_faq_answer", query_text)
+        except ModelServerError as e:
+            print(f"ERROR: Remote FAQ lookup failed: {e}")
+            return None
+
+    def query_knowledge_base_batch(self, queries, parsed_queries):
+        try:
+            # Each question has its own latency budget on the server
+            return self.call("query_knowledge_base_batch", queries, parsed_queries,
+                             timeout_seconds=self.timeout_seconds * max(1, len(queries)))
+        except ModelServerError as e:
+            print(f"ERROR: Remote knowledge base batch failed: {e}")
+            return [get_fallback_response(query) for query in queries]
+
+    def reload_vector_stores(self, persist_directory=None, memmap_index_dir=None):
+        """Asks the model server to serve a new data version; it reloads once however many workers ask."""
+        try:
+            return self.call("reload_vector_stores", persist_directory, memmap_index_dir,
+                             timeout_seconds=VECTOR_RELOAD_TIMEOUT_SECONDS)
+        except ModelServerError as e:
+            print(f"ERROR: Remote vector store reload failed: {e}")
+            return False
+
+    def stats(self) -> Dict:
+        try:
+            remote_stats = self.call("stats")
+        except ModelServerError as e:
+            remote_stats = {"error": str(e)}
+        return {"model_server": self.address, **remote_stats}
+
+    def is_ready(self) -> bool:
+        return bool(self.call("is_ready"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model server: owns the embeddings, vector store and LLM for all web workers")
+    parser.add_argument("--address", default=os.environ.get("MODEL_SERVER_ADDRESS", DEFAULT_ADDRESS),
+                        help="Unix socket path or host:port to listen on")
+    args = parser.parse_args()
+    authkey = read_authkey()
+    if not authkey:
+        print(f"ERROR: Set {AUTHKEY_ENV} to a shared secret (the web workers need the same value)")
+        sys.exit(1)
+    serve(args.address, authkey)
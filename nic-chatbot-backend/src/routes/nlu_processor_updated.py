@@ -3,6 +3,103 @@ import re
 import csv
 from typing import Dict, List, Optional, Tuple
 
+# Misspelled states/divisions ("mandsaur" for "mandsour") are matched within a few edits, only
+# when no name matched exactly. Short words get no edits: too many query words are one edit
+# away from a short division name.
+FUZZY_MIN_LENGTH = 5
+FUZZY_CACHE_SIZE = 4096  # Query words and phrases already looked up; questions reuse the same words
+# Ordinary words are often one edit from a short name ("blind" -> bhind, "sugar" -> sagar), so only
+# words in a place position are fuzzy matched: after one of these words or before one of those
+LOCATION_PREFIX_WORDS = {'in', 'for', 'of', 'at', 'from'}
+LOCATION_SUFFIX_WORDS = {'state', 'states', 'division', 'divisions', 'district', 'districts'}
+# Fuzzy matches below this confidence (one edit in a name of six letters or fewer) are not used
+FUZZY_MIN_CONFIDENCE = 0.84
+# Words of questions rather than of places; a query word among these, or among the words of the
+# intent and analytics patterns, is never fuzzy matched
+QUERY_WORDS = {
+    'a', 'an', 'and', 'are', 'by', 'for', 'from', 'how', 'in', 'is', 'me', 'many', 'of', 'on', 'show',
+    'the', 'there', 'to', 'what', 'which', 'with', 'all', 'each', 'every', 'give', 'list', 'tell',
+    'about', 'where', 'state', 'states', 'division', 'divisions', 'district', 'districts', 'scheme',
+    'schemes', 'water', 'village', 'villages', 'total', 'number', 'average', 'count', 'chart'
+}
+# Intents only the scheme data can answer. Questions in these shapes keep their intent when they
+# also name a program ("FHTC coverage under JJM"), instead of becoming scheme_info.
+PROGRAM_DATA_INTENTS = ('scheme_lookup', 'completed_in_year', 'recently_updated', 'fhtc_coverage', 'progress_trend')
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance between two strings; with a limit, any distance above it is returned as limit + 1."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_edits(length: int) -> int:
+    """Edits allowed when fuzzy matching a name of this length."""
+    if length < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if length < 8 else 2
+
+
+class BKTree:
+    """Burkhard-Keller tree over words, for every word within an edit distance of a query.
+
+    Each child hangs off its parent at its distance from the parent; by the
+    triangle inequality only children at distance d-k..d+k of a parent that is d
+    away from the query can be within k, so most of the tree is never visited.
+    Distances are only worked out as far as the farthest child could need.
+    """
+
+    def __init__(self, words=()):
+        self.root = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if self.root is None:
+            self.root = (word, {})
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """[(distance, word)] for every word within max_distance, closest first."""
+        if self.root is None:
+            return []
+        matches = []
+        pending = [self.root]
+        while pending:
+            node_word, children = pending.pop()
+            distance = edit_distance(word, node_word, max(children, default=0) + max_distance)
+            if distance <= max_distance:
+                matches.append((distance, node_word))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return sorted(matches)
+
+
 class NLUProcessor:
     """Natural Language Understanding processor for extracting entities and intents from user queries."""
     
@@ -20,6 +117,30 @@ class NLUProcessor:
         
         # Intent patterns
         self.intent_patterns = {
+            # One scheme by name or ID ("status of Rampur MVS scheme"), before the status/progress patterns
+            'scheme_lookup': [
+                r'\bscheme\s*(?:id|no\.?|number)\b',
+                r'\b(?:status|details?|info(?:rmation)?|progress)\s+(?:of|for|about|on)\s+(?:the\s+)?'
+                r'(?!(?:the\s+)?(?:schemes?|all|jjm|sbm|jal jeevan|swachh bharat)\b)\w+.*\bscheme\b(?!s)',
+                r'\b(?:find|search(?:\s+for)?|look\s*up|lookup)\s+(?:the\s+)?scheme\b(?!s)'
+            ],
+            # Date range questions, checked before the counts they are phrased as
+            'completed_in_year': [
+                r'\b(?:completed|finished)\b.*\b(?:19|20)\d{2}\b'
+            ],
+            'recently_updated': [
+                r'\bupdated\b.*\b(?:last|past|previous|recently|yesterday)\b',
+                r'\b(?:recently|last|latest)\s+updated\b',
+                r'\brecent\s+updates?\b'
+            ],
+            # Tap connection coverage: provided against planned. Questions naming only planned or
+            # provided connections ("total FHTCs provided by state") are analytics of that measure.
+            'fhtc_coverage': [
+                r'\bcoverage\b',
+                r'\bprovided\b.*\b(?:vs|versus|against|out of|compared)\b.*\bplanned\b',
+                r'\b(?:fhtcs?|tap connections?)\b.*\b(?:percent|percentage|ratio|share)\b',
+                r'^(?!.*\b(?:planned|provided)\b).*\b(?:fhtcs?|tap connections?)\b'
+            ],
             'count_schemes': [
                 r'how many schemes?',
                 r'count.*schemes?',
@@ -37,6 +158,11 @@ class NLUProcessor:
                 r'type.*scheme',
                 r'categories.*scheme'
             ],
+            # Checked before progress_analysis: "how did progress change since last month"
+            'progress_trend': [
+                r'progress.*\b(?:change|changed|trend|improve|improved|increase|increased|decrease|decreased|since|over the)\b',
+                r'\b(?:change|trend|improvement|increase|decrease)\b.*progress'
+            ],
             'progress_analysis': [
                 r'progress',
                 r'completion',
@@ -44,6 +170,46 @@ class NLUProcessor:
             ],
             'scheme_info': []
         }
+        
+        # Analytics patterns, mapped to schemes table columns (checked in order, first match wins)
+        self.dimension_patterns = [
+            ('work_status', r'work status'),
+            ('physical_status', r'physical status|status'),
+            ('funding_source', r'fund'),
+            ('water_source_type', r'water source|source'),
+            ('water_scheme_type', r'svs|mvs|water scheme'),
+            ('scheme_type', r'retrofit|augmentation|new scheme'),
+            ('type_of_scheme', r'type|categor'),
+            ('state_name', r'state'),
+            ('division_name', r'division|district'),
+            ('sanction_year', r'year')
+        ]
+        self.measure_patterns = [
+            ('central_share_cost', r'central share'),
+            ('fhtcs_planned', r'planned (?:fhtcs?|tap connections?|connections?)|(?:fhtcs?|connections?) planned'),
+            ('fhtcs_provided', r'fhtcs?|tap connections?|connections?'),
+            ('total_expenditure', r'expenditure|spent|spending'),
+            ('estimated_cost', r'cost|budget'),
+            ('physical_completion_progress', r'progress|completion')
+        ]
+        # Time periods ("last month", "past 2 weeks") in days
+        self.period_units = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+        self.aggregation_patterns = [
+            ('avg', r'(?:average|avg|mean)\b'),
+            ('max', r'(?:maximum|max)\b'),
+            ('min', r'(?:minimum|min)\b'),
+            ('sum', r'(?:total|sum|how much|how many|number of)\b')
+        ]
+        
+        # Fuzzy gazetteer of states and divisions, for misspelled names
+        self.location_index = BKTree(sorted(self.states | self.divisions))
+        self.longest_location = max((len(name) for name in self.states | self.divisions), default=0)
+        self.longest_location_words = max((len(name.split()) for name in self.states | self.divisions), default=0)
+        patterns = [pattern for patterns in self.intent_patterns.values() for pattern in patterns]
+        patterns += [pattern for _, pattern in self.dimension_patterns + self.measure_patterns + self.aggregation_patterns]
+        location_words = {word for name in self.states | self.divisions for word in name.split()}
+        self.query_words = (QUERY_WORDS | set(re.findall(r'[a-z]{3,}', ' '.join(patterns + list(self.period_units))))) - location_words
+        self._fuzzy_cache = {}
     
     def _load_location_entities_from_csv(self, csv_path):
         """Load unique states and divisions from the CSV file."""
@@ -99,8 +265,11 @@ class NLUProcessor:
             'vizianagaram', 'wimberlygunj', 'ysr kadapa'
         ])
     
-    def extract_entities(self, query: str) -> Dict[str, List[str]]:
-        """Extract location entities (states and divisions) from the query."""
+    def extract_entities(self, query: str, doc=None) -> Dict[str, List[str]]:
+        """Extract location entities (states and divisions) from the query.
+
+        doc is the query's spaCy document when it was already parsed (see parse_queries).
+        """
         query_lower = query.lower()
         entities = {
             'states': [],
@@ -110,7 +279,8 @@ class NLUProcessor:
         }
         
         # Process with spaCy for general entity recognition
-        doc = self.nlp(query)
+        if doc is None:
+            doc = self.nlp(query)
         
         # Extract GPE (Geopolitical entities) from spaCy
         for ent in doc.ents:
@@ -127,19 +297,20 @@ class NLUProcessor:
             'andaman': 'andaman and nicobar islands',
             'nicobar': 'andaman and nicobar islands',
             'sbm': 'swachh bharat mission',
-            'jjm': 'jal jeevan mission'
+            'jjm': 'jal jeevan mission',
+            'swachh bharat': 'swachh bharat mission',
+            'jal jeevan': 'jal jeevan mission',
+            'ddws': 'department of drinking water and sanitation'
         }
+        scheme_names = {'swachh bharat mission', 'jal jeevan mission', 'department of drinking water and sanitation'}
         
         # Check abbreviations first to avoid conflicts
         for abbrev, full_name in abbreviation_variations.items():
             # Use word boundaries to avoid matching substrings
             if re.search(r'\b' + abbrev + r'\b', query_lower):
-                if full_name == 'swachh bharat mission':
-                    if 'swachh bharat mission' not in entities['schemes']:
-                        entities['schemes'].append('swachh bharat mission')
-                elif full_name == 'jal jeevan mission':
-                    if 'jal jeevan mission' not in entities['schemes']:
-                        entities['schemes'].append('jal jeevan mission')
+                if full_name in scheme_names:
+                    if full_name not in entities['schemes']:
+                        entities['schemes'].append(full_name)
                 elif full_name in self.states:
                     if full_name not in entities['states']:
                         entities['states'].append(full_name)
@@ -163,12 +334,78 @@ class NLUProcessor:
         
         return entities
     
+    def match_location(self, query: str, entities: Dict[str, List[str]]) -> Optional[Dict]:
+        """How the query's state/division was found, adding a misspelled one to entities.
+        
+        Exact matches have confidence 1.0. Without one, the closest state or division
+        within max_edits of a run of query words in a place position is used, with
+        confidence 1 - edits / name length, if that is at least FUZZY_MIN_CONFIDENCE.
+        None when the query names no known place.
+        """
+        for kind, names in (('state', entities['states']), ('division', entities['divisions'])):
+            if names:
+                return {'name': names[0], 'type': kind, 'method': 'exact', 'confidence': 1.0}
+        for location in entities['locations']:
+            if location in self.states or location in self.divisions:
+                kind = 'state' if location in self.states else 'division'
+                return {'name': location, 'type': kind, 'method': 'exact', 'confidence': 1.0}
+        
+        words = re.findall(r"[a-z]+", query.lower())
+        best = None
+        for size in range(1, self.longest_location_words + 1):
+            for start in range(len(words) - size + 1):
+                window = words[start:start + size]
+                if window[0] in self.query_words or window[-1] in self.query_words:
+                    continue  # Names may contain them ("andaman and nicobar islands") but do not start or end with them
+                before = words[start - 1] if start else None
+                after = words[start + size] if start + size < len(words) else None
+                if before not in LOCATION_PREFIX_WORDS and after not in LOCATION_SUFFIX_WORDS:
+                    continue
+                text = ' '.join(window)
+                if not max_edits(len(text)) or len(text) > self.longest_location + 2:
+                    continue  # Only exact matches possible, or longer than any name
+                for distance, name in self._fuzzy_matches(text):
+                    key = (distance, name not in self.states, -len(name))
+                    if best is None or key < best[0]:
+                        best = (key, name, text, distance)
+        if best is None or 1 - best[3] / len(best[1]) < FUZZY_MIN_CONFIDENCE:
+            return None
+        _, name, text, distance = best
+        kind = 'state' if name in self.states else 'division'
+        entities['states' if kind == 'state' else 'divisions'].append(name)
+        return {
+            'name': name,
+            'type': kind,
+            'method': 'fuzzy',
+            'matched_text': text,
+            'distance': distance,
+            'confidence': round(1 - distance / len(name), 2)
+        }
+    
+    def _fuzzy_matches(self, text: str) -> List[Tuple[int, str]]:
+        """[(edits, name)] of the states/divisions a misspelling of text could be, closest first."""
+        matches = self._fuzzy_cache.get(text)
+        if matches is None:
+            matches = [
+                (distance, name) for distance, name in self.location_index.search(text, max_edits(len(text)))
+                # Exact ones are extract_entities' to find (e.g. a state word it skipped)
+                if 0 < distance <= max_edits(len(name))
+            ]
+            if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+                self._fuzzy_cache.clear()
+            self._fuzzy_cache[text] = matches
+        return matches
+    
     def classify_intent(self, query: str, entities: Dict[str, List[str]]) -> str:
         """Classify the intent of the user query."""
         query_lower = query.lower()
         
-        # Check for scheme_info intent first if specific scheme entities are found
+        # Check for scheme_info intent first if specific scheme entities are found; the program
+        # name stays in entities for retrieval, but data questions about it keep their intent
         if entities.get("schemes") and len(entities["schemes"]) > 0:
+            for intent in PROGRAM_DATA_INTENTS:
+                if any(re.search(pattern, query_lower) for pattern in self.intent_patterns[intent]):
+                    return intent
             return "scheme_info"
 
         for intent, patterns in self.intent_patterns.items():
@@ -182,17 +419,123 @@ class NLUProcessor:
         
         return 'general_query'
     
-    def parse_query(self, query: str) -> Dict:
+    def _match_pattern(self, patterns: List[Tuple[str, str]], text: str) -> Optional[str]:
+        for name, pattern in patterns:
+            if re.search(r'\b(?:' + pattern + r')', text):
+                return name
+        return None
+    
+    def extract_analytics(self, query: str) -> Optional[Dict]:
+        """Extract a group-by analytics request: dimension, measure, aggregation and top/bottom N.
+        
+        Returns None unless the query groups by something ("by state", "division-wise",
+        "top 5 divisions") or aggregates a measure ("total expenditure"); plain counts
+        and the other questions are left to the intent.
+        """
+        query_lower = query.lower()
+        
+        # Top/bottom N, e.g. "top 5 divisions by expenditure", "which state has the lowest cost"
+        top_n = None
+        order = None
+        dimension = None
+        ranking = re.search(r'\b(top|bottom|highest|lowest|best|worst|least)\s+(\d+)\s*([a-z]*)', query_lower)
+        if ranking:
+            top_n = int(ranking.group(2))
+            order = 'desc' if ranking.group(1) in ('top', 'highest', 'best') else 'asc'
+            dimension = self._match_pattern(self.dimension_patterns, ranking.group(3))
+        elif re.search(r'\b(highest|most|lowest|least)\b', query_lower):
+            which = re.search(r'\bwhich\s+([a-z]+)', query_lower)
+            if which:
+                dimension = self._match_pattern(self.dimension_patterns, which.group(1))
+                top_n = 1
+                order = 'asc' if re.search(r'\b(lowest|least)\b', query_lower) else 'desc'
+        
+        # Grouping, e.g. "by state", "per division", "state-wise"
+        if dimension is None:
+            for match in re.finditer(r'\b(?:by|per|across|each|every)\s+(?:the\s+)?([a-z]+(?:\s+[a-z]+)?)|\b([a-z]+)[\s-]wise\b', query_lower):
+                dimension = self._match_pattern(self.dimension_patterns, match.group(1) or match.group(2))
+                if dimension:
+                    break
+        
+        measure = self._match_pattern(self.measure_patterns, query_lower)
+        aggregation = self._match_pattern(self.aggregation_patterns, query_lower)
+        if dimension is None:
+            top_n = order = None
+            # Without grouping, only explicit aggregates of a measure ("total expenditure in Haryana")
+            if measure is None or aggregation is None:
+                return None
+        
+        if measure is None:
+            aggregation = 'count'
+        elif aggregation is None:
+            aggregation = 'avg' if measure == 'physical_completion_progress' else 'sum'
+        
+        return {
+            'dimension': dimension,
+            'measure': measure,
+            'aggregation': aggregation,
+            'top_n': top_n,
+            'order': order
+        }
+    
+    def extract_period_days(self, query: str) -> Optional[int]:
+        """The time period a query looks back over in days ("since last month" -> 30), or None."""
+        query_lower = query.lower()
+        units = '|'.join(self.period_units)
+        match = re.search(r'\b(?:last|past|previous)\s+(\d+)\s+(' + units + r')s?\b', query_lower)
+        if match:
+            return int(match.group(1)) * self.period_units[match.group(2)]
+        match = re.search(r'\b(?:last|past|previous|a|one)\s+(' + units + r')\b', query_lower)
+        if match:
+            return self.period_units[match.group(1)]
+        if re.search(r'\byesterday\b', query_lower):
+            return 1
+        return None
+    
+    def extract_year(self, query: str) -> Optional[int]:
+        """A calendar year named in the query ("completed in 2024" -> 2024), or None."""
+        match = re.search(r'\b((?:19|20)\d{2})\b', query)
+        return int(match.group(1)) if match else None
+    
+    def parse_query(self, query: str, doc=None) -> Dict:
         """Parse the user query and extract intent and entities."""
-        entities = self.extract_entities(query)
+        entities = self.extract_entities(query, doc)
+        location_match = self.match_location(query, entities)
         intent = self.classify_intent(query, entities)
         
         return {
             'intent': intent,
             'entities': entities,
+            'analytics': self.extract_analytics(query),
+            'period_days': self.extract_period_days(query),
+            'year': self.extract_year(query),
+            'location_match': location_match,
             'original_query': query
         }
     
+    def parse_queries(self, queries: List[str], batch_size: int = 64) -> List[Dict]:
+        """Parse many queries at once, running spaCy over them in batches with nlp.pipe."""
+        docs = self.nlp.pipe(queries, batch_size=batch_size)
+        return [self.parse_query(query, doc) for query, doc in zip(queries, docs)]
+    
+    def location_filters(self, entities: Dict[str, List[str]]) -> Dict[str, str]:
+        """The location filter as {column: lowercase value}, for the query planner.
+        
+        Picks the same state/division as build_location_filter.
+        """
+        filters = {}
+        if entities['states']:
+            filters['state_name'] = entities['states'][0].lower()
+        if entities['divisions']:
+            filters['division_name'] = entities['divisions'][0].lower()
+        if entities['locations'] and not entities['states'] and not entities['divisions']:
+            location = entities['locations'][0].lower()
+            if location in self.states:
+                filters['state_name'] = location
+            elif location in self.divisions:
+                filters['division_name'] = location
+        return filters
+    
     def build_location_filter(self, entities: Dict[str, List[str]]) -> Tuple[str, List]:
         """Build SQL WHERE clause and parameters for location filtering."""
         conditions = []
@@ -0,0 +1,271 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.routes.query_planner import DIMENSIONS, MEASURES, order_rows, shape_result
+
+PARTITION_COLUMNS = ("state_name", "sanction_year")
+MANIFEST_FILE = "_manifest.json"
+PARQUET_DIR_NAME = "schemes_parquet"  # Created next to schemes.db
+EXPORT_CHUNK_ROWS = 200000
+ROW_GROUP_ROWS = 100000
+DATASET_CHECK_SECONDS = 30  # How often queries look for a newer export
+# SQLite declared type -> Parquet type; anything else is exported as text
+SQLITE_TYPES = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+# How str() writes an integer or float SQLite stored; text in a numeric column never looks like this
+STORED_NUMBER = re.compile(r"-?\d+(\.\d+)?(e[+-]?\d+)?")
+
+
+def _arrow_schema(conn):
+    """Parquet schema of the schemes table, and the numeric dimensions exported as text.
+
+    A dimension column whose values are not all numbers (e.g. sanction_year
+    "2019-20") is exported as text so every value still forms its own group.
+    """
+    fields, text_dimensions = [], []
+    for _, name, declared_type, *_ in conn.execute("PRAGMA table_info(schemes)").fetchall():
+        arrow_type = SQLITE_TYPES.get(declared_type.upper(), pa.string())
+        if name in DIMENSIONS and not pa.types.is_string(arrow_type) and conn.execute(
+            f"SELECT 1 FROM schemes WHERE typeof({name}) = 'text' AND {name} != '' LIMIT 1"
+        ).fetchone():
+            arrow_type = pa.string()
+            text_dimensions.append(name)
+        fields.append((name, arrow_type))
+    return pa.schema(fields), text_dimensions
+
+
+def _stored_value(value):
+    """A value of a numeric dimension exported as text, back as SQLite stored it (number or text)."""
+    if isinstance(value, str) and STORED_NUMBER.fullmatch(value):
+        return int(value) if value.lstrip("-").isdigit() else float(value)
+    return value
+
+
+def _typed_chunk(chunk: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """A chunk of rows with the types the planner sees in SQLite.
+
+    SQLite keeps text that is not a number ('' for a missing value) in numeric
+    columns and reads it as 0 in arithmetic, so it is exported as 0; in numeric
+    dimension columns it can only be '' (see _arrow_schema), which never forms
+    a group and is exported as NULL.
+    """
+    arrays = []
+    for field in schema:
+        values = chunk[field.name]
+        if pa.types.is_string(field.type):
+            arrays.append(pa.array(values.where(values.isna(), values.astype(str)), type=pa.string(), from_pandas=True))
+            continue
+        numbers = pd.to_numeric(values, errors="coerce")
+        if field.name not in DIMENSIONS:
+            numbers = numbers.where(values.isna() | numbers.notna(), 0)
+        if pa.types.is_integer(field.type):
+            numbers = numbers.astype("Int64")
+        arrays.append(pa.array(numbers, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _column_statistics(table: pa.Table) -> Dict:
+    """Per-column statistics for the manifest: nulls, min/max of measures, distinct values of dimensions."""
+    statistics = {}
+    for name in table.column_names:
+        column = table.column(name)
+        entry = {"null_count": column.null_count}
+        if name in MEASURES:
+            min_max = pc.min_max(column).as_py()
+            entry.update({"min": min_max["min"], "max": min_max["max"]})
+        if name in DIMENSIONS:
+            entry["values"] = sorted(v for v in pc.unique(column).to_pylist() if v is not None and v != "")
+        statistics[name] = entry
+    return statistics
+
+
+def export_parquet(db_path: str, output_dir: str) -> Dict:
+    """Writes the schemes table as Parquet partitioned by state and sanction year (hive layout).
+
+    The export is written next to output_dir and moved into place when complete.
+    Files carry row group min/max statistics; _manifest.json adds row counts,
+    the partitions and per-column statistics for the query backend.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        schema, text_dimensions = _arrow_schema(conn)
+        tables = [
+            _typed_chunk(chunk, schema)
+            for chunk in pd.read_sql_query("SELECT * FROM schemes", conn, chunksize=EXPORT_CHUNK_ROWS, dtype=object)
+        ]
+    finally:
+        conn.close()
+    table = pa.concat_tables(tables) if tables else schema.empty_table()
+
+    staging_dir = f"{output_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    partitioning = ds.partitioning(pa.schema([schema.field(name) for name in PARTITION_COLUMNS]), flavor="hive")
+    ds.write_dataset(
+        table, staging_dir, format="parquet", partitioning=partitioning,
+        max_rows_per_group=ROW_GROUP_ROWS, min_rows_per_group=min(ROW_GROUP_ROWS, max(table.num_rows, 1)),
+        existing_data_behavior="overwrite_or_ignore"
+    )
+
+    partitions = table.group_by(list(PARTITION_COLUMNS)).aggregate([([], "count_all")]) if table.num_rows else None
+    manifest = {
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": os.path.abspath(db_path),
+        "rows": table.num_rows,
+        "partition_schema": [[name, str(schema.field(name).type)] for name in PARTITION_COLUMNS],
+        "text_dimensions": text_dimensions,
+        "partitions": [
+            {"state_name": row["state_name"], "sanction_year": row["sanction_year"], "rows": row["count_all"]}
+            for row in (partitions.to_pylist() if partitions else [])
+        ],
+        "columns": _column_statistics(table)
+    }
+    with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, default=str)
+
+    # Swap the new export in; readers that fail in between fall back to SQLite
+    old_dir = f"{output_dir}.old-{os.getpid()}"
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(staging_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"Exported {table.num_rows} schemes to Parquet in {len(manifest['partitions'])} partitions at {output_dir}")
+    return manifest
+
+
+def export_schemes_parquet(db_path: str) -> bool:
+    """Refreshes the Parquet export kept next to the database; a failed export leaves the old one in place."""
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), PARQUET_DIR_NAME)
+    try:
+        export_parquet(db_path, output_dir)
+    except (OSError, sqlite3.Error, ValueError, pa.ArrowException) as e:
+        print(f"ERROR: Parquet export failed: {e}")
+        return False
+    return True
+
+
+class ParquetBackend:
+    """Answers planner specs from the Parquet export with pyarrow datasets.
+
+    Only the columns a spec needs are read, and filters on the state and year
+    prune whole partitions; other filters skip row groups by their statistics.
+    The dataset is reopened when the export's manifest changes.
+    """
+
+    def __init__(self, dataset_dir: str, check_seconds: float = DATASET_CHECK_SECONDS):
+        self.dataset_dir = dataset_dir
+        self.check_seconds = check_seconds
+        self.dataset = None
+        self.manifest = None
+        self._manifest_mtime = None
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = {"queries": 0, "reloads": 0, "reload_failures": 0}
+
+    def reload(self) -> bool:
+        manifest_path = os.path.join(self.dataset_dir, MANIFEST_FILE)
+        try:
+            mtime = os.path.getmtime(manifest_path)
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            # The exported types, rather than the ones pyarrow would infer from directory names
+            partition_schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in manifest["partition_schema"]])
+            dataset = ds.dataset(self.dataset_dir, format="parquet", partitioning=ds.partitioning(partition_schema, flavor="hive"))
+        except (OSError, ValueError, pa.ArrowException) as e:
+            print(f"WARNING: Could not open Parquet dataset at {self.dataset_dir}: {e}")
+            self.counters["reload_failures"] += 1
+            return False
+        with self._lock:
+            self.dataset, self.manifest, self._manifest_mtime = dataset, manifest, mtime
+        self.counters["reloads"] += 1
+        print(f"DEBUG: Parquet dataset opened: {manifest['rows']} schemes in {len(manifest['partitions'])} partitions")
+        return True
+
+    def is_ready(self) -> bool:
+        return self.dataset is not None
+
+    def execute(self, spec: Dict) -> Dict:
+        """Same result as QueryPlanner.execute on the database the export was made from."""
+        self._reload_if_changed()
+        with self._lock:
+            dataset, manifest = self.dataset, self.manifest
+        self.counters["queries"] += 1
+
+        dimension, measure, aggregation = spec["dimension"], spec["measure"], spec["aggregation"]
+        expression = None
+        for column, value in spec["filters"].items():
+            matches = pa.array(self._matching_values(manifest, column, value), type=dataset.schema.field(column).type)
+            condition = pc.field(column).isin(matches)
+            expression = condition if expression is None else expression & condition
+        if spec["positive_only"]:
+            expression = pc.field(measure) > 0 if expression is None else expression & (pc.field(measure) > 0)
+        if dimension:
+            condition = pc.field(dimension).is_valid()
+            if pa.types.is_string(dataset.schema.field(dimension).type):
+                condition = condition & (pc.field(dimension) != "")
+            expression = condition if expression is None else expression & condition
+
+        columns = [name for name in (dimension, measure) if name] or [PARTITION_COLUMNS[0]]
+        table = dataset.to_table(columns=columns, filter=expression)
+
+        if dimension is None:
+            return shape_result(spec, [(None, self._aggregate_all(table, measure, aggregation))])
+        if aggregation == "count":
+            grouped = table.group_by(dimension).aggregate([(dimension, "count")])
+            value_column = f"{dimension}_count"
+        else:
+            arrow_aggregation = "mean" if aggregation == "avg" else aggregation
+            grouped = table.group_by(dimension).aggregate([(measure, arrow_aggregation)])
+            value_column = f"{measure}_{arrow_aggregation}"
+        rows = list(zip(grouped.column(dimension).to_pylist(), grouped.column(value_column).to_pylist()))
+        if dimension in manifest.get("text_dimensions", []):
+            # Order numbers and text the way SQLite does
+            rows = [(_stored_value(key), value) for key, value in rows]
+        return shape_result(spec, order_rows(spec, rows))
+
+    @staticmethod
+    def _matching_values(manifest, column, value) -> List:
+        """Stored values of a column equal to a filter value ignoring case, as SQL's LOWER(column) = ?."""
+        return [stored for stored in manifest["columns"][column].get("values", []) if str(stored).lower() == value]
+
+    @staticmethod
+    def _aggregate_all(table, measure, aggregation):
+        if aggregation == "count":
+            return table.num_rows
+        column = table.column(measure)
+        if aggregation == "sum":
+            return pc.sum(column, min_count=1).as_py()
+        if aggregation == "avg":
+            return pc.mean(column).as_py()
+        return pc.min_max(column).as_py()[aggregation]
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            changed = os.path.getmtime(os.path.join(self.dataset_dir, MANIFEST_FILE)) != self._manifest_mtime
+        except OSError:
+            return
+        if changed:
+            self.reload()
+
+    def stats(self) -> Dict:
+        manifest = self.manifest or {}
+        return {
+            "backend": "parquet",
+            "rows": manifest.get("rows", 0),
+            "partitions": len(manifest.get("partitions", [])),
+            "exported_at": manifest.get("exported_at"),
+            **self.counters
+        }
@@ -0,0 +1,362 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Columns a plan may group or filter by, and the numeric columns it may aggregate, with their
+# chart labels. Only these names are ever put into SQL text; filter values are bound parameters.
+DIMENSIONS = {
+    "state_name": "State",
+    "division_name": "Division",
+    "sanction_year": "Sanction Year",
+    "type_of_scheme": "Type of Scheme",
+    "scheme_type": "New/Retrofit/Augmentation",
+    "water_scheme_type": "SVS/MVS/Bulk Scheme",
+    "water_source_type": "Water Source",
+    "funding_source": "Funding Source",
+    "work_status": "Work Status",
+    "physical_status": "Physical Status"
+}
+MEASURES = {
+    "estimated_cost": "Estimated Cost (in lakhs)",
+    "total_expenditure": "Expenditure (in lakhs)",
+    "central_share_cost": "Central Share Cost (in lakhs)",
+    "fhtcs_planned": "FHTCs Planned",
+    "fhtcs_provided": "FHTCs Provided",
+    "physical_completion_progress": "Physical Completion Progress (%)"
+}
+AGGREGATIONS = {"count": "Number of Schemes", "sum": "Total", "avg": "Average", "min": "Minimum", "max": "Maximum"}
+ORDERS = ("dimension", "desc", "asc")
+MAX_TOP_N = 50
+
+# Pre-aggregated copy of schemes grouped by ROLLUP_DIMENSIONS (see build_rollup_table).
+# Count/sum/avg plans that only group and filter by these columns read it instead of schemes.
+ROLLUP_TABLE = "scheme_rollup"
+ROLLUP_DIMENSIONS = ("state_name", "division_name", "sanction_year", "type_of_scheme")
+ROLLUP_AGGREGATIONS = ("count", "sum", "avg")
+ROLLUP_CHECK_SECONDS = 60  # How often to look for a rollup table that was missing
+PLAN_CACHE_SIZE = 256
+
+ANALYTICS_QUERY_TYPE = "analytics"
+# The original hand-written visualization queries, expressed as plans (results are unchanged)
+LEGACY_QUERY_SPECS = {
+    "cost_by_year": {"dimension": "sanction_year", "measure": "estimated_cost", "aggregation": "sum", "skip_zero": True},
+    "scheme_count_by_type": {"dimension": "type_of_scheme", "aggregation": "count"},
+    "average_progress": {"measure": "physical_completion_progress", "aggregation": "avg", "positive_only": True, "result_key": "average_progress"},
+    "total_schemes": {"aggregation": "count", "result_key": "total_schemes"}
+}
+
+
+class PlanError(ValueError):
+    """Raised for a spec that asks for a column, aggregation or order outside the whitelist."""
+
+
+def make_spec(dimension=None, measure=None, aggregation="count", filters=None, positive_only=False,
+              top_n=None, order=None, skip_zero=False, result_key=None) -> Dict:
+    """A validated query spec.
+
+    filters maps dimension columns to values compared case-insensitively;
+    positive_only keeps rows where the measure is above zero; top_n keeps the
+    first groups in order ("desc"/"asc" by value, default by dimension).
+    """
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise PlanError(f"Cannot group by {dimension!r}")
+    if measure is not None and measure not in MEASURES:
+        raise PlanError(f"Cannot aggregate {measure!r}")
+    if aggregation not in AGGREGATIONS:
+        raise PlanError(f"Unknown aggregation {aggregation!r}")
+    if aggregation != "count" and measure is None:
+        raise PlanError(f"{aggregation} needs a measure")
+    if positive_only and measure is None:
+        raise PlanError("positive_only needs a measure")
+    filters = {column: str(value).lower() for column, value in (filters or {}).items()}
+    for column in filters:
+        if column not in DIMENSIONS:
+            raise PlanError(f"Cannot filter by {column!r}")
+    if top_n is not None:
+        if dimension is None:
+            raise PlanError("top_n needs a dimension")
+        top_n = max(1, min(int(top_n), MAX_TOP_N))
+    order = order or ("desc" if top_n else "dimension")
+    if order not in ORDERS:
+        raise PlanError(f"Unknown order {order!r}")
+
+    spec = {
+        "dimension": dimension,
+        "measure": measure,
+        "aggregation": aggregation,
+        "filters": filters,
+        "positive_only": bool(positive_only),
+        "top_n": top_n,
+        "order": order,
+        "skip_zero": bool(skip_zero),
+        "result_key": None
+    }
+    if dimension is None:
+        spec["result_key"] = result_key or describe_spec(spec)
+    return spec
+
+
+def legacy_spec(query_type: str, filters=None) -> Dict:
+    return make_spec(filters=filters, **LEGACY_QUERY_SPECS[query_type])
+
+
+def spec_from_analytics(analytics: Dict, filters=None) -> Dict:
+    """Spec for the "analytics" part of a parsed query (see NLUProcessor.extract_analytics)."""
+    measure = analytics.get("measure")
+    aggregation = analytics.get("aggregation") or ("count" if measure is None else "sum")
+    return make_spec(
+        dimension=analytics.get("dimension"),
+        measure=measure,
+        aggregation=aggregation,
+        filters=filters,
+        # Schemes that have not started would drag averages of progress down, as in average_progress
+        positive_only=measure == "physical_completion_progress" and aggregation == "avg",
+        top_n=analytics.get("top_n"),
+        order=analytics.get("order")
+    )
+
+
+def legacy_query_type(spec: Dict) -> Optional[str]:
+    """The original query type asking for the same numbers as a spec, so it keeps its dedicated chart."""
+    shape = ("dimension", "measure", "aggregation", "positive_only", "top_n", "order")
+    for query_type in LEGACY_QUERY_SPECS:
+        candidate = legacy_spec(query_type, spec["filters"])
+        if all(candidate[key] == spec[key] for key in shape):
+            return query_type
+    return None
+
+
+def describe_spec(spec: Dict) -> str:
+    """Chart title / answer label for a spec, e.g. "Total FHTCs Provided by Division (top 5)"."""
+    if spec["aggregation"] == "count":
+        label = AGGREGATIONS["count"]
+    else:
+        label = f"{AGGREGATIONS[spec['aggregation']]} {MEASURES[spec['measure']]}"
+    if spec["dimension"]:
+        label += f" by {DIMENSIONS[spec['dimension']]}"
+    if spec["top_n"]:
+        label += f" ({'top' if spec['order'] == 'desc' else 'bottom'} {spec['top_n']})"
+    return label
+
+
+def build_rollup_table(conn: sqlite3.Connection):
+    """(Re)builds the rollup table from schemes; run after every change to the schemes table."""
+    dimensions = ", ".join(ROLLUP_DIMENSIONS)
+    measure_columns = []
+    for measure in MEASURES:
+        measure_columns += [
+            f"SUM({measure}) AS sum_{measure}",
+            f"COUNT({measure}) AS count_{measure}",
+            f"SUM(CASE WHEN {measure} > 0 THEN {measure} END) AS positive_sum_{measure}",
+            f"SUM(CASE WHEN {measure} > 0 THEN 1 ELSE 0 END) AS positive_count_{measure}"
+        ]
+    conn.commit()  # The rollup must see the caller's changes to schemes
+    # One transaction, so the chatbot never sees the table missing or half built
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {ROLLUP_TABLE}")
+        conn.execute(
+            f"CREATE TABLE {ROLLUP_TABLE} AS SELECT {dimensions}, COUNT(*) AS scheme_count, "
+            f"{', '.join(measure_columns)} FROM schemes GROUP BY {dimensions}"
+        )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    rollup_rows = conn.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}").fetchone()[0]
+    print(f"Built {ROLLUP_TABLE} with {rollup_rows} rows")
+
+
+def shape_result(spec: Dict, rows) -> Dict:
+    """A spec's result from its (dimension value, value) rows, already in order.
+
+    {dimension value: value} for grouped specs, {result_key: value} otherwise.
+    Shared by every backend that executes specs so their results are identical.
+    """
+    if spec["dimension"] is None:
+        value = rows[0][1] if rows else None
+        if spec["aggregation"] == "count":
+            return {spec["result_key"]: int(value or 0)}
+        return {spec["result_key"]: float(value) if value else 0}
+
+    data = {}
+    for key, value in rows:
+        if not key or value is None or (spec["skip_zero"] and not value):
+            continue
+        data[str(key)] = value
+    return data
+
+
+def _sqlite_sort_key(value):
+    """Sort key matching SQLite's ORDER BY on a mixed column: numbers, then text."""
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+def order_rows(spec: Dict, rows: List[Tuple]) -> List[Tuple]:
+    """Sorts and limits (dimension value, value) rows as the planner's SQL would (ORDER BY / LIMIT).
+
+    For backends that aggregate outside SQLite.
+    """
+    if spec["order"] == "dimension":
+        rows = sorted(rows, key=lambda row: _sqlite_sort_key(row[0]))
+    else:
+        sign = -1 if spec["order"] == "desc" else 1
+        rows = sorted(rows, key=lambda row: (row[1] is None, sign * (row[1] or 0), _sqlite_sort_key(row[0])))
+    if spec["top_n"]:
+        rows = rows[:spec["top_n"]]
+    return rows
+
+
+class QueryPlanner:
+    """Turns specs into parameterized SQL over the whitelisted columns and runs them.
+
+    Compiled SQL is cached by the spec's shape (not its filter values or N), and
+    plans read the rollup table whenever it can answer them. With a result cache,
+    results are reused while the caller's data version stays the same.
+    """
+
+    def __init__(self, cache_size: int = PLAN_CACHE_SIZE, use_rollup: bool = True, result_cache=None):
+        self.cache_size = cache_size
+        self.use_rollup = use_rollup
+        self.result_cache = result_cache
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._rollup_available = None
+        self._rollup_checked_at = 0.0
+        self.counters = {
+            "plan_cache_hits": 0,
+            "plan_cache_misses": 0,
+            "rollup_queries": 0,
+            "base_table_queries": 0
+        }
+
+    def execute(self, conn: sqlite3.Connection, spec: Dict, data_version=None) -> Dict:
+        """Runs a spec: {dimension value: value} for grouped specs, {result_key: value} otherwise.
+
+        data_version identifies the contents of the database; results are only
+        cached when it is given.
+        """
+        use_rollup = self.use_rollup and self._can_use_rollup(spec) and self._has_rollup(conn)
+        try:
+            rows = self._run(conn, spec, use_rollup, data_version)
+        except sqlite3.OperationalError:
+            if not use_rollup:
+                raise
+            # The rollup table went away (e.g. a reload in progress); answer from schemes
+            self._rollup_available = False
+            rows = self._run(conn, spec, False, data_version)
+
+        return shape_result(spec, rows)
+
+    def _run(self, conn, spec, use_rollup, data_version=None):
+        sql = self._compile(spec, use_rollup)
+        params = list(spec["filters"][column] for column in sorted(spec["filters"]))
+        if spec["top_n"]:
+            params.append(spec["top_n"])
+
+        def run():
+            with self._lock:
+                self.counters["rollup_queries" if use_rollup else "base_table_queries"] += 1
+            return conn.execute(sql, params).fetchall()
+
+        if self.result_cache is None or data_version is None:
+            return run()
+        return self.result_cache.get_or_run(sql, params, data_version, run)
+
+    def _compile(self, spec, use_rollup) -> str:
+        key = (
+            spec["dimension"], spec["measure"], spec["aggregation"], tuple(sorted(spec["filters"])),
+            spec["positive_only"], bool(spec["top_n"]), spec["order"], use_rollup
+        )
+        with self._lock:
+            sql = self._plans.get(key)
+            if sql is not None:
+                self._plans.move_to_end(key)
+                self.counters["plan_cache_hits"] += 1
+                return sql
+            self.counters["plan_cache_misses"] += 1
+
+        sql = self._build_sql(spec, use_rollup)
+        with self._lock:
+            self._plans[key] = sql
+            if len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        return sql
+
+    @staticmethod
+    def _build_sql(spec, use_rollup) -> str:
+        dimension, measure, aggregation = spec["dimension"], spec["measure"], spec["aggregation"]
+        conditions = [f"LOWER({column}) = ?" for column in sorted(spec["filters"])]
+        if use_rollup:
+            table = ROLLUP_TABLE
+            prefix = "positive_" if spec["positive_only"] else ""
+            if aggregation == "count":
+                value = f"SUM({prefix}count_{measure})" if spec["positive_only"] else "SUM(scheme_count)"
+            elif aggregation == "sum":
+                value = f"SUM({prefix}sum_{measure})"
+            else:
+                value = f"SUM({prefix}sum_{measure}) * 1.0 / SUM({prefix}count_{measure})"
+        else:
+            table = "schemes"
+            if spec["positive_only"]:
+                conditions.append(f"{measure} > 0")
+            value = "COUNT(*)" if aggregation == "count" else f"{aggregation.upper()}({measure})"
+
+        if dimension:
+            conditions.insert(0, f"{dimension} IS NOT NULL AND {dimension} != ''")
+        sql = f"SELECT {dimension or 'NULL'} AS dimension, {value} AS value FROM {table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if dimension:
+            sql += f" GROUP BY {dimension}"
+            if use_rollup and spec["positive_only"]:
+                # Groups without a positive value have no rows in schemes once filtered by "> 0"
+                sql += f" HAVING SUM(positive_count_{measure}) > 0"
+            if spec["order"] == "dimension":
+                sql += " ORDER BY dimension"
+            else:
+                sql += f" ORDER BY value IS NULL, value {spec['order'].upper()}, dimension"
+            if spec["top_n"]:
+                sql += " LIMIT ?"
+        return sql
+
+    @staticmethod
+    def _can_use_rollup(spec) -> bool:
+        columns = set(spec["filters"])
+        if spec["dimension"]:
+            columns.add(spec["dimension"])
+        return spec["aggregation"] in ROLLUP_AGGREGATIONS and columns <= set(ROLLUP_DIMENSIONS)
+
+    def _has_rollup(self, conn) -> bool:
+        now = time.monotonic()
+        if self._rollup_available is None or (not self._rollup_available and now - self._rollup_checked_at > ROLLUP_CHECK_SECONDS):
+            self.refresh(conn)
+        return self._rollup_available
+
+    def refresh(self, conn: sqlite3.Connection):
+        """Looks up whether the database has a rollup table; call after swapping databases."""
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROLLUP_TABLE,)).fetchone()
+        self._rollup_available = row is not None
+        self._rollup_checked_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "plans_cached": len(self._plans),
+                "rollup_available": bool(self._rollup_available),
+                **self.counters,
+                "result_cache": self.result_cache.stats() if self.result_cache else None
+            }
+
+
+def filter_clause(filters: Dict[str, str]) -> Tuple[str, List]:
+    """WHERE clause and parameters for a planner filter dict, for queries built outside the planner."""
+    for column in filters:
+        if column not in DIMENSIONS:
+            raise PlanError(f"Cannot filter by {column!r}")
+    columns = sorted(filters)
+    return " AND ".join(f"LOWER({column}) = ?" for column in columns), [str(filters[column]).lower() for column in columns]
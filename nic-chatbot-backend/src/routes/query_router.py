@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+ROUTES = ("knowledge", "data")  # Label 0 and 1 of the classifier
+HASH_BUCKETS = 2048
+KNOWN_INTENTS = [
+    "count_schemes", "cost_analysis", "scheme_types", "progress_analysis",
+    "scheme_info", "visualization", "general_query"
+]
+QUESTION_WORDS = ("what", "who", "why", "when", "where", "which", "how", "explain", "tell", "describe")
+KNOWLEDGE_KEYWORDS = [
+    'what is', 'what are', 'who', 'why', 'explain', 'about', 'website',
+    'objective', 'guideline', 'eligib', 'benefit', 'launched'
+]
+DATA_INTENTS = [
+    'count_schemes', 'cost_analysis', 'scheme_types', 'progress_analysis', 'progress_trend',
+    'completed_in_year', 'recently_updated', 'fhtc_coverage', 'scheme_lookup'
+]
+# Intents only the data path can answer. They are not among the router's KNOWN_INTENTS (its
+# training data predates them), so they always route to data whatever the model says.
+DATA_ONLY_INTENTS = ['progress_trend', 'completed_in_year', 'recently_updated', 'fhtc_coverage', 'scheme_lookup']
+# Data-related keywords that suggest visualization
+VIZ_KEYWORDS = [
+    'visualize', 'show', 'chart', 'graph', 'plot', 'display',
+    'how many', 'count', 'total', 'number of', 'statistics',
+    'cost', 'expenditure', 'budget', 'spending', 'progress',
+    'completion', 'status', 'analysis', 'breakdown', 'distribution',
+    'comparison', 'trend', 'data', 'schemes', 'projects'
+]
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def visualization_signals(query_text, parsed_query):
+    """The (keywords, data intent, location) signals that suggest a data/visualization query."""
+    query_lower = query_text.lower()
+    has_viz_keywords = any(keyword in query_lower for keyword in VIZ_KEYWORDS)
+    has_data_intent = parsed_query['intent'] in DATA_INTENTS
+    has_location = bool(parsed_query['entities']['states'] or parsed_query['entities']['divisions'])
+    return has_viz_keywords, has_data_intent, has_location
+
+
+def heuristic_route(query_text, parsed_query) -> Tuple[str, float]:
+    """Keyword routing used when no trained model is available.
+
+    Routes to data on any visualization signal. Confidence weighs the data signals
+    against knowledge signals (scheme mentioned, descriptive question); 1.0 means
+    there is nothing for the data path to answer.
+    """
+    data_signals = sum(visualization_signals(query_text, parsed_query))
+    if not data_signals:
+        return "knowledge", 1.0
+
+    knowledge_signals = sum([
+        bool(parsed_query['entities'].get('schemes')),
+        any(keyword in query_text.lower() for keyword in KNOWLEDGE_KEYWORDS)
+    ])
+    # Smoothed share of the signals that agree with the route
+    return "data", round((data_signals + 1) / (data_signals + knowledge_signals + 2), 2)
+
+
+def extract_features(query_text, parsed_query) -> np.ndarray:
+    """Cheap feature vector: hashed word uni/bigrams plus the NLU intent and entity flags.
+
+    Uses only the parse_query output and string operations, no extra model passes.
+    """
+    features = np.zeros(HASH_BUCKETS + len(KNOWN_INTENTS) + 6, dtype=np.float32)
+    tokens = TOKEN_PATTERN.findall(query_text.lower())
+    # crc32 rather than hash(): Python's string hash is salted per process
+    for gram in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        features[zlib.crc32(gram.encode("utf-8")) % HASH_BUCKETS] += 1.0
+    if tokens:
+        features[:HASH_BUCKETS] /= np.sqrt(len(tokens))
+
+    offset = HASH_BUCKETS
+    if parsed_query['intent'] in KNOWN_INTENTS:
+        features[offset + KNOWN_INTENTS.index(parsed_query['intent'])] = 1.0
+    offset += len(KNOWN_INTENTS)
+    entities = parsed_query['entities']
+    features[offset:offset + 6] = [
+        bool(entities.get('states')),
+        bool(entities.get('divisions')),
+        bool(entities.get('schemes')),
+        bool(tokens) and tokens[0] in QUESTION_WORDS,
+        any(token.isdigit() for token in tokens),
+        min(len(tokens), 20) / 20
+    ]
+    return features
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class QueryRouter:
+    """Logistic regression over extract_features deciding between the knowledge and data paths."""
+
+    def __init__(self, weights: np.ndarray, bias: float, trained_on: int = 0):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.trained_on = trained_on
+        self._latencies_ms = deque(maxlen=500)
+        self._lock = threading.Lock()
+
+    def route(self, query_text, parsed_query) -> Tuple[str, float]:
+        """(route, confidence), where confidence is the predicted probability of that route."""
+        start = time.perf_counter()
+        p_data = float(_sigmoid(extract_features(query_text, parsed_query) @ self.weights + self.bias))
+        with self._lock:
+            self._latencies_ms.append((time.perf_counter() - start) * 1000)
+        if p_data >= 0.5:
+            return "data", round(p_data, 2)
+        return "knowledge", round(1 - p_data, 2)
+
+    @classmethod
+    def train(cls, examples: List[Tuple[str, Dict, str]], epochs: int = 300, learning_rate: float = 0.5, l2: float = 1e-3):
+        """Fits on (query_text, parsed_query, route) examples with class-balanced full-batch gradient descent."""
+        X = np.stack([extract_features(query, parsed) for query, parsed, _ in examples])
+        y = np.array([ROUTES.index(route) for _, _, route in examples], dtype=np.float32)
+        # Balance the classes so a skewed query log does not bias the router towards one path
+        positives = max(y.sum(), 1.0)
+        negatives = max(len(y) - y.sum(), 1.0)
+        sample_weights = np.where(y == 1, len(y) / (2 * positives), len(y) / (2 * negatives)).astype(np.float32)
+
+        weights = np.zeros(X.shape[1], dtype=np.float32)
+        bias = 0.0
+        for _ in range(epochs):
+            error = (_sigmoid(X @ weights + bias) - y) * sample_weights
+            weights -= learning_rate * (X.T @ error / len(y) + l2 * weights)
+            bias -= learning_rate * float(error.mean())
+        return cls(weights, bias, trained_on=len(examples))
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "hash_buckets": HASH_BUCKETS,
+                "intents": KNOWN_INTENTS,
+                "trained_on": self.trained_on,
+                "trained_at": datetime.now().isoformat(),
+                "bias": self.bias,
+                "weights": [round(float(w), 6) for w in self.weights]
+            }, file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "QueryRouter":
+        with open(path, "r", encoding="utf-8") as file:
+            model = json.load(file)
+        if model["hash_buckets"] != HASH_BUCKETS or model["intents"] != KNOWN_INTENTS:
+            raise ValueError(f"Router model at {path} was trained with different features, retrain it")
+        return cls(np.array(model["weights"], dtype=np.float32), model["bias"], model.get("trained_on", 0))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+        return {
+            "trained_on": self.trained_on,
+            "routed": len(latencies),
+            "latency_p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+            "latency_p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else 0.0
+        }
+
+
+class QueryLog:
+    """Appends routed queries to a JSONL file so they can be labelled and used to retrain the router.
+
+    Records carry the router's prediction under "predicted_route"; training only
+    uses records where a reviewer has added the correct "route".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, query_text, parsed_query, route, confidence):
+        record = {
+            "query": query_text,
+            "parsed_query": parsed_query,
+            "predicted_route": route,
+            "confidence": confidence,
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"WARNING: Could not write query log: {e}")
+
+
+def load_labelled_examples(paths: List[str], nlu_processor=None) -> List[Tuple[str, Dict, str]]:
+    """(query, parsed_query, route) from labelled JSONL files; records without a parse are parsed with the NLU."""
+    examples = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("route") not in ROUTES:
+                    continue
+                parsed_query = record.get("parsed_query")
+                if parsed_query is None:
+                    if nlu_processor is None:
+                        raise ValueError(f"{path} has records without parsed_query and no NLU processor was given")
+                    parsed_query = nlu_processor.parse_query(record["query"])
+                examples.append((record["query"], parsed_query, record["route"]))
+    return examples
+
+
+def load_router(path: Optional[str]) -> Optional[QueryRouter]:
+    """The trained router at path, or None (heuristic routing) if there is none or it is unusable."""
+    if not path or not os.path.exists(path):
+        print("DEBUG: No trained query router found, using heuristic routing.")
+        return None
+    try:
+        router = QueryRouter.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"WARNING: Could not load query router from {path}: {e}")
+        return None
+    print(f"DEBUG: Query router loaded (trained on {router.trained_on} queries)")
+    return router
+
+
+if __name__ == "__main__":
+    from src.routes.nlu_processor_updated import NLUProcessor
+
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    parser = argparse.ArgumentParser(description="Train the query router on labelled queries")
+    parser.add_argument("--data", nargs="+", required=True, help="Labelled JSONL files (seed set and/or labelled query logs)")
+    parser.add_argument("--output", required=True, help="Where to write the router model (JSON)")
+    parser.add_argument("--epochs", type=int, default=300)
+    args = parser.parse_args()
+
+    nlu = NLUProcessor(os.path.join(base_dir, "upload", "List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"))
+    training_examples = load_labelled_examples(args.data, nlu)
+    router = QueryRouter.train(training_examples, epochs=args.epochs)
+    router.save(args.output)
+    print(f"Trained query router on {len(training_examples)} queries, saved to {args.output}")
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from sentence_transformers import CrossEncoder
+
+
+class CrossEncoderReranker:
+    """Reranks retrieved chunks with a compact cross-encoder so only the best few reach the LLM.
+
+    Scores are cached per (query, chunk id), so repeated questions skip the model entirely.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 16, cache_size: int = 4096):
+        """Load the cross-encoder on CPU."""
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, max_length=512, device="cpu")
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @staticmethod
+    def chunk_id(doc) -> str:
+        """Stable id of a chunk: the ingestion chunk_id, or a hash of its text for older indexes."""
+        chunk_id = doc.metadata.get("chunk_id")
+        if chunk_id:
+            return str(chunk_id)
+        return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+    def score(self, query: str, docs: List) -> List[float]:
+        """Relevance score of each document for the query, computed in one batched pass for cache misses."""
+        query = query.strip()
+        keys = [(query, self.chunk_id(doc)) for doc in docs]
+        scores = [None] * len(docs)
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+            missing = [i for i, score in enumerate(scores) if score is None]
+            self.cache_hits += len(docs) - len(missing)
+            self.cache_misses += len(missing)
+
+        if missing:
+            predicted = self.model.predict(
+                [(query, docs[i].page_content) for i in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self._cache[keys[i]] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, docs: List, top_n: int = 3) -> List:
+        """The top_n documents by cross-encoder score, best first, with the score added to their metadata."""
+        if not docs:
+            return []
+        scores = self.score(query, docs)
+        ranked = sorted(zip(docs, scores), key=lambda pair: pair[1], reverse=True)[:top_n]
+        for doc, score in ranked:
+            doc.metadata["rerank_score"] = round(score, 4)
+        return [doc for doc, _ in ranked]
+
+    def clear_cache(self):
+        """Drops every cached score, e.g. when the indexed chunks are replaced."""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses, entries = self.cache_hits, self.cache_misses, len(self._cache)
+        lookups = hits + misses
+        return {
+            "model": self.model_name,
+            "cache_entries": entries,
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "cache_hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+        }
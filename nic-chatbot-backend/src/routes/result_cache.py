@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence
+
+RESULT_CACHE_SIZE = 512  # Cached query results; the data changes about once a day, the questions repeat
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace so formatting differences do not split cache entries."""
+    return " ".join(sql.split())
+
+
+class QueryResultCache:
+    """LRU cache of SQL results keyed by (normalized SQL, params, data version).
+
+    A new data version empties the whole cache: entries of the old version could
+    never be hit again and would only push out useful ones. Each entry remembers
+    how long its query took, so hits report the query time they saved.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.data_version = None
+        self._entries = OrderedDict()  # key -> (rows, query seconds)
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self.saved_seconds = 0.0
+
+    def get_or_run(self, sql: str, params: Sequence, data_version, run: Callable[[], List]) -> List:
+        """Rows for the query from the cache, or from run() (stored for next time)."""
+        key = (normalize_sql(sql), tuple(params), data_version)
+        with self._lock:
+            if data_version != self.data_version:
+                if self._entries:
+                    self.counters["invalidations"] += 1
+                    print(f"DEBUG: Data version changed to {data_version}, dropped {len(self._entries)} cached results")
+                self._entries.clear()
+                self.data_version = data_version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                self.saved_seconds += entry[1]
+                return list(entry[0])
+            self.counters["misses"] += 1
+
+        # Concurrent misses on the same key both run the query; the second result replaces the first
+        start = time.perf_counter()
+        rows = run()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if data_version == self.data_version:
+                self._entries[key] = (list(rows), elapsed)
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters["evictions"] += 1
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.counters["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "data_version": self.data_version,
+                "hit_ratio": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+                "saved_query_ms": round(self.saved_seconds * 1000, 1),
+                **self.counters
+            }
@@ -0,0 +1,99 @@
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.routes.query_planner import filter_clause
+
+# Date columns of the schemes table. The source CSV has day-first text dates; the loaders store
+# them as ISO 'YYYY-MM-DD' text (NULL when missing or unreadable), which sorts and compares
+# correctly, works with SQLite's date functions, and can be range-scanned through an index.
+DATE_COLUMNS = (
+    "slssc_meeting_date", "work_order_date", "physical_completion_date",
+    "tentative_completion_date", "updated_on"
+)
+INDEXED_DATE_COLUMNS = ("physical_completion_date", "updated_on")  # The ones questions filter by
+# Tried in order; a value takes the first format that reads it
+DATE_FORMATS = (
+    "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y %H:%M:%S", "%d/%m/%Y %H:%M",
+    "%d-%m-%Y %H:%M", "%d.%m.%Y", "%d-%b-%Y", "%d %b %Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S"
+)
+ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """ISO date strings for a column of text dates, None where there is no readable date.
+
+    Each format is applied to the whole column at once, only to the values no
+    earlier format could read.
+    """
+    text = values.astype(str).str.strip().where(values.notna() & (values.astype(str).str.strip() != ""))
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for date_format in DATE_FORMATS:
+        pending = parsed.isna() & text.notna()
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(text[pending], format=date_format, errors="coerce")
+    unreadable = int((parsed.isna() & text.notna()).sum())
+    if unreadable:
+        print(f"Warning: {unreadable} unreadable dates in {values.name} stored as NULL")
+    return parsed.dt.strftime("%Y-%m-%d").astype(object).where(parsed.notna(), None)
+
+
+def parse_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """The loaders' DataFrame with every date column converted to ISO dates."""
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_dates(df[column])
+    return df
+
+
+def create_date_indexes(conn: sqlite3.Connection):
+    for column in INDEXED_DATE_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_schemes_{column} ON schemes ({column})")
+    conn.commit()
+
+
+def normalize_stored_dates(conn: sqlite3.Connection) -> int:
+    """Converts dates stored as text by older loaders to ISO in place; returns the number of rows changed."""
+    not_iso = " OR ".join(f"({column} IS NOT NULL AND {column} NOT GLOB '{ISO_DATE_GLOB}')" for column in DATE_COLUMNS)
+    df = pd.read_sql_query(f"SELECT rowid, {', '.join(DATE_COLUMNS)} FROM schemes WHERE {not_iso}", conn, dtype=object)
+    if df.empty:
+        return 0
+    df = parse_date_columns(df)
+    conn.executemany(
+        f"UPDATE schemes SET {', '.join(f'{column} = ?' for column in DATE_COLUMNS)} WHERE rowid = ?",
+        [(*row[1:], row[0]) for row in df.itertuples(index=False)]
+    )
+    conn.commit()
+    print(f"Converted dates of {len(df)} schemes to ISO format")
+    return len(df)
+
+
+def year_range(year: int) -> Tuple[str, str]:
+    return f"{year:04d}-01-01", f"{year:04d}-12-31"
+
+
+def last_days_range(days: int, today: Optional[date] = None) -> Tuple[str, str]:
+    """The last `days` days up to and including today, as ISO dates."""
+    today = today or date.today()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def count_by_period(conn: sqlite3.Connection, column: str, start: str, end: str,
+                    filters: Optional[Dict[str, str]] = None, by_month: bool = True) -> List[Tuple[str, int]]:
+    """[(month 'YYYY-MM' or day, schemes)] with the date column in [start, end], oldest first.
+
+    The range condition is answered from the column's index; filters are the
+    query planner's {column: lowercase value}.
+    """
+    if column not in INDEXED_DATE_COLUMNS:
+        raise ValueError(f"Cannot filter by date column {column!r}")
+    where_clause, params = filter_clause(filters or {})
+    period_length = 7 if by_month else 10
+    sql = f"SELECT substr({column}, 1, {period_length}) AS period, COUNT(*) FROM schemes WHERE {column} BETWEEN ? AND ?"
+    if where_clause:
+        sql += f" AND {where_clause}"
+    sql += " GROUP BY period ORDER BY period"
+    return [(period, count) for period, count in conn.execute(sql, [start, end] + params).fetchall()]
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.routes.query_planner import filter_clause
+
+# Scheme rows for /api/schemes, read in scheme_id order with keyset pagination: each page starts
+# after the last scheme_id of the previous one, so page N costs the same as page 1 (no OFFSET),
+# and a full export holds one page in memory at a time.
+LIST_FILTERS = (
+    "state_name", "division_name", "sanction_year", "work_status", "physical_status",
+    "type_of_scheme", "scheme_type", "water_scheme_type"
+)
+LIST_PAGE_ROWS = 1000  # Rows per keyset query while streaming
+MAX_PAGE_LIMIT = 10000  # Largest page a client may ask for with ?limit=
+LIST_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def scheme_columns(conn: sqlite3.Connection) -> List[str]:
+    return [row[1] for row in conn.execute("PRAGMA table_info(schemes)").fetchall()]
+
+
+def _page_sql(columns: List[str], filters: Dict[str, str], after: Optional[str]) -> Tuple[str, List]:
+    where_clause, params = filter_clause(filters)
+    conditions = [where_clause] if where_clause else []
+    if after is not None:
+        conditions.insert(0, "scheme_id > ?")
+        params.insert(0, after)
+    sql = f"SELECT {', '.join(columns)} FROM schemes"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql + " ORDER BY scheme_id LIMIT ?", params
+
+
+def fetch_page(conn: sqlite3.Connection, columns: List[str], filters: Dict[str, str], after: Optional[str] = None,
+               limit: int = LIST_PAGE_ROWS) -> Tuple[List[Tuple], Optional[str]]:
+    """(rows, next_after): up to `limit` rows after the scheme_id `after`, and the cursor of the
+    next page (None on the last page). filters are the planner's {column: lowercase value}."""
+    sql, params = _page_sql(columns, filters, after)
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][columns.index("scheme_id")]
+    return rows, None
+
+
+def iter_pages(conn: sqlite3.Connection, columns: List[str], filters: Dict[str, str], after: Optional[str] = None,
+               page_rows: int = LIST_PAGE_ROWS) -> Iterator[List[Tuple]]:
+    """Every matching row after `after`, one keyset page at a time."""
+    while True:
+        rows, after = fetch_page(conn, columns, filters, after, page_rows)
+        if rows:
+            yield rows
+        if after is None:
+            return
+
+
+def encode_pages(columns: List[str], pages: Iterable[List[Tuple]], list_format: str) -> Iterator[str]:
+    """Response body chunks, one per page: NDJSON objects, or CSV with a header row."""
+    if list_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in pages:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # Header only: nothing matched
+        return
+    for rows in pages:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
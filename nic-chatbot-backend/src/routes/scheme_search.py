@@ -0,0 +1,100 @@
+import re
+import sqlite3
+from typing import Dict, List
+
+# Full-text index over the columns people name schemes by. It is an external-content FTS5 table:
+# the text stays in schemes, and triggers keep the index in step with every insert, update and
+# delete the loaders make. Prefix indexes ('2 3') keep prefix matches on short terms fast.
+FTS_TABLE = "schemes_fts"
+FTS_COLUMNS = ("scheme_id", "scheme_name", "division_name", "state_name")
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)  # bm25 weight per column: an ID or name match beats a location match
+SEARCH_RESULT_LIMIT = 5
+MAX_SEARCH_TERMS = 8
+# Key fields returned for each match
+SEARCH_FIELDS = (
+    "scheme_id", "scheme_name", "state_name", "division_name", "work_status", "physical_status",
+    "physical_completion_progress", "estimated_cost", "total_expenditure", "fhtcs_planned",
+    "fhtcs_provided", "updated_on"
+)
+# Words of the question itself rather than of the scheme asked about
+STOP_WORDS = {
+    "a", "an", "the", "of", "for", "about", "on", "in", "is", "are", "its", "what", "whats", "show", "me",
+    "tell", "give", "find", "search", "look", "lookup", "up", "status", "details", "detail", "info",
+    "information", "progress", "scheme", "schemes", "id", "no", "number", "named", "called", "please"
+}
+
+
+def create_search_index(conn: sqlite3.Connection):
+    """Creates the FTS index and its triggers if missing, indexing the rows already in schemes."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)).fetchone():
+        return
+    columns = ", ".join(FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in FTS_COLUMNS)
+    conn.executescript(f"""
+        BEGIN;
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            {columns}, content='schemes', content_rowid='rowid', prefix='2 3'
+        );
+        CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON schemes BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END;
+        CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON schemes BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+        END;
+        -- Daily updates rewrite every column; only reindex when the indexed text changed
+        CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON schemes WHEN {changed} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END;
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild');
+        COMMIT;
+    """)
+    print(f"Built {FTS_TABLE} over {conn.execute('SELECT COUNT(*) FROM schemes').fetchone()[0]} schemes")
+
+
+def drop_search_index(conn: sqlite3.Connection):
+    """Removes the index and its triggers, before a full reload of schemes.
+
+    Maintaining the index row by row costs several times a rebuild once the rows
+    are in, so full loads drop it and call create_search_index afterwards.
+    """
+    conn.executescript(f"""
+        BEGIN;
+        DROP TRIGGER IF EXISTS {FTS_TABLE}_insert;
+        DROP TRIGGER IF EXISTS {FTS_TABLE}_delete;
+        DROP TRIGGER IF EXISTS {FTS_TABLE}_update;
+        DROP TABLE IF EXISTS {FTS_TABLE};
+        COMMIT;
+    """)
+
+
+def search_terms(text: str) -> List[str]:
+    """The words of a question that can name a scheme, lowercase and without repeats."""
+    terms = []
+    for token in re.findall(r"\w+", text.lower()):
+        if token not in STOP_WORDS and token not in terms:
+            terms.append(token)
+    return terms[:MAX_SEARCH_TERMS]
+
+
+def search_schemes(conn: sqlite3.Connection, text: str, limit: int = SEARCH_RESULT_LIMIT) -> List[Dict]:
+    """Best matching schemes for free text, best first, as dicts of SEARCH_FIELDS.
+
+    Every term is matched as a prefix ("ramp" finds "Rampur"). Schemes matching
+    all terms are ranked by bm25; when none does, schemes matching any term are.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    fields = ", ".join(f"s.{field}" for field in SEARCH_FIELDS)
+    sql = (
+        f"SELECT {fields} FROM {FTS_TABLE} JOIN schemes s ON s.rowid = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH ? ORDER BY bm25({FTS_TABLE}, {', '.join(str(weight) for weight in FTS_WEIGHTS)}) LIMIT ?"
+    )
+    prefixes = [f'"{term}"*' for term in terms]
+    rows = conn.execute(sql, (" AND ".join(prefixes), limit)).fetchall()
+    if not rows and len(prefixes) > 1:
+        rows = conn.execute(sql, (" OR ".join(prefixes), limit)).fetchall()
+    return [dict(zip(SEARCH_FIELDS, row)) for row in rows]
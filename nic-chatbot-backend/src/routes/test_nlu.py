@@ -136,6 +136,227 @@ def test_intent_classification():
         actual_intent = parsed_query["intent"]
         status = "✓" if actual_intent == expected_intent else "✗"
         print(f"{status} \'{query}\' -> {actual_intent} (expected: {expected_intent})")
+def test_scheme_entities():
+    """Test scheme entity extraction used to route knowledge base retrieval."""
+    print("\n=== Testing Scheme Entities ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("What is the JJM website?", ["jal jeevan mission"]),
+        ("When was Swachh Bharat Mission launched?", ["swachh bharat mission"]),
+        ("What does DDWS do?", ["department of drinking water and sanitation"]),
+        ("Compare SBM and Jal Jeevan Mission", ["swachh bharat mission", "jal jeevan mission"]),
+        ("How many schemes in Haryana?", [])
+    ]
+    for query, expected_schemes in test_queries:
+        schemes = nlu.extract_entities(query)["schemes"]
+        status = "✓" if sorted(schemes) == sorted(expected_schemes) else "✗"
+        print(f"{status} \'{query}\' -> {schemes} (expected: {expected_schemes})")
+
+def test_batch_parsing():
+    """Test that batch parsing with nlp.pipe matches parsing queries one by one."""
+    print("\n=== Testing Batch Parsing ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    queries = [
+        "How many schemes are there in Madhya Pradesh?",
+        "What is the JJM website?",
+        "Show me cost by year for Bhopal division",
+        "",
+        "Total schemes in Haryana state"
+    ]
+    batch = nlu.parse_queries(queries)
+    for query, parsed in zip(queries, batch):
+        status = "✓" if parsed == nlu.parse_query(query) else "✗"
+        print(f"{status} '{query}' -> {parsed['intent']}")
+
+def test_analytics_extraction():
+    """Test extraction of group-by analytics (dimension, measure, aggregation, top-N) for the query planner."""
+    print("\n=== Testing Analytics Extraction ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("Top 5 divisions by expenditure in Haryana", ("division_name", "total_expenditure", "sum", 5)),
+        ("How many schemes by work status", ("work_status", None, "count", None)),
+        ("Which state has the highest number of FHTC connections?", ("state_name", "fhtcs_provided", "sum", 1)),
+        ("Average progress by division", ("division_name", "physical_completion_progress", "avg", None)),
+        ("State-wise planned connections", ("state_name", "fhtcs_planned", "sum", None)),
+        ("Total expenditure in Madhya Pradesh", (None, "total_expenditure", "sum", None)),
+        ("How many schemes are there?", None),
+        ("What is FHTC?", None)
+    ]
+    for query, expected in test_queries:
+        analytics = nlu.parse_query(query)["analytics"]
+        actual = None
+        if analytics:
+            actual = (analytics["dimension"], analytics["measure"], analytics["aggregation"], analytics["top_n"])
+        status = "✓" if actual == expected else "✗"
+        print(f"{status} '{query}' -> {actual} (expected: {expected})")
+
+def test_progress_trend_queries():
+    """Test the progress_trend intent and the look-back period extracted from the query."""
+    print("\n=== Testing Progress Trend Queries ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("How did progress change since last month?", "progress_trend", 30),
+        ("Progress trend in Haryana over the past 2 weeks", "progress_trend", 14),
+        ("Has physical progress improved in the last 3 months?", "progress_trend", 90),
+        ("What is the average progress?", "progress_analysis", None),
+        ("How many schemes were there last year?", "count_schemes", 365)
+    ]
+    for query, expected_intent, expected_days in test_queries:
+        result = nlu.parse_query(query)
+        actual = (result["intent"], result["period_days"])
+        status = "✓" if actual == (expected_intent, expected_days) else "✗"
+        print(f"{status} '{query}' -> {actual} (expected: {(expected_intent, expected_days)})")
+
+def test_date_range_queries():
+    """Test the date range intents and the year/period they filter by."""
+    print("\n=== Testing Date Range Queries ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("How many schemes were completed in 2024?", ("completed_in_year", 2024, None)),
+        ("Schemes completed in 2023 in Haryana", ("completed_in_year", 2023, None)),
+        ("Which schemes were updated in the last 30 days?", ("recently_updated", None, 30)),
+        ("Show recently updated schemes", ("recently_updated", None, None)),
+        ("How many schemes are there?", ("count_schemes", None, None))
+    ]
+    for query, expected in test_queries:
+        result = nlu.parse_query(query)
+        actual = (result["intent"], result["year"], result["period_days"])
+        status = "✓" if actual == expected else "✗"
+        print(f"{status} '{query}' -> {actual} (expected: {expected})")
+
+def test_fhtc_coverage_queries():
+    """Test that coverage questions get their own intent, and measure totals stay analytics."""
+    print("\n=== Testing FHTC Coverage Queries ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("What is the FHTC coverage in Haryana?", "fhtc_coverage"),
+        ("Which divisions have the lowest tap connection coverage?", "fhtc_coverage"),
+        ("Show tap connections provided vs planned by state", "fhtc_coverage"),
+        ("FHTC percentage by division", "fhtc_coverage"),
+        ("Total FHTCs provided by state", "general_query"),
+        ("How many schemes are there?", "count_schemes")
+    ]
+    for query, expected_intent in test_queries:
+        result = nlu.parse_query(query)
+        status = "✓" if result["intent"] == expected_intent else "✗"
+        print(f"{status} '{query}' -> {result['intent']} (expected: {expected_intent})")
+
+def test_scheme_lookup_queries():
+    """Test that questions about one scheme by name or ID get the scheme_lookup intent."""
+    print("\n=== Testing Scheme Lookup Queries ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("What is the status of Rampur MVS scheme?", "scheme_lookup"),
+        ("Show details for scheme id 4321", "scheme_lookup"),
+        ("Progress of the Kheri Kalan scheme", "scheme_lookup"),
+        ("What is the status of schemes in Haryana?", "progress_analysis"),
+        ("Tell me about water schemes", "general_query")
+    ]
+    for query, expected_intent in test_queries:
+        result = nlu.parse_query(query)
+        status = "✓" if result["intent"] == expected_intent else "✗"
+        print(f"{status} '{query}' -> {result['intent']} (expected: {expected_intent})")
+
+def test_program_named_queries():
+    """Test that data questions naming JJM/SBM keep their data intent, and other questions about them are scheme_info."""
+    print("\n=== Testing Program-Named Queries ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("FHTC coverage under JJM in Haryana", "fhtc_coverage"),
+        ("How did progress change under Jal Jeevan Mission in the last month?", "progress_trend"),
+        ("How many JJM schemes were completed in 2024?", "completed_in_year"),
+        ("Which JJM schemes were updated in the last 30 days?", "recently_updated"),
+        ("What is the status of Rampur MVS scheme under JJM?", "scheme_lookup"),
+        ("What is the status of the JJM scheme?", "scheme_info"),
+        ("What is Jal Jeevan Mission?", "scheme_info")
+    ]
+    for query, expected_intent in test_queries:
+        result = nlu.parse_query(query)
+        status = "✓" if result["intent"] == expected_intent and result["entities"]["schemes"] else "✗"
+        print(f"{status} '{query}' -> {result['intent']} (expected: {expected_intent})")
+
+def test_fuzzy_location_matching():
+    """Test that misspelled states/divisions are matched, with their confidence in parsed_query."""
+    print("\n=== Testing Fuzzy Location Matching ===")
+    
+    csv_path = "/home/ubuntu/upload/List_of_Schemes_Format_PM_10_B_2025_04_23_09_52.csv"
+    nlu = NLUProcessor(csv_path)
+    
+    test_queries = [
+        ("How many schemes in Visakhapatnam?", ("division", "visakhapatanm", "fuzzy")),
+        ("Cost by year for Mandsaur division", ("division", "mandsour", "fuzzy")),
+        ("Show progress in Haryna", ("state", "haryana", "fuzzy")),
+        ("Count schemes in Gwalior", ("division", "gwalior", "exact")),
+        ("How many schemes are there?", None),
+        # Ordinary words close to a division name are not places
+        ("What is the benefit of using raised platforms for a blind person?", None),
+        ("Are toilets built for blind people?", None),
+        ("What is the price of sugar?", None)
+    ]
+    for query, expected in test_queries:
+        result = nlu.parse_query(query)
+        match = result["location_match"]
+        actual = (match["type"], match["name"], match["method"]) if match else None
+        has_location = bool(result["entities"]["states"] or result["entities"]["divisions"])
+        status = "✓" if actual == expected and has_location == (expected is not None) else "✗"
+        confidence = f", confidence {match['confidence']}" if match else ""
+        print(f"{status} '{query}' -> {actual}{confidence} (expected: {expected})")
+
+def test_qa_pair_extraction():
+    """Test that every Q&A format in the FAQ documents is split into separate, bounded pairs."""
+    print("\n=== Testing Q&A Pair Extraction ===")
+    
+    from data_loading_script import MAX_QA_ANSWER_CHARS, parse_qa_pairs
+    
+    sample = (
+        "JJM Q1: What is JJM? A1: Jal Jeevan Mission provides tap water. "
+        "Q2: When was it launched? A: In 2019. "
+        "—-- —-- —-- Q: Who is the deputy secretary for JJM III? A: Shri Arun Kumar Kembhavi. "
+        "—-- —-- Q: What does VWSC do? Q: What are the duties of a VWSC? 1. Prepare village plans. 2. Mobilize the community. "
+        "FAQs for Residents 1. What does pH mean? Answer: How acidic the water is. "
+        "2. What about Boron? Answer: Boron is safe below 2.4 mg per liter. "
+        "Q: What is in this long answer? A: " + "word " * MAX_QA_ANSWER_CHARS
+    )
+    expected = [
+        ("What is JJM?", "Jal Jeevan Mission provides tap water."),
+        ("When was it launched?", "In 2019."),
+        ("Who is the deputy secretary for JJM III?", "Shri Arun Kumar Kembhavi."),
+        ("What does VWSC do?", "1. Prepare village plans. 2. Mobilize the community. FAQs for Residents"),
+        ("What are the duties of a VWSC?", "1. Prepare village plans. 2. Mobilize the community. FAQs for Residents"),
+        ("What does pH mean?", "How acidic the water is."),
+        ("What about Boron?", "Boron is safe below 2.4 mg per liter."),
+    ]
+    actual = [(question, answer) for _, question, answer in parse_qa_pairs(sample)]
+    for pair in expected:
+        status = "✓" if pair in actual else "✗"
+        print(f"{status} {pair}")
+    status = "✓" if len(actual) == len(expected) else "✗"
+    print(f"{status} {len(actual)} pairs (expected: {len(expected)}, the over-long answer skipped)")
+
 def test_edge_cases():
     """Test edge cases and error handling."""
     print("\n=== Testing Edge Cases ===")
@@ -171,6 +392,16 @@ if __name__ == "__main__":
     test_nlu_entity_extraction()
     test_database_queries()
     test_intent_classification()
+    test_scheme_entities()
+    test_batch_parsing()
+    test_analytics_extraction()
+    test_progress_trend_queries()
+    test_date_range_queries()
+    test_fhtc_coverage_queries()
+    test_scheme_lookup_queries()
+    test_program_named_queries()
+    test_fuzzy_location_matching()
+    test_qa_pair_extraction()
     test_edge_cases()
     
     print("\n=== Test Summary ===")
@@ -0,0 +1,308 @@
+import copy
+import json
+import os
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+EMBEDDINGS_FILE = "embeddings.npy"
+FULL_PRECISION_FILE = "embeddings_full.npy"  # float32 copy kept next to compressed indexes for rescoring
+SCALES_FILE = "scales.npy"  # Per-vector dequantization scales of int8 indexes
+METADATA_FILE = "metadata.json"
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# Rows scored per matrix-vector product; bounds the temporary float32 copy made for float16 stores
+SEARCH_BLOCK_ROWS = 65536
+
+
+class ReadOnlyVectorStoreError(NotImplementedError):
+    """Raised on attempts to add to a MemmapVectorStore; indexes are rebuilt, never appended to."""
+
+
+class MemmapVectorStore(VectorStore):
+    """Exact nearest-neighbour vector store backed by a memory-mapped NumPy matrix.
+
+    Embeddings are L2-normalized when the index is built, so cosine similarity is a
+    plain dot product and a search is one pass over the matrix. Texts and metadata
+    live in a JSON sidecar file next to the matrix. Intended for small corpora
+    (tens of thousands of chunks) where exact search beats an ANN index on startup
+    time, memory and per-query overhead.
+
+    The matrix can be stored compressed as float16, or as int8 with one scale per
+    vector. Compressed indexes keep a float32 copy on disk: the scan runs over the
+    compressed matrix and only the top k * rescore_factor candidates are read back
+    in full precision and rescored, so the float32 pages are rarely touched.
+
+    When built with a partition_key, rows are grouped by that metadata value and
+    partition(name) returns a view that searches only that contiguous slice.
+
+    The store is read-only once built: add_texts and add_documents raise
+    ReadOnlyVectorStoreError, and new chunks mean rebuilding with from_texts.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings, rescore_factor: int = 4):
+        """Open an index previously written by MemmapVectorStore.from_texts."""
+        self.persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self.rescore_factor = rescore_factor
+
+        with open(os.path.join(persist_directory, METADATA_FILE), 'r', encoding='utf-8') as file:
+            sidecar = json.load(file)
+        self._texts = sidecar['texts']
+        self._metadatas = sidecar['metadatas']
+        self.dtype = sidecar['dtype']
+        self._partitions = sidecar.get('partitions', {})
+
+        # Pages are only faulted in when searched, and are shared between processes
+        self._matrix = np.load(os.path.join(persist_directory, EMBEDDINGS_FILE), mmap_mode='r')
+        if self._matrix.shape[0] != len(self._texts):
+            raise ValueError(
+                f"Corrupt index at {persist_directory}: {self._matrix.shape[0]} vectors "
+                f"but {len(self._texts)} texts"
+            )
+
+        self._scales = None
+        if self.dtype == "int8":
+            self._scales = np.load(os.path.join(persist_directory, SCALES_FILE))
+
+        self._full = None
+        full_path = os.path.join(persist_directory, FULL_PRECISION_FILE)
+        if self.dtype != "float32" and os.path.exists(full_path):
+            self._full = np.load(full_path, mmap_mode='r')
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def partition_names(self) -> List[str]:
+        return list(self._partitions)
+
+    def partition(self, name: str) -> "MemmapVectorStore":
+        """A view of the index restricted to one partition; shares the memory map, copies nothing."""
+        start, end = self._partitions[name]
+        view = copy.copy(self)
+        view._matrix = self._matrix[start:end]
+        view._texts = self._texts[start:end]
+        view._metadatas = self._metadatas[start:end]
+        view._scales = self._scales[start:end] if self._scales is not None else None
+        view._full = self._full[start:end] if self._full is not None else None
+        view._partitions = {}
+        return view
+
+    def memory_footprint(self) -> dict:
+        """Bytes scanned per query by this index compared with an uncompressed float32 index."""
+        scanned = self._matrix.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+        float32_bytes = self._matrix.shape[0] * self._matrix.shape[1] * 4
+        return {
+            'dtype': self.dtype,
+            'vectors': int(self._matrix.shape[0]),
+            'dimension': int(self._matrix.shape[1]),
+            'index_bytes': int(scanned),
+            'float32_bytes': int(float32_bytes),
+            'savings_ratio': round(1 - scanned / float32_bytes, 4) if float32_bytes else 0.0,
+            'rescoring': self._full is not None and self.rescore_factor > 1
+        }
+
+    # --- Building --- #
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32",
+        **kwargs: Any,
+    ) -> "MemmapVectorStore":
+        """Embed texts, write the matrix and sidecar to persist_directory and open the index."""
+        kwargs.pop("ids", None)  # Rows are addressed by position, document ids are not stored
+        texts = list(texts)
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+        return cls.from_vectors(vectors, texts, embedding, metadatas, persist_directory, dtype, **kwargs)
+
+    @classmethod
+    def from_vectors(
+        cls,
+        vectors: np.ndarray,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32",
+        keep_full_precision: bool = True,
+        partition_key: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "MemmapVectorStore":
+        """Write already computed embeddings as an index, optionally compressed to float16 or int8."""
+        if persist_directory is None:
+            raise ValueError("persist_directory is required for MemmapVectorStore")
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+        partitions = {}
+        if partition_key:
+            # Stable sort keeps each partition contiguous so it can be searched as a slice
+            order = sorted(range(len(texts)), key=lambda i: str(metadatas[i].get(partition_key, "")))
+            vectors = vectors[order]
+            texts = [texts[i] for i in order]
+            metadatas = [metadatas[i] for i in order]
+            for row, metadata in enumerate(metadatas):
+                name = str(metadata.get(partition_key, ""))
+                partitions.setdefault(name, [row, row])[1] = row + 1
+
+        files = {}
+        if dtype == "int8":
+            files[EMBEDDINGS_FILE], files[SCALES_FILE] = _quantize_int8(vectors)
+        else:
+            files[EMBEDDINGS_FILE] = vectors.astype(dtype)
+        if dtype != "float32" and keep_full_precision:
+            files[FULL_PRECISION_FILE] = vectors
+
+        os.makedirs(persist_directory, exist_ok=True)
+        # Write to temporary files first so a reader never maps a half-written index
+        for name, array in files.items():
+            with open(os.path.join(persist_directory, name + ".tmp"), 'wb') as file:
+                np.save(file, array)
+        sidecar_path = os.path.join(persist_directory, METADATA_FILE)
+        with open(sidecar_path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({
+                'dtype': dtype,
+                'dimension': int(vectors.shape[1]) if len(vectors) else 0,
+                'partitions': partitions,
+                'texts': texts,
+                'metadatas': metadatas
+            }, file, ensure_ascii=False)
+        for name in files:
+            os.replace(os.path.join(persist_directory, name + ".tmp"), os.path.join(persist_directory, name))
+        # A stale full-precision copy from a previous build would rescore against the wrong vectors
+        if FULL_PRECISION_FILE not in files and os.path.exists(os.path.join(persist_directory, FULL_PRECISION_FILE)):
+            os.remove(os.path.join(persist_directory, FULL_PRECISION_FILE))
+        os.replace(sidecar_path + ".tmp", sidecar_path)
+
+        return cls(persist_directory, embedding, **kwargs)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        """Always raises: VectorStore requires the method, but the index is read-only."""
+        raise ReadOnlyVectorStoreError(
+            f"MemmapVectorStore at {self.persist_directory} is read-only; rebuild the index with from_texts/from_documents."
+        )
+
+    # --- Searching --- #
+
+    def _score_all(self, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against every stored vector, in the stored precision."""
+        scores = np.empty(self._matrix.shape[0], dtype=np.float32)
+        for start in range(0, self._matrix.shape[0], SEARCH_BLOCK_ROWS):
+            block = self._matrix[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + block.shape[0]] = block.astype(np.float32, copy=False) @ query_vector
+        if self._scales is not None:
+            scores *= self._scales
+        return scores
+
+    def _search(self, query_vector: List[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row indices and scores of the k best matches, rescored in full precision when available."""
+        query_vector = _normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        scores = self._score_all(query_vector)
+        if self._full is None or self.rescore_factor <= 1:
+            rows = self._top_k(scores, k)
+            return rows, scores[rows]
+
+        # Sorted row order keeps the gather from the memory map sequential
+        rows = np.sort(self._top_k(scores, k * self.rescore_factor))
+        exact = np.asarray(self._full[rows], dtype=np.float32) @ query_vector
+        order = np.argsort(-exact)[:k]
+        return rows[order], exact[order]
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Float32 vectors of the given rows, from the full-precision copy when there is one."""
+        if self._full is not None:
+            return np.asarray(self._full[rows], dtype=np.float32)
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows, None]
+        return vectors
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first."""
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        return candidates[np.argsort(-scores[candidates])]
+
+    def _document(self, index: int) -> Document:
+        return Document(page_content=self._texts[index], metadata=dict(self._metadatas[index]))
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        rows, scores = self._search(embedding, k)
+        return [(self._document(int(row)), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Returns documents with their cosine similarity (higher is more similar)."""
+        return self.similarity_search_with_score_by_vector(self._embedding_function.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        candidates, _ = self._search(embedding, fetch_k)
+        if candidates.shape[0] == 0:
+            return []
+        candidates = np.sort(candidates)
+        candidate_vectors = self._vectors(candidates)
+        selected = maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32), candidate_vectors, lambda_mult=lambda_mult, k=k
+        )
+        return [self._document(int(candidates[i])) for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding_function.embed_query(query), k, fetch_k, lambda_mult, **kwargs
+        )
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities; clip into the [0, 1] range LangChain expects
+        return lambda score: min(1.0, max(0.0, score))
+
+
+def _quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization; returns the codes and the float32 scale of each row."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
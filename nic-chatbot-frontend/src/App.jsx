@@ -49,7 +49,7 @@ function App() {
         headers: {
           'Content-Type': 'application/json'
         },
-        body: JSON.stringify({ message: inputMessage } )
+        body: JSON.stringify({ message: inputMessage, async_chart: true } )
       })
 
       if (!resp.ok) {
@@ -69,6 +69,10 @@ function App() {
 
       setMessages(prevMessages => [...prevMessages, assistantMessage])
 
+      if (data.chart_job) {
+        pollChartJob(assistantMessage.id, data.chart_job.url)
+      }
+
     } catch (error) {
       console.error('Error sending message:', error)
       const errorMessage = {
@@ -83,6 +87,26 @@ function App() {
     }
   }
 
+  // The answer arrives first; the chart is rendered on the server and fetched when ready
+  const pollChartJob = async (messageId, url) => {
+    try {
+      for (let attempt = 0; attempt < 10; attempt++) {
+        const resp = await fetch(`http://localhost:5000${url}?wait=25`)
+        if (!resp.ok) return
+        const job = await resp.json()
+        if (job.status === 'done') {
+          setMessages(prevMessages => prevMessages.map(message =>
+            message.id === messageId ? { ...message, visualization: job.visualization, type: 'visualization' } : message
+          ))
+          return
+        }
+        if (job.status !== 'pending') return
+      }
+    } catch (error) {
+      console.error('Error fetching chart:', error)
+    }
+  }
+
   const handleKeyPress = (event) => {
     if (event.key === 'Enter' && !event.shiftKey) {
       event.preventDefault()